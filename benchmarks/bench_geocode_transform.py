@@ -0,0 +1,89 @@
+"""
+Микро-бенчмарк расчета центроида участка по геометрии геопортала НСПД
+
+Сравнивает прежний расчет (новый Transformer на каждый участок, преобразование
+вершин по одной) с geometry_centroid (кэшированный Transformer, векторное
+преобразование NumPy и функции shapely 2) на синтетических мультиполигонах в EPSG:3857.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_geocode_transform [--parcels 50] [--parts 5] [--vertices 400]
+"""
+import argparse
+import math
+import time
+
+from pyproj import Transformer
+from shapely.geometry import Polygon, MultiPolygon, Point
+
+from bot.utils.functions import geometry_centroid
+
+
+def build_geometry(index: int, parts: int, vertices: int) -> dict:
+    """Мультиполигон из parts частей по vertices вершин (с дырой в каждой части)"""
+    center_x = 4_100_000 + index * 5_000
+    center_y = 7_500_000 + index * 3_000
+    polygons = []
+    for part in range(parts):
+        x0 = center_x + part * 1_000
+        shell = [
+            [x0 + 400 * math.cos(2 * math.pi * i / vertices), center_y + 300 * math.sin(2 * math.pi * i / vertices)]
+            for i in range(vertices)
+        ]
+        hole = [[x0 + 50 * math.cos(2 * math.pi * i / 16), center_y + 50 * math.sin(2 * math.pi * i / 16)] for i in range(16)]
+        polygons.append([shell + shell[:1], hole + hole[:1]])
+    return {
+        "type": "MultiPolygon",
+        "coordinates": polygons,
+        "crs": {"type": "name", "properties": {"name": "EPSG:3857"}},
+    }
+
+
+def legacy_centroid(geometry: dict) -> list:
+    """Прежний расчет из process_cadastral"""
+    polygon_type = geometry.get('type')
+    coords = geometry.get('coordinates')
+    epsg = geometry.get('crs').get('properties').get('name')
+
+    transformer = Transformer.from_crs(epsg, "EPSG:4326", always_xy=True)
+
+    if polygon_type == 'Polygon':
+        polygon = Polygon([transformer.transform(x, y) for x, y in coords[0]])
+    elif polygon_type == 'MultiPolygon':
+        polygon = MultiPolygon([Polygon([transformer.transform(x, y) for coord_part in coords for ring in coord_part for x, y in ring])])
+    else:
+        polygon = Point(transformer.transform(*coords))
+    return [polygon.centroid.x, polygon.centroid.y]
+
+
+def measure(function, geometries, repeat: int) -> float:
+    """Минимальное по repeat прогонам процессорное время на один участок"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        for geometry in geometries:
+            function(geometry)
+        best = min(best, time.process_time() - started)
+    return best / len(geometries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parcels", type=int, default=50, help="Количество участков")
+    parser.add_argument("--parts", type=int, default=5, help="Частей в мультиполигоне")
+    parser.add_argument("--vertices", type=int, default=400, help="Вершин во внешнем кольце каждой части")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество прогонов (берется лучший)")
+    args = parser.parse_args()
+
+    geometries = [build_geometry(index, args.parts, args.vertices) for index in range(args.parcels)]
+    total_vertices = sum(len(ring) for polygon in geometries[0]["coordinates"] for ring in polygon)
+    print(f"Участков: {args.parcels}, частей: {args.parts}, вершин в участке: {total_vertices}")
+
+    before = measure(legacy_centroid, geometries, args.repeat)
+    after = measure(geometry_centroid, geometries, args.repeat)
+
+    print(f"{'до':>8}: {before * 1000:8.3f} мс CPU/участок")
+    print(f"{'после':>8}: {after * 1000:8.3f} мс CPU/участок (x{before / after:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Микро-бенчмарк бэкендов декодирования JSON на примере ответа поиска torgi.gov.ru
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_json_decode [--repeat 200] [--pages 10]
+"""
+import argparse
+import gzip
+import json
+import timeit
+from pathlib import Path
+
+from bot.services.json_codec import BACKENDS, ACCEPT_ENCODING
+
+
+EXAMPLE_PATH = Path("const_filters/json_example.json")
+
+
+def build_payload(pages: int) -> bytes:
+    """Собирает ответ поиска, содержащий pages страниц лотов из примера"""
+    example = json.loads(EXAMPLE_PATH.read_text(encoding="utf-8"))
+    example["content"] = example["content"] * pages
+    return json.dumps(example, ensure_ascii=False).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Количество декодирований на бэкенд")
+    parser.add_argument("--pages", type=int, default=10, help="Во сколько раз увеличить content примера")
+    args = parser.parse_args()
+
+    payload = build_payload(args.pages)
+    compressed = gzip.compress(payload)
+    print(f"Размер ответа: {len(payload) / 1024:.1f} КБ, gzip: {len(compressed) / 1024:.1f} КБ "
+          f"({len(compressed) / len(payload):.1%}), Accept-Encoding: {ACCEPT_ENCODING}")
+
+    timings = {}
+    for name, loads in BACKENDS.items():
+        timings[name] = min(timeit.repeat(lambda: loads(payload), number=args.repeat, repeat=3)) / args.repeat
+
+    for name, seconds in timings.items():
+        speedup = timings["json"] / seconds
+        print(f"{name:>10}: {seconds * 1000:8.3f} мс/ответ (x{speedup:.1f} относительно json)")
+
+if __name__ == "__main__":
+    main()
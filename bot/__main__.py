@@ -1,64 +1,135 @@
 import asyncio
 import logging
 import structlog
-from pathlib import Path
-from logging.handlers import RotatingFileHandler
 
+from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import RedisStorage, DefaultKeyBuilder
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from redis.asyncio import Redis
 
 from bot.config import Config, load_config
+from bot.logging_config import setup_logging
 from bot.handlers import register_all_handlers
 from bot.keyboards import register_all_keyboards
 from bot.keyboards.menu import get_bot_commands
 from bot.middlewares import register_all_middlewares
-from bot.services import init_redis
+from bot.services import init_redis, init_http_client, init_rate_limiter, close_rate_limiter, init_hedging, get_hedger, init_circuit_breakers, init_lot_cache, close_lot_cache, init_geocode_cache, close_geocode_cache, init_processing_pool, close_processing_pool, init_export_queue, init_export_scheduler, configure_upstreams, probe_page_size
+from bot.utils.data import load_subjects, load_statuses
 
 
-async def main():
-    # Создаем директорию для логов если её нет
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-    
-    # Настройка логирования в файл и консоль
-    file_handler = RotatingFileHandler(
-        log_dir / "bot.log",
-        maxBytes=5_242_880,  # 5MB
-        backupCount=3,
-        encoding='utf-8'
+def build_fsm_storage(config: Config) -> BaseStorage:
+    """
+    Хранилище состояний FSM: в Redis при USE_REDIS=true (выбор пользователя
+    переживает перезапуск и общий для всех реплик бота), иначе - в памяти
+    """
+    if not config.redis.enabled:
+        return MemoryStorage()
+    return RedisStorage(
+        Redis(host=config.redis.host, port=config.redis.port),
+        key_builder=DefaultKeyBuilder(with_bot_id=True),
+        state_ttl=config.redis.fsm_ttl,
+        data_ttl=config.redis.fsm_ttl
     )
-    console_handler = logging.StreamHandler()
-    
-    # Формат логов
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    logging.basicConfig(
-        level=logging.INFO,
-        format=log_format,
-        handlers=[file_handler, console_handler]
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, config: Config) -> None:
+    """
+    Принимает обновления через webhook (aiohttp): несколько реплик бота
+    за балансировщиком делят поток обновлений
+    """
+    logger = structlog.get_logger()
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=config.webhook.secret).register(
+        app, path=config.webhook.path
     )
-    
-    # Настройка структурированного логирования
-    structlog.configure(
-        processors=[
-            structlog.processors.TimeStamper(fmt="%Y-%m-%d %H:%M:%S"),
-            structlog.stdlib.add_log_level,
-            structlog.processors.JSONRenderer()
-        ],
-        logger_factory=structlog.stdlib.LoggerFactory(),
+    # Проверка работоспособности для балансировщика
+    app.router.add_get("/health", health)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, config.webhook.host, config.webhook.port)
+    await site.start()
+
+    # Все реплики устанавливают один и тот же адрес - повторная установка безопасна
+    await bot.set_webhook(
+        config.webhook.url.rstrip("/") + config.webhook.path,
+        secret_token=config.webhook.secret,
+        allowed_updates=dp.resolve_used_update_types()
     )
+    logger.info(
+        "Webhook server started",
+        host=config.webhook.host,
+        port=config.webhook.port,
+        path=config.webhook.path
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def main():
+    # Настройка логирования в файл и консоль
+    setup_logging()
     logger = structlog.get_logger()
 
     # Загрузка конфигурации
     config: Config = load_config()
     
+    # Базовые адреса внешних API
+    configure_upstreams(config.upstream)
+    
     # Инициализация Redis
     redis = await init_redis(config)
+    
+    # Очередь выгрузок: при EXPORT_QUEUE=true выгрузки выполняют рабочие процессы python -m bot.worker
+    export_queue = init_export_queue(config, redis)
+    
+    # Кэши карточек лотов и геокодирования
+    init_lot_cache(config)
+    init_geocode_cache(config)
+    
+    # Инициализация общего пула HTTP-соединений
+    http_client = await init_http_client(config)
+    
+    # Инициализация общего ограничителя частоты запросов
+    await init_rate_limiter(config)
+    
+    # Дублирование медленных запросов
+    init_hedging(config)
+    
+    # Предохранители внешних хостов
+    init_circuit_breakers(config)
+    
+    # Планировщик выгрузок (при очереди выгрузок бот только оценивает по нему полосу задачи)
+    init_export_scheduler(config)
+    
+    # Рабочие процессы обработки (если выгрузки выполняются в процессе бота)
+    if export_queue is None:
+        init_processing_pool(config)
+    
+    # Определяем максимальный размер страницы, который поддерживает API
+    if config.fetch.page_size_probe and export_queue is None:
+        await probe_page_size(
+            [subject["code"] for subject in load_subjects()],
+            [status["code"] for status in load_statuses()],
+            max_page_size=config.fetch.max_page_size
+        )
 
     # Инициализация бота и диспетчера с новыми параметрами
     default = DefaultBotProperties(parse_mode=ParseMode.HTML)
     bot = Bot(token=config.tg_bot.token, default=default)
-    dp = Dispatcher()
+    dp = Dispatcher(storage=build_fsm_storage(config))
 
     # Регистрация всех компонентов
     register_all_middlewares(dp, config)
@@ -68,11 +139,28 @@ async def main():
     # Установка команд бота
     await bot.set_my_commands(get_bot_commands())
 
+    # Несколько реплик требуют общего состояния: FSM в Redis и очередь выгрузок (отмена с любой реплики)
+    if config.webhook.enabled and (not config.redis.enabled or export_queue is None):
+        logger.warning("Webhook mode with several replicas requires USE_REDIS=true and EXPORT_QUEUE=true")
+
     # Запуск бота
-    logger.info("Starting bot")
+    logger.info("Starting bot", mode="webhook" if config.webhook.enabled else "polling")
     try:
-        await dp.start_polling(bot)
+        if config.webhook.enabled:
+            await run_webhook(bot, dp, config)
+        else:
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
     finally:
+        # Останавливаем обработку выгрузок и закрываем пул HTTP-соединений
+        close_processing_pool()
+        await http_client.close()
+        await close_rate_limiter()
+        logger.info("Request hedging stats", **get_hedger().get_stats())
+        close_lot_cache()
+        close_geocode_cache()
+        await dp.storage.close()
+        
         # Закрываем соединение с Redis при завершении
         if redis:
             await redis.close()
@@ -1,6 +1,6 @@
 import os
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Optional, Dict
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -16,18 +16,138 @@ class RedisConfig:
     enabled: bool
     host: Optional[str] = None
     port: Optional[int] = None
+    fsm_ttl: int = 2592000
+
+
+@dataclass
+class WebhookConfig:
+    enabled: bool = False
+    url: Optional[str] = None
+    path: str = "/webhook"
+    secret: Optional[str] = None
+    host: str = "0.0.0.0"
+    port: int = 8080
 
 
 @dataclass
 class ProcessingConfig:
     calculate_coordinates: bool
+    enrichment_concurrency: int = 50
+    geocode_concurrency: int = 8
+    workers: int = 2
+
+
+@dataclass
+class HttpConfig:
+    limit: int = 100
+    limit_per_host: int = 20
+    keepalive_timeout: float = 30.0
+    dns_cache_ttl: int = 300
+
+
+@dataclass
+class FetchConfig:
+    min_concurrency: int = 2
+    max_concurrency: int = 16
+    page_size: int = 10
+    page_size_probe: bool = False
+    max_page_size: int = 1000
+    shard_max_elements: int = 5000
+    shard_concurrency: int = 4
+    checkpoints: bool = True
+    checkpoint_ttl: int = 21600
+    delta_sync: bool = True
+    delta_ttl: int = 604800
+    delta_max_pages: int = 20
+    cache_enabled: bool = True
+    cache_ttl: int = 600
+    cache_ttl_final: int = 86400
+    cache_stale_ttl: int = 1800
+    retry_max_attempts: int = 4
+    retry_base_delay: float = 1.0
+    retry_max_delay: float = 30.0
+    retry_budget: int = 100
+
+
+@dataclass
+class RateLimitConfig:
+    torgi_rate: float = 10.0
+    torgi_burst: int = 10
+    nspd_rate: float = 3.0
+    nspd_burst: int = 3
+
+
+@dataclass
+class HedgingConfig:
+    enabled: bool = False
+    percentile: float = 0.95
+    max_ratio: float = 0.05
+    min_samples: int = 20
+    min_delay: float = 0.05
+    window: int = 500
+
+
+@dataclass
+class CircuitBreakerConfig:
+    failure_threshold: int = 5
+    recovery_timeout: float = 30.0
+    half_open_max_calls: int = 1
+
+
+@dataclass
+class UpstreamConfig:
+    torgi_base_url: str = "https://torgi.gov.ru"
+    nspd_base_url: str = "https://nspd.gov.ru"
+
+
+@dataclass
+class LotCacheConfig:
+    enabled: bool = True
+    ttl: int = 21600
+    ttl_final: int = 31536000
+    sqlite_path: str = "data/cache.sqlite3"
+
+
+@dataclass
+class GeocodeCacheConfig:
+    enabled: bool = True
+    ttl: int = 315360000
+    negative_ttl: int = 21600
+    sqlite_path: str = "data/cache.sqlite3"
+
+
+@dataclass
+class ExportQueueConfig:
+    enabled: bool = False
+    visibility_timeout: int = 120
+    max_deliveries: int = 3
+    worker_concurrency: int = 2
+
+
+@dataclass
+class SchedulerConfig:
+    fast_slots: int = 4
+    slow_slots: int = 1
+    fast_lane_seconds: float = 60.0
+    user_weights: Dict[int, float] = field(default_factory=dict)
 
 
 @dataclass
 class Config:
     tg_bot: TgBot
     redis: RedisConfig
+    webhook: WebhookConfig
     processing: ProcessingConfig
+    http: HttpConfig
+    fetch: FetchConfig
+    rate_limit: RateLimitConfig
+    upstream: UpstreamConfig
+    hedging: HedgingConfig
+    circuit_breaker: CircuitBreakerConfig
+    lot_cache: LotCacheConfig
+    geocode_cache: GeocodeCacheConfig
+    export_queue: ExportQueueConfig
+    scheduler: SchedulerConfig
 
 
 def load_config() -> Config:
@@ -42,12 +162,126 @@ def load_config() -> Config:
     redis_config = RedisConfig(
         enabled=redis_enabled,
         host=os.getenv("REDIS_HOST") if redis_enabled else None,
-        port=int(os.getenv("REDIS_PORT", "6379")) if redis_enabled else None
+        port=int(os.getenv("REDIS_PORT", "6379")) if redis_enabled else None,
+        fsm_ttl=int(os.getenv("FSM_TTL", "2592000"))
+    )
+    
+    # Режим webhook (вместо long polling), если задан публичный адрес бота
+    webhook_url = os.getenv("WEBHOOK_URL")
+    webhook_config = WebhookConfig(
+        enabled=bool(webhook_url),
+        url=webhook_url,
+        path=os.getenv("WEBHOOK_PATH", "/webhook"),
+        secret=os.getenv("WEBHOOK_SECRET") or None,
+        host=os.getenv("WEBAPP_HOST", "0.0.0.0"),
+        port=int(os.getenv("WEBAPP_PORT", "8080"))
     )
     
     # Настройки обработки данных
     processing_config = ProcessingConfig(
-        calculate_coordinates=os.getenv("CALCULATE_COORDINATES", "false").lower() == "true"
+        calculate_coordinates=os.getenv("CALCULATE_COORDINATES", "false").lower() == "true",
+        enrichment_concurrency=int(os.getenv("ENRICHMENT_CONCURRENCY", "50")),
+        geocode_concurrency=int(os.getenv("GEOCODE_CONCURRENCY", "8")),
+        workers=int(os.getenv("PROCESSING_WORKERS", "2"))
+    )
+    
+    # Настройки пула HTTP-соединений
+    http_config = HttpConfig(
+        limit=int(os.getenv("HTTP_LIMIT", "100")),
+        limit_per_host=int(os.getenv("HTTP_LIMIT_PER_HOST", "20")),
+        keepalive_timeout=float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30")),
+        dns_cache_ttl=int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+    )
+    
+    # Настройки загрузки страниц поиска
+    fetch_config = FetchConfig(
+        min_concurrency=int(os.getenv("FETCH_MIN_CONCURRENCY", "2")),
+        max_concurrency=int(os.getenv("FETCH_MAX_CONCURRENCY", "16")),
+        page_size=int(os.getenv("FETCH_PAGE_SIZE", "10")),
+        page_size_probe=os.getenv("FETCH_PAGE_SIZE_PROBE", "false").lower() == "true",
+        max_page_size=int(os.getenv("FETCH_MAX_PAGE_SIZE", "1000")),
+        shard_max_elements=int(os.getenv("FETCH_SHARD_MAX_ELEMENTS", "5000")),
+        shard_concurrency=int(os.getenv("FETCH_SHARD_CONCURRENCY", "4")),
+        checkpoints=os.getenv("FETCH_CHECKPOINTS", "true").lower() == "true",
+        checkpoint_ttl=int(os.getenv("FETCH_CHECKPOINT_TTL", "21600")),
+        delta_sync=os.getenv("FETCH_DELTA_SYNC", "true").lower() == "true",
+        delta_ttl=int(os.getenv("FETCH_DELTA_TTL", "604800")),
+        delta_max_pages=int(os.getenv("FETCH_DELTA_MAX_PAGES", "20")),
+        cache_enabled=os.getenv("QUERY_CACHE", "true").lower() == "true",
+        cache_ttl=int(os.getenv("QUERY_CACHE_TTL", "600")),
+        cache_ttl_final=int(os.getenv("QUERY_CACHE_TTL_FINAL", "86400")),
+        cache_stale_ttl=int(os.getenv("QUERY_CACHE_STALE_TTL", "1800")),
+        retry_max_attempts=int(os.getenv("FETCH_RETRY_MAX_ATTEMPTS", "4")),
+        retry_base_delay=float(os.getenv("FETCH_RETRY_BASE_DELAY", "1")),
+        retry_max_delay=float(os.getenv("FETCH_RETRY_MAX_DELAY", "30")),
+        retry_budget=int(os.getenv("FETCH_RETRY_BUDGET", "100"))
+    )
+    
+    # Ограничение частоты запросов к внешним хостам (запросов в секунду и размер всплеска)
+    rate_limit_config = RateLimitConfig(
+        torgi_rate=float(os.getenv("RATE_LIMIT_TORGI", "10")),
+        torgi_burst=int(os.getenv("RATE_LIMIT_TORGI_BURST", "10")),
+        nspd_rate=float(os.getenv("RATE_LIMIT_NSPD", "3")),
+        nspd_burst=int(os.getenv("RATE_LIMIT_NSPD_BURST", "3"))
+    )
+    
+    # Базовые адреса внешних API (например, локальный mock-сервер для бенчмарков)
+    upstream_config = UpstreamConfig(
+        torgi_base_url=os.getenv("TORGI_BASE_URL", "https://torgi.gov.ru"),
+        nspd_base_url=os.getenv("NSPD_BASE_URL", "https://nspd.gov.ru")
+    )
+    
+    # Дублирование медленных запросов страниц поиска и карточек лотов
+    hedging_config = HedgingConfig(
+        enabled=os.getenv("HEDGING", "false").lower() == "true",
+        percentile=float(os.getenv("HEDGING_PERCENTILE", "0.95")),
+        max_ratio=float(os.getenv("HEDGING_MAX_RATIO", "0.05")),
+        min_samples=int(os.getenv("HEDGING_MIN_SAMPLES", "20")),
+        min_delay=float(os.getenv("HEDGING_MIN_DELAY", "0.05")),
+        window=int(os.getenv("HEDGING_WINDOW", "500"))
+    )
+    
+    # Предохранители внешних хостов (быстрый отказ при недоступности сервиса)
+    circuit_breaker_config = CircuitBreakerConfig(
+        failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+        recovery_timeout=float(os.getenv("CIRCUIT_RECOVERY_TIMEOUT", "30"))
+    )
+    
+    # Кэш карточек лотов (в Redis или в файле SQLite, если Redis не используется)
+    lot_cache_config = LotCacheConfig(
+        enabled=os.getenv("LOT_CACHE", "true").lower() == "true",
+        ttl=int(os.getenv("LOT_CACHE_TTL", "21600")),
+        ttl_final=int(os.getenv("LOT_CACHE_TTL_FINAL", "31536000")),
+        sqlite_path=os.getenv("CACHE_SQLITE_PATH", "data/cache.sqlite3")
+    )
+    
+    # Кэш геокодирования кадастровых номеров (в том же хранилище, что и кэш карточек)
+    geocode_cache_config = GeocodeCacheConfig(
+        enabled=os.getenv("GEOCODE_CACHE", "true").lower() == "true",
+        ttl=int(os.getenv("GEOCODE_CACHE_TTL", "315360000")),
+        negative_ttl=int(os.getenv("GEOCODE_CACHE_NEGATIVE_TTL", "21600")),
+        sqlite_path=os.getenv("CACHE_SQLITE_PATH", "data/cache.sqlite3")
+    )
+    
+    # Очередь выгрузок в Redis, которую обрабатывают рабочие процессы python -m bot.worker
+    export_queue_config = ExportQueueConfig(
+        enabled=os.getenv("EXPORT_QUEUE", "false").lower() == "true",
+        visibility_timeout=int(os.getenv("EXPORT_QUEUE_VISIBILITY_TIMEOUT", "120")),
+        max_deliveries=int(os.getenv("EXPORT_QUEUE_MAX_DELIVERIES", "3")),
+        worker_concurrency=int(os.getenv("EXPORT_WORKER_CONCURRENCY", "2"))
+    )
+    
+    # Планировщик выгрузок: быстрая и медленная полосы, веса пользователей в формате "id:вес,id:вес"
+    scheduler_config = SchedulerConfig(
+        fast_slots=int(os.getenv("SCHEDULER_FAST_SLOTS", "4")),
+        slow_slots=int(os.getenv("SCHEDULER_SLOW_SLOTS", "1")),
+        fast_lane_seconds=float(os.getenv("SCHEDULER_FAST_LANE_SECONDS", "60")),
+        user_weights={
+            int(user_id): float(weight)
+            for user_id, weight in (
+                item.split(":") for item in os.getenv("SCHEDULER_USER_WEIGHTS", "").split(",") if item.strip()
+            )
+        }
     )
     
     # Проверяем наличие токена
@@ -58,5 +292,16 @@ def load_config() -> Config:
     return Config(
         tg_bot=TgBot(token=bot_token),
         redis=redis_config,
-        processing=processing_config
+        webhook=webhook_config,
+        processing=processing_config,
+        http=http_config,
+        fetch=fetch_config,
+        rate_limit=rate_limit_config,
+        upstream=upstream_config,
+        hedging=hedging_config,
+        circuit_breaker=circuit_breaker_config,
+        lot_cache=lot_cache_config,
+        geocode_cache=geocode_cache_config,
+        export_queue=export_queue_config,
+        scheduler=scheduler_config
     ) 
\ No newline at end of file
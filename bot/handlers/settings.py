@@ -1,17 +1,15 @@
 import json
-import os
 from datetime import datetime, timedelta
-from typing import Dict, Optional
 import asyncio
 
 import aiohttp
 import pandas as pd
 from aiogram import Router, F
-from aiogram.types import CallbackQuery, FSInputFile, Message
+from aiogram.types import CallbackQuery, Message
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 import structlog
-from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.exceptions import TelegramBadRequest
 
 from bot.keyboards.menu import (
     get_main_menu_keyboard,
@@ -25,19 +23,16 @@ from bot.keyboards.settings import (
     get_coordinates_keyboard,
     get_calendar_keyboard
 )
-from bot.services.data_fetcher import fetch_data
+from bot.services.export import run_export, export_tasks
+from bot.services.export_queue import ExportJob, get_export_queue
+from bot.services.export_scheduler import get_export_scheduler, SLOW_LANE
 from bot.states.settings import SettingsState
 from bot.utils.data import load_subjects, load_statuses
-from bot.config import load_config
 
 
 router = Router()
 logger = structlog.get_logger()
 
-# Словарь для хранения задач получения данных
-fetch_tasks: Dict[int, asyncio.Task] = {}
-
-
 def get_readable_filename(subjects: list[str], statuses: list[str]) -> str:
     """Создает читаемое имя файла с русскими названиями субъектов и статусов"""
     all_subjects = load_subjects()
@@ -87,72 +82,6 @@ async def cmd_settings(message: Message, state: FSMContext) -> None:
     )
 
 
-async def update_progress(
-    message: Message,
-    current: int,
-    total: int,
-    user_id: int
-) -> None:
-    """Обновляет сообщение с прогрессом"""
-    if user_id not in fetch_tasks or fetch_tasks[user_id].cancelled():
-        return
-    
-    # Создаем словарь для хранения последнего времени обновления и счетчика
-    if not hasattr(update_progress, "last_updates"):
-        update_progress.last_updates = {}
-    
-    # Получаем текущее время
-    now = datetime.now()
-    
-    # Если для этого пользователя уже есть запись о последнем обновлении
-    if user_id in update_progress.last_updates:
-        last_time, update_count = update_progress.last_updates[user_id]
-        
-        # Вычисляем промежуток времени с последнего обновления в секундах
-        time_diff = (now - last_time).total_seconds()
-        
-        # Если прошло меньше 5 секунд, и обновление не критическое (не первое и не последнее)
-        if time_diff < 5 and update_count % 10 != 0 and current < total and current > 1:
-            # Пропускаем обновление
-            return
-        
-        # Если прошло меньше 60 секунд с последней ошибки флуда
-        if hasattr(update_progress, "flood_time") and user_id in update_progress.flood_time:
-            flood_time = update_progress.flood_time[user_id]
-            if (now - flood_time).total_seconds() < 60:
-                # Пропускаем все обновления на минуту после ошибки флуда
-                return
-    
-    # Обновляем счетчик и время последнего обновления
-    update_progress.last_updates[user_id] = (now, update_progress.last_updates.get(user_id, (None, 0))[1] + 1)
-    
-    try:
-        # Обновляем сообщение с прогрессом только для ключевых точек
-        await message.edit_text(
-            f"⏳ Загрузка данных...\n"
-            f"Обработано страниц: {current}/{total} ({round(current/total*100)}%)\n"
-            f"Пожалуйста, подождите.",
-            reply_markup=get_cancel_keyboard()
-        )
-    except TelegramBadRequest as e:
-        # Игнорируем ошибку, если сообщение не изменилось
-        if "message is not modified" in str(e):
-            pass
-        else:
-            logger.error("Failed to update progress", error=str(e))
-    except TelegramRetryAfter as e:
-        # Если Telegram просит подождать из-за флуда
-        retry_after = getattr(e, "retry_after", 60)
-        logger.warning(f"Rate limited, retry after {retry_after} seconds")
-        
-        # Запоминаем время ошибки флуда
-        if not hasattr(update_progress, "flood_time"):
-            update_progress.flood_time = {}
-        update_progress.flood_time[user_id] = now
-    except Exception as e:
-        logger.error("Failed to update progress", error=str(e))
-
-
 @router.callback_query(F.data == "cancel_fetch")
 async def cancel_fetch(callback: CallbackQuery, state: FSMContext) -> None:
     """Отменяет текущий запрос данных"""
@@ -161,8 +90,13 @@ async def cancel_fetch(callback: CallbackQuery, state: FSMContext) -> None:
     
     user_id = callback.from_user.id
     
-    if user_id in fetch_tasks and not fetch_tasks[user_id].done():
-        fetch_tasks[user_id].cancel()
+    # Выгрузку из очереди останавливает рабочий процесс, увидев отметку об отмене
+    export_queue = get_export_queue()
+    queued_cancelled = export_queue is not None and await export_queue.cancel(user_id)
+    
+    if queued_cancelled or (user_id in export_tasks and not export_tasks[user_id].done()):
+        if not queued_cancelled:
+            export_tasks[user_id].cancel()
         await callback.message.edit_text(
             "❌ Запрос отменен.",
             reply_markup=get_settings_keyboard()
@@ -507,7 +441,7 @@ async def start_data_fetch(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
     
     user_id = callback.from_user.id
-    if user_id in fetch_tasks and not fetch_tasks[user_id].done():
+    if user_id in export_tasks and not export_tasks[user_id].done():
         await callback.message.edit_text(
             "⚠️ У вас уже есть активный запрос. Дождитесь его завершения или отмените.",
             reply_markup=get_cancel_keyboard()
@@ -534,113 +468,57 @@ async def start_data_fetch(callback: CallbackQuery, state: FSMContext) -> None:
         reply_markup=get_cancel_keyboard()
     )
     
-    try:
-        logger.info(
-            "Starting data fetch",
-            subjects=selected_subjects,
-            statuses=selected_statuses,
-            date_from=date_from,
-            date_to=date_to,
-            calculate_coordinates=calculate_coordinates,
-            user_id=user_id
-        )
-        
-        # Создаем и сохраняем задачу
-        fetch_tasks[user_id] = asyncio.create_task(
-            fetch_data(
-                selected_subjects,
-                selected_statuses,
-                date_from=date_from,
-                date_to=date_to,
-                progress_callback=lambda current, total: update_progress(
-                    status_message, current, total, user_id
-                )
-            )
-        )
-        
-        # Ждем завершения задачи
+    job = ExportJob(
+        user_id=user_id,
+        chat_id=callback.message.chat.id,
+        message_id=status_message.message_id,
+        subjects=selected_subjects,
+        statuses=selected_statuses,
+        date_from=date_from,
+        date_to=date_to,
+        calculate_coordinates=calculate_coordinates
+    )
+    
+    # При включенной очереди выгрузку выполняет рабочий процесс (python -m bot.worker);
+    # стоимость оценивается заранее, чтобы задача попала в очередь своей полосы
+    export_queue = get_export_queue()
+    if export_queue is not None:
         try:
-            data = await fetch_tasks[user_id]
-        except asyncio.CancelledError:
-            logger.info("Fetch task was cancelled", user_id=user_id)
-            return
-        finally:
-            # Удаляем задачу из словаря
-            fetch_tasks.pop(user_id, None)
-        
-        if not data:
+            scheduler = get_export_scheduler()
+            cost = await scheduler.estimate(
+                selected_subjects, selected_statuses, date_from, date_to, calculate_coordinates
+            )
+            job.lots, job.lane = cost.lots, cost.lane
+            position = await export_queue.enqueue(job, cost.seconds / scheduler.weight(user_id))
+        except Exception as e:
+            logger.error("Failed to enqueue export job", error=str(e), user_id=user_id)
             await status_message.edit_text(
-                "❌ Не найдено данных по выбранным параметрам",
+                "❌ Произошла ошибка при загрузке данных. Попробуйте позже.",
                 reply_markup=get_settings_keyboard()
             )
             return
-            
-        await status_message.edit_text(
-            f"📊 Обработка {len(data)} записей...\n"
-            "Создание Excel файла..."
-        )
         
-        try:
-            # Используем новую функцию обработки данных
-            from bot.utils.data_processing import data_processing
-            # Загружаем конфигурацию
-            config = load_config()
-            # Устанавливаем опцию расчета координат
-            config.processing.calculate_coordinates = calculate_coordinates
-            filename = data_processing(data, selected_subjects, selected_statuses, config)
-            
-            if not filename:
-                await status_message.edit_text(
-                    "❌ Ошибка при обработке данных",
-                    reply_markup=get_settings_keyboard()
-                )
-                return
-            
-            # Создаем FSInputFile для корректной отправки файла
-            file = FSInputFile(filename)
-            
-            # Формируем текст сообщения
-            date_info = ""
-            if date_from and date_to:
-                date_info = f"\n📅 Период: с {date_from} по {date_to}"
-            
-            coords_info = "\n🌍 Расчет координат: включен" if calculate_coordinates else ""
-            
-            await callback.message.answer_document(
-                document=file,
-                caption=(
-                    f"✅ Данные успешно загружены!\n"
-                    f"📊 Количество записей: {len(data)}\n"
-                    f"🏢 Выбрано субъектов: {len(selected_subjects)}{date_info}{coords_info}"
-                )
-            )
-            
+        if position is None:
             await status_message.edit_text(
-                "⚙️ Настройки поиска:",
-                reply_markup=get_settings_keyboard()
-            )
-
-            os.remove(filename)
-            logger.info("Excel файл успешно удалён.", user_id=user_id)
-
-        except Exception as e:
-            logger.error(
-                "Error during data processing",
-                error=str(e),
-                user_id=user_id
-            )
-            await status_message.edit_text(
-                f"❌ Произошла ошибка при обработке данных: {str(e)}",
-                reply_markup=get_settings_keyboard()
+                "⚠️ У вас уже есть активный запрос. Дождитесь его завершения или отмените.",
+                reply_markup=get_cancel_keyboard()
             )
+            return
         
-    except Exception as e:
-        logger.error(
-            "Error during data fetch",
-            error=str(e),
-            user_id=user_id
-        )
+        lane_info = " большой выгрузки" if job.lane == SLOW_LANE else ""
         await status_message.edit_text(
-            "❌ Произошла ошибка при загрузке данных. Попробуйте позже.",
-            reply_markup=get_settings_keyboard()
+            f"📥 Запрос поставлен в очередь{lane_info} (позиция: {position}).\n"
+            "Файл придет в этот чат, когда выгрузка будет готова.",
+            reply_markup=get_cancel_keyboard()
         )
+        return
+    
+    # Создаем и сохраняем задачу, чтобы ее можно было отменить
+    export_tasks[user_id] = asyncio.create_task(run_export(callback.bot, job))
+    try:
+        await export_tasks[user_id]
+    except asyncio.CancelledError:
+        logger.info("Fetch task was cancelled", user_id=user_id)
+    finally:
+        # Удаляем задачу из словаря
+        export_tasks.pop(user_id, None)
@@ -0,0 +1,43 @@
+import logging
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+import structlog
+
+
+def setup_logging(log_file: bool = True) -> None:
+    """
+    Настраивает логирование в консоль и (опционально) в файл logs/bot.log
+
+    Рабочие процессы обработки пишут только в консоль, чтобы несколько
+    процессов не ротировали один файл.
+    """
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        # Создаем директорию для логов если её нет
+        log_dir = Path("logs")
+        log_dir.mkdir(exist_ok=True)
+        handlers.insert(0, RotatingFileHandler(
+            log_dir / "bot.log",
+            maxBytes=5_242_880,  # 5MB
+            backupCount=3,
+            encoding='utf-8'
+        ))
+
+    # Формат логов
+    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    logging.basicConfig(
+        level=logging.INFO,
+        format=log_format,
+        handlers=handlers
+    )
+
+    # Настройка структурированного логирования
+    structlog.configure(
+        processors=[
+            structlog.processors.TimeStamper(fmt="%Y-%m-%d %H:%M:%S"),
+            structlog.stdlib.add_log_level,
+            structlog.processors.JSONRenderer()
+        ],
+        logger_factory=structlog.stdlib.LoggerFactory(),
+    )
@@ -0,0 +1,459 @@
+"""
+Локальный mock-сервер torgi.gov.ru и nspd.gov.ru для офлайн-бенчмарков
+
+Отдает поиск лотов (lotcards/search), карточки лотов (lotcards/{id}) и поиск
+геопортала НСПД. Данные генерируются детерминированно на основе
+const_filters/json_example.json, либо воспроизводятся из ранее записанных ответов.
+Задержки, ошибки и ответы 429 настраиваются параметрами запуска.
+
+Запуск из корня репозитория:
+    python -m bot.mock_upstream [--port 8080] [--nspd-port 8081] [--latency 50] [--error-rate 0.01]
+
+Запись ответов настоящих сервисов и их воспроизведение:
+    python -m bot.mock_upstream --record recordings/
+    python -m bot.mock_upstream --replay recordings/
+
+Бот направляется на mock-сервер через .env:
+    TORGI_BASE_URL=http://127.0.0.1:8080
+    NSPD_BASE_URL=http://127.0.0.1:8081
+"""
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta, timezone, date
+from functools import lru_cache
+from pathlib import Path
+import argparse
+import asyncio
+import copy
+import hashlib
+import json
+import math
+import random
+import time
+import zlib
+
+import aiohttp
+from aiohttp import web
+import structlog
+
+
+logger = structlog.get_logger()
+
+EXAMPLE_PATH = Path("const_filters/json_example.json")
+SUBJECTS_PATH = Path("const_filters/dynSubRF_new.json")
+
+TORGI_UPSTREAM = "https://torgi.gov.ru"
+NSPD_UPSTREAM = "https://nspd.gov.ru"
+
+# Опорная дата публикации синтетических лотов: самые свежие лоты опубликованы в последние сутки до неё
+BASE_TIME = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+@lru_cache(maxsize=1)
+def load_templates() -> List[Dict[str, Any]]:
+    """Лоты из примера ответа поиска - шаблоны для синтетических данных"""
+    return json.loads(EXAMPLE_PATH.read_text(encoding="utf-8"))["content"]
+
+
+@lru_cache(maxsize=1)
+def load_region_codes() -> Dict[str, str]:
+    """Соответствие кода субъекта в запросе (dynSubjRF) коду региона в ответе (subjectRFCode)"""
+    data = json.loads(SUBJECTS_PATH.read_text(encoding="utf-8"))
+    return {item["code"]: item["baseAttrValue"]["code"] for item in data[0]["mappingTable"]}
+
+
+def _seed(*parts: Any) -> int:
+    return zlib.crc32(":".join(str(part) for part in parts).encode("utf-8"))
+
+
+def _region(subject: str) -> int:
+    code = load_region_codes().get(subject, subject)
+    return int(code) if str(code).isdigit() else _seed(code) % 90 + 1
+
+
+def cadastral_number(subject: str, status: str, index: int) -> Optional[str]:
+    """Синтетический кадастровый номер (по 10 участков в квартале); у каждого седьмого лота номера нет"""
+    if index % 7 == 6:
+        return None
+    region = _region(subject)
+    district = _seed(subject, status) % 100
+    quarter = (_seed(status, subject) % 9000 * 1000 + index // 10) % 10000000
+    return f"{region:02d}:{district:02d}:{quarter:07d}:{index % 10 + 1}"
+
+
+def lot_id(subject: str, status: str, index: int) -> str:
+    return f"MOCK-{subject}-{status}-{index}_1"
+
+
+def parse_lot_id(value: str) -> Optional[Tuple[str, str, int]]:
+    """Разбирает id синтетического лота на субъект, статус и порядковый номер"""
+    parts = value.removesuffix("_1").split("-")
+    if len(parts) != 4 or parts[0] != "MOCK" or not parts[3].isdigit():
+        return None
+    return parts[1], parts[2], int(parts[3])
+
+
+def _lots_count(subject: str, status: str, lots_per_pair: int) -> int:
+    return lots_per_pair // 2 + _seed(subject, status) % (lots_per_pair + 1)
+
+
+def _published_at(subject: str, status: str, index: int) -> datetime:
+    # Чем больше номер, тем старше лот; смещение в пределах часа перемешивает субъекты и статусы
+    return BASE_TIME - timedelta(hours=index * 6, seconds=_seed(subject, status, index) % 3600)
+
+
+def _format_time(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+
+
+def build_lot(subject: str, status: str, index: int) -> Dict[str, Any]:
+    """Синтетический лот в формате ответа поиска"""
+    templates = load_templates()
+    template = templates[_seed(subject, status, index) % len(templates)]
+    published = _published_at(subject, status, index)
+    cad_num = cadastral_number(subject, status, index)
+
+    lot = dict(template)
+    lot.update({
+        "id": lot_id(subject, status, index),
+        "noticeNumber": lot_id(subject, status, index).removesuffix("_1"),
+        "lotStatus": status,
+        "subjectRFCode": str(_region(subject)),
+        "noticeFirstVersionPublicationDate": _format_time(published),
+        "createDate": _format_time(published - timedelta(minutes=2)),
+        "biddEndTime": _format_time(published + timedelta(days=30)),
+    })
+    characteristics = copy.deepcopy(template.get("characteristics", []))
+    for characteristic in characteristics:
+        if characteristic.get("code") == "CadastralNumber":
+            characteristic["characteristicValue"] = cad_num or "-"
+        elif characteristic.get("code") == "SquareZU":
+            characteristic["characteristicValue"] = f"{300 + _seed(subject, index) % 5000}.0"
+    lot["characteristics"] = characteristics
+    return lot
+
+
+def auction_date(lot: Dict[str, Any]) -> date:
+    """Дата начала торгов синтетического лота (по ней фильтруют aucStartFrom/aucStartTo)"""
+    return date.fromisoformat(lot["biddEndTime"][:10]) + timedelta(days=1)
+
+
+@lru_cache(maxsize=2048)
+def pair_lots(subject: str, status: str, lots_per_pair: int) -> Tuple[Dict[str, Any], ...]:
+    return tuple(build_lot(subject, status, index) for index in range(_lots_count(subject, status, lots_per_pair)))
+
+
+@lru_cache(maxsize=256)
+def query_lots(
+    subjects: Tuple[str, ...],
+    statuses: Tuple[str, ...],
+    date_from: Optional[str],
+    date_to: Optional[str],
+    lots_per_pair: int
+) -> Tuple[Dict[str, Any], ...]:
+    """Все лоты запроса, отсортированные по дате публикации (как firstVersionPublicationDate,desc)"""
+    lots = [lot for subject in subjects for status in statuses for lot in pair_lots(subject, status, lots_per_pair)]
+    if date_from:
+        lots = [lot for lot in lots if auction_date(lot) >= date.fromisoformat(date_from[:10])]
+    if date_to:
+        lots = [lot for lot in lots if auction_date(lot) <= date.fromisoformat(date_to[:10])]
+    lots.sort(key=lambda lot: lot["noticeFirstVersionPublicationDate"], reverse=True)
+    return tuple(lots)
+
+
+def build_lot_card(lot: Dict[str, Any]) -> Dict[str, Any]:
+    """Карточка лота: данные поиска и поля, которые бот извлекает при обогащении"""
+    seed = _seed(lot["id"])
+    published = datetime.fromisoformat(lot["noticeFirstVersionPublicationDate"].replace("Z", "+00:00"))
+    price = 10000 + seed % 1000000
+    card = dict(lot)
+    card.update({
+        "auctionStartDate": _format_time(published + timedelta(days=31)),
+        "biddStartTime": _format_time(published + timedelta(days=1)),
+        "etpUrl": f"https://etp.example/lots/{lot['id']}",
+        "priceMin": price,
+        "priceStep": round(price * 0.03, 2),
+        "deposit": round(price * 0.2, 2),
+        "lotAttachments": [
+            {"fileName": f"Документация {number}.pdf", "fileId": hashlib.md5(f"{lot['id']}:{number}".encode()).hexdigest()[:24]}
+            for number in range(1 + seed % 3)
+        ],
+    })
+    return card
+
+
+def _to_mercator(lon: float, lat: float) -> Tuple[float, float]:
+    x = math.radians(lon) * 6378137.0
+    y = math.log(math.tan(math.pi / 4 + math.radians(lat) / 2)) * 6378137.0
+    return x, y
+
+
+def build_geoportal_response(query: str) -> Dict[str, Any]:
+    """Ответ поиска геопортала: полигон участка (или квартала) в EPSG:3857"""
+    parts = query.split(":")
+    if len(parts) < 3 or not all(part.isdigit() for part in parts):
+        return {"data": {"type": "FeatureCollection", "features": []}}
+
+    seed = _seed(query)
+    # Часть участков не находится - как и на настоящем геопортале
+    if len(parts) == 4 and seed % 13 == 0:
+        return {"data": {"type": "FeatureCollection", "features": []}}
+
+    region = int(parts[0])
+    lon = 30.0 + region % 60 + int(parts[2]) % 1000 / 2000
+    lat = 45.0 + region % 20 + int(parts[1]) / 200
+    size = 0.0005 if len(parts) == 4 else 0.01
+    if len(parts) == 4:
+        lon += int(parts[3]) * size * 2
+
+    def ring(dx: float, dy: float) -> List[List[float]]:
+        corners = [(lon + dx, lat + dy), (lon + dx + size, lat + dy), (lon + dx + size, lat + dy + size), (lon + dx, lat + dy + size)]
+        points = [list(_to_mercator(x, y)) for x, y in corners]
+        return points + [points[0]]
+
+    if len(parts) == 4 and seed % 5 == 0:
+        geometry = {"type": "MultiPolygon", "coordinates": [[ring(0, 0)], [ring(size * 1.5, 0)]]}
+    else:
+        geometry = {"type": "Polygon", "coordinates": [ring(0, 0)]}
+    geometry["crs"] = {"type": "name", "properties": {"name": "EPSG:3857"}}
+
+    address = f"Российская Федерация, регион {region:02d}, кадастровый квартал {':'.join(parts[:3])}"
+    if len(parts) == 4:
+        address += f", участок {parts[3]}"
+    return {
+        "data": {
+            "type": "FeatureCollection",
+            "features": [{
+                "id": seed,
+                "type": "Feature",
+                "geometry": geometry,
+                "properties": {
+                    "category": 36368 if len(parts) == 4 else 36381,
+                    "options": {"cad_num": query, "readable_address": address},
+                },
+            }],
+        }
+    }
+
+
+class Recorder:
+    """Хранилище записанных ответов: один файл на запрос (путь + параметры)"""
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, path_qs: str) -> Path:
+        return self.directory / f"{hashlib.sha1(path_qs.encode('utf-8')).hexdigest()}.json"
+
+    def load(self, path_qs: str) -> Optional[Dict[str, Any]]:
+        path = self._path(path_qs)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def save(self, path_qs: str, status: int, content_type: str, body: str) -> None:
+        self._path(path_qs).write_text(
+            json.dumps({"path": path_qs, "status": status, "content_type": content_type, "body": body}, ensure_ascii=False),
+            encoding="utf-8"
+        )
+
+
+class MockUpstream:
+    """Обработчики mock-сервера с инъекцией задержек и ошибок"""
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.recorder = Recorder(Path(args.record or args.replay)) if (args.record or args.replay) else None
+        self.session: Optional[aiohttp.ClientSession] = None
+        # Ограничение частоты по каждому сервису: при превышении отвечаем 429, как настоящий upstream
+        self.buckets: Dict[str, List[float]] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self.started = time.monotonic()
+
+    def _count(self, route: str, outcome: str) -> None:
+        stats = self.stats.setdefault(route, {"requests": 0, "ok": 0, "errors": 0, "throttled": 0, "replayed": 0, "recorded": 0})
+        stats[outcome] += 1
+
+    def _over_rate(self, service: str) -> bool:
+        rate = self.args.max_rps
+        if rate <= 0:
+            return False
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(service, [rate, now])
+        tokens = min(rate, tokens + (now - updated) * rate)
+        if tokens < 1:
+            self.buckets[service] = [tokens, now]
+            return True
+        self.buckets[service] = [tokens - 1, now]
+        return False
+
+    async def _delay(self) -> None:
+        latency = self.args.latency + self.random.uniform(0, self.args.jitter)
+        if self.args.slow_rate and self.random.random() < self.args.slow_rate:
+            latency = self.args.slow_latency
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+    async def _proxy(self, request: web.Request, upstream: str) -> web.Response:
+        """Запрашивает настоящий сервис и сохраняет ответ"""
+        if self.session is None:
+            self.session = aiohttp.ClientSession(headers={"User-Agent": "Mozilla/5.0", "Accept": "application/json"})
+        async with self.session.get(f"{upstream}{request.path_qs}", ssl=False) as response:
+            body = await response.text()
+            content_type = response.content_type or "application/json"
+            if response.status == 200:
+                self.recorder.save(request.path_qs, response.status, content_type, body)
+            return web.Response(status=response.status, text=body, content_type=content_type)
+
+    async def respond(self, request: web.Request, route: str, service: str, build) -> web.Response:
+        self._count(route, "requests")
+        await self._delay()
+
+        if self._over_rate(service) or (self.args.throttle_rate and self.random.random() < self.args.throttle_rate):
+            self._count(route, "throttled")
+            return web.json_response(
+                {"error": "Too Many Requests"}, status=429, headers={"Retry-After": str(self.args.retry_after)}
+            )
+        if self.args.error_rate and self.random.random() < self.args.error_rate:
+            self._count(route, "errors")
+            return web.json_response({"error": "Internal Server Error"}, status=500)
+
+        if self.args.record:
+            self._count(route, "recorded")
+            upstream = NSPD_UPSTREAM if service == "nspd" else TORGI_UPSTREAM
+            return await self._proxy(request, upstream)
+
+        if self.args.replay:
+            recorded = self.recorder.load(request.path_qs)
+            if recorded is not None:
+                self._count(route, "replayed")
+                return web.Response(status=recorded["status"], text=recorded["body"], content_type=recorded["content_type"])
+
+        data = build(request)
+        if data is None:
+            self._count(route, "errors")
+            return web.json_response({"error": "Not Found"}, status=404)
+        self._count(route, "ok")
+        return web.Response(
+            body=json.dumps(data, ensure_ascii=False).encode("utf-8"), content_type="application/json"
+        )
+
+    def build_search(self, request: web.Request) -> Dict[str, Any]:
+        query = request.query
+        subjects = tuple(code for code in query.get("dynSubjRF", "").split(",") if code)
+        statuses = tuple(code for code in query.get("lotStatus", "").split(",") if code)
+        page = int(query.get("page", 0))
+        # Как и настоящий API, не отдаем больше max_page_size лотов за раз
+        size = max(1, min(int(query.get("size", 10)), self.args.max_page_size))
+
+        lots = query_lots(subjects, statuses, query.get("aucStartFrom"), query.get("aucStartTo"), self.args.lots_per_pair)
+        content = list(lots[page * size:(page + 1) * size])
+        total_pages = math.ceil(len(lots) / size)
+        return {
+            "content": content,
+            "pageable": {"pageNumber": page, "pageSize": size, "offset": page * size, "paged": True, "unpaged": False},
+            "totalPages": total_pages,
+            "totalElements": len(lots),
+            "last": page >= total_pages - 1,
+            "numberOfElements": len(content),
+            "first": page == 0,
+            "size": size,
+            "number": page,
+            "empty": not content,
+        }
+
+    def build_lot_card(self, request: web.Request) -> Optional[Dict[str, Any]]:
+        parsed = parse_lot_id(request.match_info["lot_id"])
+        if parsed is None:
+            return None
+        subject, status, index = parsed
+        if index >= _lots_count(subject, status, self.args.lots_per_pair):
+            return None
+        return build_lot_card(build_lot(subject, status, index))
+
+    def build_geoportal(self, request: web.Request) -> Dict[str, Any]:
+        return build_geoportal_response(request.query.get("query", "").strip())
+
+    async def search(self, request: web.Request) -> web.Response:
+        return await self.respond(request, "search", "torgi", self.build_search)
+
+    async def lot_card(self, request: web.Request) -> web.Response:
+        return await self.respond(request, "lotcard", "torgi", self.build_lot_card)
+
+    async def geoportal(self, request: web.Request) -> web.Response:
+        return await self.respond(request, "geoportal", "nspd", self.build_geoportal)
+
+    async def home(self, request: web.Request) -> web.Response:
+        return web.Response(text="mock upstream", content_type="text/html")
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        uptime = time.monotonic() - self.started
+        return web.json_response({"uptime": round(uptime, 1), "routes": self.stats})
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        if self.session is not None:
+            await self.session.close()
+        logger.info("Mock upstream stopped", **self.stats)
+
+
+def create_app(args: argparse.Namespace) -> web.Application:
+    mock = MockUpstream(args)
+    app = web.Application()
+    app.router.add_get("/new/api/public/lotcards/search", mock.search)
+    app.router.add_get("/new/api/public/lotcards/{lot_id}", mock.lot_card)
+    app.router.add_get("/api/geoportal/v2/search/geoportal", mock.geoportal)
+    app.router.add_get("/", mock.home)
+    app.router.add_get("/_stats", mock.get_stats)
+    app.on_cleanup.append(mock.on_cleanup)
+    return app
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="Порт для TORGI_BASE_URL")
+    parser.add_argument("--nspd-port", type=int, default=8081, help="Порт для NSPD_BASE_URL (0 - только основной порт)")
+    parser.add_argument("--lots-per-pair", type=int, default=200, help="Среднее количество лотов на пару субъект × статус")
+    parser.add_argument("--max-page-size", type=int, default=100, help="Наибольший размер страницы поиска")
+    parser.add_argument("--latency", type=float, default=0, help="Базовая задержка ответа, мс")
+    parser.add_argument("--jitter", type=float, default=0, help="Случайная добавка к задержке (0..jitter), мс")
+    parser.add_argument("--slow-rate", type=float, default=0, help="Доля медленных ответов (хвост задержек)")
+    parser.add_argument("--slow-latency", type=float, default=5000, help="Задержка медленного ответа, мс")
+    parser.add_argument("--error-rate", type=float, default=0, help="Доля ответов 500")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="Доля ответов 429 независимо от нагрузки")
+    parser.add_argument("--max-rps", type=float, default=0, help="Запросов в секунду на сервис, сверх которых отвечаем 429 (0 - без ограничения)")
+    parser.add_argument("--retry-after", type=int, default=1, help="Значение заголовка Retry-After в ответах 429, сек")
+    parser.add_argument("--seed", type=int, default=None, help="Seed генератора случайных инъекций")
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument("--record", metavar="DIR", help="Проксировать запросы к настоящим сервисам и записывать ответы")
+    recording.add_argument("--replay", metavar="DIR", help="Отдавать записанные ответы (для остальных запросов - синтетические данные)")
+    return parser.parse_args(argv)
+
+
+async def serve(args: argparse.Namespace) -> None:
+    runner = web.AppRunner(create_app(args))
+    await runner.setup()
+    ports = [args.port] + ([args.nspd_port] if args.nspd_port else [])
+    for port in ports:
+        await web.TCPSite(runner, args.host, port).start()
+    logger.info(
+        "Mock upstream started",
+        torgi_base_url=f"http://{args.host}:{args.port}",
+        nspd_base_url=f"http://{args.host}:{args.nspd_port or args.port}",
+        mode="record" if args.record else "replay" if args.replay else "synthetic"
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
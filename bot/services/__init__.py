@@ -1,5 +1,21 @@
 """Сервисы для работы с внешними API и хранилищами данных"""
 
 # Импорт основных сервисов для удобства использования
-from bot.services.redis_service import init_redis, RedisService, FakeRedis
-from bot.services.data_fetcher import fetch_data, fetch_page_data
\ No newline at end of file
+from bot.services.redis_service import init_redis, get_redis_service, RedisService, FakeRedis
+from bot.services.data_fetcher import fetch_data, fetch_data_iter, fetch_page_data, request_page, PageResponse, FetchReport, probe_page_size, get_page_size, query_fingerprint
+from bot.services.http_client import init_http_client, get_http_client, HttpClient
+from bot.services.query_planner import fetch_data_planned, plan_shards, Shard
+from bot.services.delta_sync import fetch_data_delta
+from bot.services.query_cache import fetch_data_cached, cache_stats
+from bot.services.single_flight import fetch_data_shared
+from bot.services.rate_limiter import init_rate_limiter, close_rate_limiter, get_rate_limiter, RateLimiter
+from bot.services.upstream import configure_upstreams
+from bot.services.hedging import init_hedging, get_hedger, Hedger
+from bot.services.circuit_breaker import init_circuit_breakers, get_breaker, unavailable_hosts, CircuitBreaker
+from bot.services.enrichment import get_additional_data_async, iter_additional_data, extract_additional_data
+from bot.services.lot_cache import init_lot_cache, close_lot_cache, get_lot_cache, LotCache
+from bot.services.geocode_cache import init_geocode_cache, close_geocode_cache, get_geocode_cache, GeocodeCache
+from bot.services.processing_pool import init_processing_pool, close_processing_pool, get_processing_pool, ProcessingPool
+from bot.services.export_queue import init_export_queue, get_export_queue, ExportQueue, ExportJob
+from bot.services.export_scheduler import init_export_scheduler, get_export_scheduler, ExportScheduler, ExportCost
+from bot.services.export import run_export, ExportStatus
@@ -0,0 +1,155 @@
+from typing import Optional, Dict, Any, List
+from urllib.parse import urlparse
+import threading
+import time
+import structlog
+
+from bot.config import CircuitBreakerConfig
+
+
+logger = structlog.get_logger()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для одного внешнего хоста (потокобезопасный)
+
+    closed - запросы идут как обычно; после failure_threshold ошибок подряд предохранитель
+    размыкается. open - запросы сразу отклоняются, пока не пройдет recovery_timeout.
+    half_open - пропускается пробный запрос: успех замыкает предохранитель, ошибка снова размыкает.
+    Пробный запрос, завершившийся без результата (отмена), освобождает слот (release); если
+    результата нет дольше recovery_timeout, пробные слоты выдаются заново.
+    Ошибкой считаются сетевые сбои, таймауты и ответы 5xx.
+    """
+    def __init__(self, name: str, config: Optional[CircuitBreakerConfig] = None):
+        self.name = name
+        self.config = config or CircuitBreakerConfig()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.half_open_since = 0.0
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0, "probe_timeouts": 0}
+        self._lock = threading.Lock()
+        self.logger = logger.bind(service="circuit_breaker", host=name)
+
+    def _set_state(self, state: str) -> None:
+        if state == self.state:
+            return
+        self.logger.warning("Circuit breaker state changed", old=self.state, new=state, failures=self.failures)
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.stats["opened"] += 1
+        if state == HALF_OPEN:
+            self.half_open_calls = 0
+            self.half_open_since = time.monotonic()
+
+    def _advance(self, now: float) -> None:
+        """Переходы по времени: open -> half_open и повторная выдача зависших пробных слотов"""
+        if self.state == OPEN and now - self.opened_at >= self.config.recovery_timeout:
+            self._set_state(HALF_OPEN)
+        elif (
+            self.state == HALF_OPEN
+            and self.half_open_calls >= self.config.half_open_max_calls
+            and now - self.half_open_since >= self.config.recovery_timeout
+        ):
+            # Пробные запросы так и не вернули результата - пропускаем новые
+            self.logger.warning("Circuit breaker probes timed out", calls=self.half_open_calls)
+            self.stats["probe_timeouts"] += 1
+            self.half_open_calls = 0
+            self.half_open_since = now
+
+    def _rejecting(self) -> bool:
+        if self.state == OPEN:
+            return True
+        return self.state == HALF_OPEN and self.half_open_calls >= self.config.half_open_max_calls
+
+    @property
+    def is_open(self) -> bool:
+        """Отклоняет ли предохранитель запросы прямо сейчас (open или все пробные слоты заняты)"""
+        with self._lock:
+            self._advance(time.monotonic())
+            return self._rejecting()
+
+    def allow_request(self) -> bool:
+        """Можно ли выполнить запрос (при отказе запрос учитывается как отклоненный)"""
+        with self._lock:
+            self._advance(time.monotonic())
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self.half_open_calls < self.config.half_open_max_calls:
+                self.half_open_calls += 1
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def release(self) -> None:
+        """Освобождает пробный слот запроса, завершившегося без результата (отмена, внутренняя ошибка)"""
+        with self._lock:
+            if self.state == HALF_OPEN and self.half_open_calls > 0:
+                self.half_open_calls -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.stats["successes"] += 1
+            self.failures = 0
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.stats["failures"] += 1
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.config.failure_threshold:
+                self._set_state(OPEN)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, **self.stats}
+
+
+# Предохранители по хостам (host:port)
+breakers: Dict[str, CircuitBreaker] = {}
+breakers_config = CircuitBreakerConfig()
+_breakers_lock = threading.Lock()
+
+
+def init_circuit_breakers(config) -> None:
+    """Задает настройки предохранителей (уже созданные предохранители сбрасываются)"""
+    global breakers_config
+    with _breakers_lock:
+        breakers_config = config.circuit_breaker
+        breakers.clear()
+    logger.info(
+        "Circuit breakers initialized",
+        failure_threshold=breakers_config.failure_threshold,
+        recovery_timeout=breakers_config.recovery_timeout
+    )
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    """Возвращает предохранитель хоста, к которому относится URL"""
+    host = urlparse(url).netloc or url
+    with _breakers_lock:
+        breaker = breakers.get(host)
+        if breaker is None:
+            breaker = breakers[host] = CircuitBreaker(host, breakers_config)
+        return breaker
+
+
+def unavailable_hosts() -> List[str]:
+    """Хосты, запросы к которым сейчас отклоняются"""
+    with _breakers_lock:
+        current = list(breakers.values())
+    return [breaker.name for breaker in current if breaker.is_open]
+
+
+def get_stats() -> Dict[str, Any]:
+    """Возвращает состояние и счетчики всех предохранителей"""
+    with _breakers_lock:
+        current = list(breakers.values())
+    return {breaker.name: breaker.get_stats() for breaker in current}
@@ -0,0 +1,93 @@
+from typing import Optional
+import time
+import structlog
+
+
+logger = structlog.get_logger()
+
+
+class AdaptiveConcurrency:
+    """
+    Адаптивный размер окна одновременных запросов (AIMD)
+
+    Окно растет на единицу после каждого полного окна быстрых и успешных
+    ответов и уменьшается вдвое при 429/5xx/таймаутах - не чаще одного раза
+    за время ответа: ошибки запросов, отправленных до последнего уменьшения,
+    относятся к уже учтенной перегрузке и окно повторно не уменьшают.
+    """
+    def __init__(
+        self,
+        min_limit: int = 2,
+        max_limit: int = 16,
+        initial: Optional[int] = None,
+        slow_factor: float = 2.0,
+        ewma_alpha: float = 0.2
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        start = initial if initial is not None else self.min_limit
+        self.limit = min(self.max_limit, max(self.min_limit, start))
+        self.slow_factor = slow_factor
+        self.ewma_alpha = ewma_alpha
+
+        self.baseline_latency: Optional[float] = None
+        self.avg_latency: Optional[float] = None
+        self._successes = 0
+        self._last_decrease = float("-inf")
+        self.stats = {
+            "successes": 0, "failures": 0, "ignored_failures": 0, "increases": 0, "decreases": 0, "peak": self.limit
+        }
+        self.logger = logger.bind(service="adaptive_concurrency")
+
+    def _observe_latency(self, latency: float) -> bool:
+        """Обновляет оценки задержки и возвращает True, если ответ был быстрым"""
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        else:
+            self.avg_latency = self.ewma_alpha * latency + (1 - self.ewma_alpha) * self.avg_latency
+
+        if self.baseline_latency is None or latency < self.baseline_latency:
+            self.baseline_latency = latency
+
+        return latency <= self.baseline_latency * self.slow_factor
+
+    def on_success(self, latency: float) -> None:
+        """Учитывает успешный ответ"""
+        self.stats["successes"] += 1
+        if not self._observe_latency(latency):
+            # Ответ медленный - окно не увеличиваем
+            self._successes = 0
+            return
+
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.max_limit:
+            self.limit += 1
+            self._successes = 0
+            self.stats["increases"] += 1
+            self.stats["peak"] = max(self.stats["peak"], self.limit)
+            self.logger.debug("Concurrency increased", limit=self.limit, latency=round(latency, 3))
+
+    def on_failure(self, reason: str, started_at: Optional[float] = None) -> None:
+        """
+        Учитывает перегрузку апстрима (429, 5xx, таймаут)
+
+        Args:
+            reason: Причина (для лога)
+            started_at: Время отправки запроса (time.monotonic); если не задано,
+                считается, что запрос отправлен за среднее время ответа до текущего момента
+        """
+        self.stats["failures"] += 1
+        self._successes = 0
+        now = time.monotonic()
+        if started_at is None:
+            started_at = now - (self.avg_latency or 0.0)
+        if started_at < self._last_decrease:
+            self.stats["ignored_failures"] += 1
+            return
+
+        new_limit = max(self.min_limit, self.limit // 2)
+        if new_limit < self.limit:
+            self.limit = new_limit
+            self._last_decrease = now
+            self.stats["decreases"] += 1
+            self.logger.info("Concurrency decreased", limit=self.limit, reason=reason)
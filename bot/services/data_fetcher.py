@@ -1,26 +1,212 @@
-from typing import List, Dict, Any, Tuple, Callable, Optional, Awaitable, Union
+from typing import List, Dict, Any, Tuple, Callable, Optional, Awaitable, Union, AsyncIterator
+from contextlib import aclosing
+from dataclasses import dataclass, field
 from urllib.parse import urlencode
 import aiohttp
 import structlog
 from math import ceil
 import asyncio
+import hashlib
+import heapq
 import json
 import os
+import random
 import time
 
+from bot.config import FetchConfig
+from bot.services.concurrency import AdaptiveConcurrency
+from bot.services.http_client import get_http_client
+from bot.services import json_codec
+from bot.services.redis_service import get_redis_service
+from bot.services.rate_limiter import get_rate_limiter, parse_retry_after
+from bot.services.hedging import get_hedger
+from bot.services.circuit_breaker import get_breaker
+from bot.services.upstream import search_url, lot_card_url
+
 
 logger = structlog.get_logger()
 
+# Код категории (2 - Земельные участки)
+CAT_CODE = "2"
 
-async def fetch_page_data(
+# Статусы, после которых лот больше не меняется
+FINAL_LOT_STATUSES = ("SUCCEED", "FAILED", "CANCELED")
+
+# Размеры страниц, которые проверяются при автоопределении (по убыванию)
+PAGE_SIZE_CANDIDATES = [1000, 500, 200, 100, 50, 20, 10]
+
+# Размер страницы, найденный при запуске бота (None - используется значение из конфигурации)
+_probed_page_size: Optional[int] = None
+
+
+@dataclass
+class PageResponse:
+    """Результат запроса одной страницы поиска"""
+    page: int
+    data: Optional[Dict[str, Any]] = None
+    status: Optional[int] = None
+    error: Optional[str] = None
+    latency: float = 0.0
+    retry_after: Optional[float] = None
+    started_at: Optional[float] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.data is not None
+
+    @property
+    def overloaded(self) -> bool:
+        """Признак перегрузки апстрима (429, 5xx, таймаут)"""
+        return self.error == "timeout" or self.status == 429 or (self.status is not None and self.status >= 500)
+
+    @property
+    def retryable(self) -> bool:
+        """
+        Имеет ли смысл повторять запрос
+
+        Ошибки клиента 4xx, кроме 408 и 429, не повторяются; запрос, отклоненный
+        предохранителем, тоже: страница сразу считается неполученной, а не тратит
+        бюджет повторов на ожидание восстановления хоста.
+        """
+        if self.ok or self.error == "circuit_open":
+            return False
+        if self.status is not None and 400 <= self.status < 500:
+            return self.status in (408, 429)
+        return True
+
+
+@dataclass
+class FetchReport:
+    """Итог загрузки: израсходованные повторы и страницы, которые так и не удалось получить"""
+    retry_budget: int = 100
+    retries: int = 0
+    failed_pages: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        return not self.failed_pages
+
+    def take_retry(self) -> bool:
+        """Списывает один повтор из бюджета задачи"""
+        if self.retries >= self.retry_budget:
+            return False
+        self.retries += 1
+        return True
+
+
+def checkpoint_matches(saved: Dict[str, Any], current: Dict[str, Any], ttl: int) -> bool:
+    """
+    Можно ли продолжить загрузку по контрольной точке
+
+    Совпадения totalElements недостаточно: лоты могли смениться при том же
+    количестве. Поэтому сверяются и размер страницы, и ID лотов первой страницы
+    (новые лоты появляются в ее начале), а точка старше ttl не используется.
+    """
+    created_at = saved.get("created_at")
+    return (
+        saved.get("total_elements") == current["total_elements"]
+        and saved.get("page_size") == current["page_size"]
+        and saved.get("first_ids") == current["first_ids"]
+        and created_at is not None
+        and time.time() - created_at < ttl
+    )
+
+
+def backoff_delay(attempt: int, fetch_config: FetchConfig, retry_after: Optional[float] = None) -> float:
+    """Экспоненциальная задержка с джиттером; Retry-After от сервера имеет приоритет как нижняя граница"""
+    delay = min(fetch_config.retry_max_delay, fetch_config.retry_base_delay * 2 ** (attempt - 1))
+    delay = random.uniform(delay / 2, delay)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+async def acquire_token(url: str) -> None:
+    """
+    Ждет токен общего ограничителя частоты запросов к хосту
+
+    Вызывается до запуска запроса (и до таймера дублирования), чтобы ожидание
+    ограничителя не считалось задержкой ответа. Если предохранитель хоста
+    отклоняет запросы, токен не расходуется.
+    """
+    if not get_breaker(url).is_open:
+        await get_rate_limiter().acquire(url)
+
+
+async def _request_url(url: str, page: int) -> PageResponse:
+    """Выполняет один запрос страницы поиска по готовому URL"""
+    result = PageResponse(page=page)
+    
+    # Хост недоступен - не ждем таймаута
+    breaker = get_breaker(url)
+    if not breaker.allow_request():
+        result.error = "circuit_open"
+        return result
+    
+    limiter = get_rate_limiter()
+    started = None
+    settled = False
+    try:
+        # Токен ограничителя частоты уже получен (acquire_token, до таймера дублирования)
+        started = result.started_at = time.monotonic()
+
+        # Выполняем запрос через общий пул соединений
+        session = get_http_client().session
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=60)) as response:
+            result.status = response.status
+            if response.status >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            settled = True
+            if response.status != 200:
+                logger.error(f"Error fetching page {page}: {response.status}")
+                result.error = "http"
+                result.retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if response.status == 429:
+                    # Притормаживаем все запросы к хосту, а не только эту страницу
+                    await limiter.penalize(url, result.retry_after or 1.0)
+                return result
+            
+            # Парсим JSON
+            result.data = await json_codec.read_json(response, "search")
+                
+    except aiohttp.ClientError as e:
+        logger.error(f"Network error while fetching page {page}: {e}")
+        result.error = "network"
+        breaker.record_failure()
+        settled = True
+    except asyncio.TimeoutError:
+        logger.error(f"Timeout while fetching page {page}")
+        result.error = "timeout"
+        breaker.record_failure()
+        settled = True
+    except ValueError as e:
+        logger.error(f"JSON decode error while fetching page {page}: {e}")
+        result.error = "decode"
+    except Exception as e:
+        logger.error(f"Unknown error while fetching page {page}: {e}")
+        result.error = "unknown"
+    finally:
+        # Отмененный (например, проигравший дублирующий) запрос не должен занимать пробный слот
+        if not settled:
+            breaker.release()
+        if started is not None:
+            result.latency = time.monotonic() - started
+    
+    return result
+
+
+async def request_page(
     subjects: List[str],
     statuses: Union[List[str], str],
     page: int,
     date_from: Optional[str] = None,
-    date_to: Optional[str] = None
-) -> Optional[Dict[str, Any]]:
+    date_to: Optional[str] = None,
+    page_size: int = 10
+) -> PageResponse:
     """
-    Получает данные с одной страницы API
+    Запрашивает одну страницу API и возвращает подробный результат
     
     Args:
         subjects: Список выбранных субъектов
@@ -28,9 +214,10 @@ async def fetch_page_data(
         page: Номер страницы (начинается с 0)
         date_from: Начальная дата (опционально)
         date_to: Конечная дата (опционально)
+        page_size: Размер страницы
         
     Returns:
-        Dict[str, Any]: Данные с одной страницы
+        PageResponse: Данные страницы, HTTP-статус, ошибка и время ответа
     """
     # Объединяем субъекты через запятую
     subjects_str = ",".join(subjects)
@@ -45,9 +232,9 @@ async def fetch_page_data(
     params = {
         "dynSubjRF": subjects_str,
         "lotStatus": statuses_str,
-        "catCode": "2",  # Код категории (2 - Земельные участки)
+        "catCode": CAT_CODE,
         "page": page,
-        "size": 10,  # Размер страницы
+        "size": page_size,  # Размер страницы
         "sort": "firstVersionPublicationDate,desc"  # Сортировка по дате публикации
     }
     
@@ -58,61 +245,192 @@ async def fetch_page_data(
         params["aucStartTo"] = date_to
     
     # Формируем URL
-    url = f"https://torgi.gov.ru/new/api/public/lotcards/search?{urlencode(params, doseq=True)}"
+    url = f"{search_url()}?{urlencode(params, doseq=True)}"
     logger.info(f"Fetching data from URL: {url}")
     
-    try:
-        # Выполняем запрос
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=60) as response:
-                if response.status != 200:
-                    logger.error(f"Error fetching page {page}: {response.status}")
-                    return None
-                
-                # Парсим JSON
-                response_json = await response.json()
-                return response_json
-                
-    except aiohttp.ClientError as e:
-        logger.error(f"Network error while fetching page {page}: {e}")
-        return None
-    except asyncio.TimeoutError:
-        logger.error(f"Timeout while fetching page {page}")
-        return None
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error while fetching page {page}: {e}")
-        return None
-    except Exception as e:
-        logger.error(f"Unknown error while fetching page {page}: {e}")
-        return None
+    # Медленный запрос дублируется (если включено), используется первый успешный ответ.
+    # Задержка сильно зависит от размера страницы, поэтому статистика ведется по каждому размеру
+    return await get_hedger().run(
+        f"search:{page_size}", lambda: _request_url(url, page), lambda result: result.ok, lambda: acquire_token(url)
+    )
 
 
-async def fetch_data(
-    selected_subjects: List[str],
-    selected_statuses: List[str],
+async def fetch_page_data(
+    subjects: List[str],
+    statuses: Union[List[str], str],
+    page: int,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
-    progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None
-) -> Optional[List[Dict[str, Any]]]:
+    page_size: int = 10
+) -> Optional[Dict[str, Any]]:
     """
-    Получает данные с сервера по выбранным параметрам
+    Получает данные с одной страницы API
     
     Args:
-        selected_subjects: Список выбранных субъектов
-        selected_statuses: Список выбранных статусов
+        subjects: Список выбранных субъектов
+        statuses: Статус(ы) лотов (строка или список строк)
+        page: Номер страницы (начинается с 0)
         date_from: Начальная дата (опционально)
         date_to: Конечная дата (опционально)
-        progress_callback: Коллбэк-функция для обновления прогресса
+        page_size: Размер страницы
         
     Returns:
-        List[Dict[str, Any]]: Список данных
+        Dict[str, Any]: Данные с одной страницы
     """
-    # Проверяем входные данные
-    if not selected_subjects or not selected_statuses:
-        logger.error("No subjects or statuses provided")
+    result = await request_page(subjects, statuses, page, date_from, date_to, page_size)
+    return result.data
+
+
+async def _request_lot_card_url(url: str, lot_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+    """Выполняет один запрос карточки лота"""
+    breaker = get_breaker(url)
+    if not breaker.allow_request():
+        return None
+    settled = False
+    try:
+        session = get_http_client().session
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            settled = True
+            if response.status != 200:
+                logger.error(f"Error fetching lot card {lot_id}: {response.status}")
+                return None
+            return await json_codec.read_json(response, "lotcard")
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        logger.error(f"Timeout or network error while fetching lot card {lot_id}: {e!r}")
+        breaker.record_failure()
+        settled = True
         return None
+    except Exception as e:
+        logger.error(f"Error while fetching lot card {lot_id}: {e}")
+        return None
+    finally:
+        if not settled:
+            breaker.release()
+
+
+async def request_lot_card(lot_id: str, timeout: float = 5) -> Optional[Dict[str, Any]]:
+    """
+    Получает карточку лота по его ID
     
-    all_data = []
+    Args:
+        lot_id: ID лота
+        timeout: Таймаут запроса в секундах
+        
+    Returns:
+        Dict[str, Any]: Карточка лота или None при ошибке
+    """
+    url = lot_card_url(lot_id)
+    return await get_hedger().run(
+        "lotcard", lambda: _request_lot_card_url(url, lot_id, timeout), lambda card: card is not None,
+        lambda: acquire_token(url)
+    )
+
+
+def query_fingerprint(
+    subjects: List[str],
+    statuses: Union[List[str], str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+) -> str:
+    """Возвращает канонический отпечаток параметров поиска (не зависит от порядка субъектов и статусов)"""
+    if isinstance(statuses, str):
+        statuses = statuses.split(",")
+    payload = json.dumps({
+        "subjects": sorted(subjects),
+        "statuses": sorted(statuses),
+        "catCode": CAT_CODE,
+        "date_from": date_from,
+        "date_to": date_to,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def get_page_size(fetch_config: Optional[FetchConfig] = None) -> int:
+    """Возвращает размер страницы: найденный при запуске или из конфигурации"""
+    if _probed_page_size:
+        return _probed_page_size
+    return (fetch_config or FetchConfig()).page_size
+
+
+async def probe_page_size(
+    subjects: List[str],
+    statuses: List[str],
+    max_page_size: int = 1000
+) -> Optional[int]:
+    """
+    Определяет наибольший размер страницы, который соблюдает API
+    
+    Размер считается поддерживаемым, если страница вернула столько элементов,
+    сколько было запрошено (или все элементы, если их меньше).
+    
+    Args:
+        subjects: Субъекты для пробного запроса (чем шире выборка, тем надежнее проверка)
+        statuses: Статусы для пробного запроса
+        max_page_size: Верхняя граница размера страницы
+        
+    Returns:
+        Optional[int]: Найденный размер страницы или None, если определить не удалось
+    """
+    global _probed_page_size
+    
+    for size in [s for s in PAGE_SIZE_CANDIDATES if s <= max_page_size]:
+        result = await request_page(subjects, statuses, 0, page_size=size)
+        if not result.ok or 'content' not in result.data:
+            logger.warning("Page size probe failed", page_size=size, status=result.status, error=result.error)
+            continue
+        
+        total_elements = result.data.get('totalElements', 0)
+        returned = len(result.data['content'])
+        expected = min(size, total_elements)
+        
+        if returned == expected and result.data.get('size', size) == size:
+            _probed_page_size = size
+            logger.info("Page size probed", page_size=size, total_elements=total_elements)
+            return size
+        
+        logger.info("Page size not honoured", page_size=size, returned=returned, expected=expected)
+    
+    logger.warning("Page size probe found no suitable size, using configured value")
+    return None
+
+
+async def _iter_pages(
+    selected_subjects: List[str],
+    selected_statuses: List[str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    fetch_config: Optional[FetchConfig] = None,
+    report: Optional[FetchReport] = None
+) -> AsyncIterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    Загружает страницы поиска скользящим окном и отдает их по мере готовности
+    
+    Неудачные страницы повторяются с экспоненциальной задержкой, не задерживая
+    остальные запросы; страницы, не полученные после всех попыток, попадают в report.
+    
+    Yields:
+        Tuple[int, List[Dict[str, Any]]]: Номер страницы и её содержимое (в порядке получения)
+    """
+    fetch_config = fetch_config or FetchConfig()
+    report = report if report is not None else FetchReport(retry_budget=fetch_config.retry_budget)
+    pending = set()
+    
+    def give_up(page: int, result: Optional[PageResponse], attempts: int) -> None:
+        report.failed_pages.append({
+            "subjects": ",".join(selected_subjects),
+            "statuses": ",".join(selected_statuses),
+            "date_from": date_from,
+            "date_to": date_to,
+            "page": page,
+            "attempts": attempts,
+            "status": result.status if result else None,
+            "error": result.error if result else "exception",
+        })
     
     try:
         # Словарь для хранения общего прогресса
@@ -120,28 +438,63 @@ async def fetch_data(
         
         # Обрабатываем все статусы вместе для совместимости
         # Получаем первую страницу для определения общего количества страниц
-        first_page = await fetch_page_data(selected_subjects, selected_statuses, 0, date_from, date_to)
+        page_size = get_page_size(fetch_config)
+        attempt = 1
+        first_result = await request_page(selected_subjects, selected_statuses, 0, date_from, date_to, page_size)
+        while (first_result.retryable and attempt < fetch_config.retry_max_attempts
+               and report.take_retry()):
+            await asyncio.sleep(backoff_delay(attempt, fetch_config, first_result.retry_after))
+            attempt += 1
+            first_result = await request_page(selected_subjects, selected_statuses, 0, date_from, date_to, page_size)
+        first_page = first_result.data
         
         if not first_page or 'content' not in first_page:
+            if not first_result.ok:
+                give_up(0, first_result, attempt)
             logger.warning(f"No data found for selected statuses")
-            return None
+            return
             
         total_elements = first_page.get('totalElements', 0)
         
         if total_elements == 0:
             logger.warning(f"No elements found for selected statuses")
-            return None
-            
-        # Добавляем данные с первой страницы
-        all_data.extend(first_page['content'])
+            return
+        
+        # Если API урезал страницу, дальше считаем страницы по фактическому размеру
+        returned = len(first_page['content'])
+        if returned < min(page_size, total_elements):
+            logger.warning("Page size capped by API", requested=page_size, returned=returned)
+            page_size = max(1, returned)
         
         # Вычисляем общее количество страниц
-        page_size = 10
         total_pages = (total_elements + page_size - 1) // page_size
         
+        # Восстанавливаем уже загруженные страницы из контрольной точки
+        storage = get_redis_service() if fetch_config.checkpoints else None
+        checkpoint_key = f"{query_fingerprint(selected_subjects, selected_statuses, date_from, date_to)}:{page_size}"
+        restored: Dict[int, List[Dict[str, Any]]] = {}
+        if storage:
+            meta = {
+                "total_elements": total_elements,
+                "page_size": page_size,
+                "total_pages": total_pages,
+                "first_ids": [lot.get("id") for lot in first_page["content"]],
+                "created_at": time.time(),
+            }
+            checkpoint = await storage.get_checkpoint(checkpoint_key)
+            if checkpoint and checkpoint_matches(checkpoint["meta"], meta, fetch_config.checkpoint_ttl):
+                restored = {page: content for page, content in checkpoint["pages"].items() if 0 < page < total_pages}
+                # Возраст считается от первой загрузки, а не от последнего продолжения
+                meta["created_at"] = checkpoint["meta"]["created_at"]
+                logger.info("Resuming fetch from checkpoint", restored_pages=len(restored), total_pages=total_pages)
+            elif checkpoint:
+                # Выдача изменилась или точка устарела - старые страницы могут быть сдвинуты
+                await storage.clear_checkpoint(checkpoint_key)
+            await storage.save_checkpoint_meta(checkpoint_key, meta, ttl=fetch_config.checkpoint_ttl)
+        
         # Обновляем счетчик общего прогресса
         overall_progress["total"] = total_pages
-        overall_progress["current"] = 1
+        overall_progress["current"] = 1 + len(restored)
         
         # Обновляем прогресс для первой страницы
         current_time = time.time()
@@ -149,43 +502,235 @@ async def fetch_data(
             await progress_callback(overall_progress["current"], overall_progress["total"])
             overall_progress["last_callback"] = current_time
         
-        # Загружаем остальные страницы
-        tasks = []
-        for page in range(1, total_pages):
-            tasks.append(fetch_page_data(selected_subjects, selected_statuses, page, date_from, date_to))
+        # Отдаем первую страницу и восстановленные страницы сразу
+        yield 0, first_page['content']
+        for page, content in restored.items():
+            yield page, content
+        
+        # Загружаем остальные страницы скользящим окном адаптивного размера:
+        # как только одна страница готова, сразу запускается следующая
+        window = AdaptiveConcurrency(
+            min_limit=fetch_config.min_concurrency,
+            max_limit=fetch_config.max_concurrency,
+            initial=5
+        )
+        missing_pages = [page for page in range(1, total_pages) if page not in restored]
+        next_index = 0
+        failed_pages = 0
+        
+        # Попытки по страницам и очередь повторов (время готовности, номер страницы)
+        attempts: Dict[int, int] = {}
+        retry_queue: List[Tuple[float, int]] = []
+        task_pages: Dict[asyncio.Task, int] = {}
+        
+        def start(page: int) -> None:
+            attempts[page] = attempts.get(page, 0) + 1
+            task = asyncio.create_task(
+                request_page(selected_subjects, selected_statuses, page, date_from, date_to, page_size)
+            )
+            task_pages[task] = page
+            pending.add(task)
+        
+        while next_index < len(missing_pages) or pending or retry_queue:
+            # Дозаполняем окно до текущего лимита: сначала готовые повторы, затем новые страницы
+            now = time.monotonic()
+            while retry_queue and retry_queue[0][0] <= now and len(pending) < window.limit:
+                start(heapq.heappop(retry_queue)[1])
+            while next_index < len(missing_pages) and len(pending) < window.limit:
+                start(missing_pages[next_index])
+                next_index += 1
             
-            # Ограничиваем количество одновременных запросов
-            if len(tasks) >= 5 or page == total_pages - 1:
-                # Дожидаемся выполнения всех запросов
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # Обрабатываем результаты
-                for result in results:
-                    if isinstance(result, Exception):
-                        logger.error(f"Error while fetching page data: {result}")
-                        continue
-                        
-                    if result and 'content' in result:
-                        all_data.extend(result['content'])
-                        
-                    # Увеличиваем счетчик прогресса
+            if not pending:
+                # В полете ничего нет - ждем ближайший повтор
+                await asyncio.sleep(max(0.0, retry_queue[0][0] - time.monotonic()))
+                continue
+            
+            wait_timeout = max(0.0, retry_queue[0][0] - now) if retry_queue else None
+            done, pending = await asyncio.wait(
+                pending, timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            
+            # Обрабатываем результаты
+            ready = []
+            for task in done:
+                page = task_pages.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    logger.error(f"Error while fetching page data: {e}")
+                    give_up(page, None, attempts[page])
                     overall_progress["current"] += 1
+                    failed_pages += 1
+                    continue
                 
-                # Обновляем прогресс только изредка (каждые 2 секунды или каждую 20-ю страницу)
-                current_time = time.time()
-                if progress_callback and (current_time - overall_progress["last_callback"] >= 2 or 
-                                         overall_progress["current"] % 20 == 0 or
-                                         overall_progress["current"] >= overall_progress["total"]):
-                    await progress_callback(min(overall_progress["current"], overall_progress["total"]), 
-                                          overall_progress["total"])
-                    overall_progress["last_callback"] = current_time
+                if result.overloaded:
+                    window.on_failure(
+                        result.error if result.error != "http" else str(result.status), result.started_at
+                    )
+                elif result.ok:
+                    window.on_success(result.latency)
                 
-                # Сбрасываем список задач
-                tasks = []
+                if result.data and 'content' in result.data:
+                    ready.append((result.page, result.data['content']))
+                    if storage:
+                        await storage.save_checkpoint_page(
+                            checkpoint_key, result.page, result.data['content'], ttl=fetch_config.checkpoint_ttl
+                        )
+                elif (result.retryable and attempts[page] < fetch_config.retry_max_attempts
+                      and report.take_retry()):
+                    # Повторяем позже, не занимая слот окна на время ожидания
+                    delay = backoff_delay(attempts[page], fetch_config, result.retry_after)
+                    heapq.heappush(retry_queue, (time.monotonic() + delay, page))
+                    logger.info("Page scheduled for retry", page=page, attempt=attempts[page], delay=round(delay, 2))
+                    continue
+                else:
+                    give_up(page, result, attempts[page])
+                    failed_pages += 1
+                    
+                # Увеличиваем счетчик прогресса
+                overall_progress["current"] += 1
+            
+            # Обновляем прогресс только изредка (каждые 2 секунды или каждую 20-ю страницу)
+            current_time = time.time()
+            if progress_callback and (current_time - overall_progress["last_callback"] >= 2 or 
+                                     overall_progress["current"] % 20 == 0 or
+                                     overall_progress["current"] >= overall_progress["total"]):
+                await progress_callback(min(overall_progress["current"], overall_progress["total"]), 
+                                      overall_progress["total"])
+                overall_progress["last_callback"] = current_time
+            
+            for page, content in ready:
+                yield page, content
         
         # Финальное обновление прогресса
         if progress_callback:
             await progress_callback(overall_progress["total"], overall_progress["total"])
+        
+        # Контрольная точка нужна только для незавершенных загрузок
+        if storage and failed_pages == 0:
+            await storage.clear_checkpoint(checkpoint_key)
+        
+        if failed_pages:
+            logger.warning(
+                "Some pages could not be fetched",
+                failed_pages=[failed["page"] for failed in report.failed_pages],
+                retries_used=report.retries,
+                retry_budget=report.retry_budget
+            )
+        
+        logger.info(
+            "All pages fetched",
+            failed_pages=failed_pages,
+            retries_used=report.retries,
+            restored_pages=len(restored),
+            page_size=page_size,
+            total_pages=total_pages,
+            concurrency_limit=window.limit,
+            concurrency_peak=window.stats["peak"],
+            avg_latency=round(window.avg_latency or 0, 3),
+            decode=json_codec.get_stats(),
+            hedging=get_hedger().get_stats(),
+            **get_http_client().get_stats()
+        )
+    finally:
+        # При отмене, досрочной остановке или ошибке не оставляем висящих запросов
+        for task in pending:
+            task.cancel()
+
+
+async def fetch_data_iter(
+    selected_subjects: List[str],
+    selected_statuses: List[str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    fetch_config: Optional[FetchConfig] = None,
+    max_items: Optional[int] = None,
+    report: Optional[FetchReport] = None
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Потоково получает данные с сервера: отдает содержимое каждой страницы сразу после загрузки
+    
+    Страницы отдаются в порядке получения, а не в порядке номеров. При выходе из
+    цикла (break, отмена задачи) незавершенные запросы отменяются; для немедленной
+    остановки используйте contextlib.aclosing.
+    
+    Args:
+        selected_subjects: Список выбранных субъектов
+        selected_statuses: Список выбранных статусов
+        date_from: Начальная дата (опционально)
+        date_to: Конечная дата (опционально)
+        progress_callback: Коллбэк-функция для обновления прогресса
+        fetch_config: Настройки параллельной загрузки страниц
+        max_items: Остановиться после получения указанного количества лотов (опционально)
+        report: Отчет о повторах и неполученных страницах (опционально)
+        
+    Yields:
+        List[Dict[str, Any]]: Лоты одной страницы
+    """
+    # Проверяем входные данные
+    if not selected_subjects or not selected_statuses:
+        logger.error("No subjects or statuses provided")
+        return
+    
+    received = 0
+    async with aclosing(_iter_pages(
+        selected_subjects, selected_statuses, date_from, date_to, progress_callback, fetch_config, report
+    )) as pages:
+        async for _, content in pages:
+            if max_items is not None:
+                content = content[:max_items - received]
+            received += len(content)
+            if content:
+                yield content
+            
+            if max_items is not None and received >= max_items:
+                logger.info("Stopped streaming after item limit", max_items=max_items)
+                return
+
+
+async def fetch_data(
+    selected_subjects: List[str],
+    selected_statuses: List[str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    fetch_config: Optional[FetchConfig] = None,
+    report: Optional[FetchReport] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Получает данные с сервера по выбранным параметрам
+    
+    Args:
+        selected_subjects: Список выбранных субъектов
+        selected_statuses: Список выбранных статусов
+        date_from: Начальная дата (опционально)
+        date_to: Конечная дата (опционально)
+        progress_callback: Коллбэк-функция для обновления прогресса
+        fetch_config: Настройки параллельной загрузки страниц
+        report: Отчет о повторах и неполученных страницах (опционально)
+        
+    Returns:
+        List[Dict[str, Any]]: Список данных
+    """
+    # Проверяем входные данные
+    if not selected_subjects or not selected_statuses:
+        logger.error("No subjects or statuses provided")
+        return None
+    
+    try:
+        # Данные страниц храним по номеру, чтобы сохранить порядок сортировки
+        pages_content: Dict[int, List[Dict[str, Any]]] = {}
+        async with aclosing(_iter_pages(
+            selected_subjects, selected_statuses, date_from, date_to, progress_callback, fetch_config, report
+        )) as pages:
+            async for page, content in pages:
+                pages_content[page] = content
+        
+        if not pages_content:
+            return None
+        
+        all_data = [item for page in sorted(pages_content) for item in pages_content[page]]
             
         logger.info(f"Fetched {len(all_data)} items")
         return all_data
@@ -0,0 +1,239 @@
+from typing import List, Dict, Any, Callable, Optional, Awaitable
+from datetime import datetime, timezone
+import asyncio
+import structlog
+
+from bot.config import FetchConfig
+from bot.services.data_fetcher import (
+    request_page,
+    request_lot_card,
+    get_page_size,
+    query_fingerprint,
+    FetchReport,
+    FINAL_LOT_STATUSES,
+)
+from bot.services.query_planner import fetch_data_planned, merge_results, PUBLICATION_DATE_FIELD
+from bot.services.redis_service import get_redis_service
+
+
+logger = structlog.get_logger()
+
+
+# Поля лота с датами, после которых меняется статус (окончание приема заявок, начало торгов)
+STATUS_DEADLINE_FIELDS = ("biddEndTime", "auctionStartDate")
+
+
+def _delta_key(fingerprint: str) -> str:
+    return f"delta:{fingerprint}"
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def status_may_change(lot: Dict[str, Any], now: datetime) -> bool:
+    """
+    Может ли статус лота измениться без отмены
+
+    Незавершенный лот меняет статус после окончания приема заявок или начала
+    торгов; пока эти даты не наступили, его статус меняет только отмена или
+    приостановка, которые видны по уменьшению totalElements. Лоты без дат
+    считаются изменяемыми.
+    """
+    if lot.get("lotStatus") in FINAL_LOT_STATUSES:
+        return False
+    deadlines = [_parse_time(lot.get(field)) for field in STATUS_DEADLINE_FIELDS]
+    deadlines = [deadline for deadline in deadlines if deadline is not None]
+    return not deadlines or min(deadlines) <= now
+
+
+async def load_delta_lots(storage, fingerprint: str) -> Optional[List[Dict[str, Any]]]:
+    """Возвращает лоты из состояния синхронизации (его использует и кэш результатов поиска)"""
+    state = await storage.get_cached_data(_delta_key(fingerprint))
+    return state.get("lots") if state else None
+
+
+async def _save_state(storage, fingerprint: str, lots: List[Dict[str, Any]], ttl: int) -> None:
+    """Сохраняет состояние синхронизации: самую свежую дату публикации и известные лоты"""
+    newest = max((lot.get(PUBLICATION_DATE_FIELD) or "" for lot in lots), default="")
+    await storage.cache_data(
+        _delta_key(fingerprint),
+        {"newest": newest, "lots": lots, "synced_at": datetime.now().isoformat()},
+        ttl=ttl
+    )
+
+
+async def _recheck_lots(
+    lots: List[Dict[str, Any]],
+    selected_statuses: List[str],
+    concurrency: int = 10
+) -> List[Dict[str, Any]]:
+    """
+    Перепроверяет лоты по карточке лота
+
+    Лоты, перешедшие в невыбранный статус, исключаются; у остальных обновляются поля из карточки.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def recheck(lot: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            card = await request_lot_card(lot.get("id"))
+        if not card:
+            return lot
+        updated = dict(lot)
+        updated.update({key: value for key, value in card.items() if key in lot})
+        if updated.get("lotStatus") not in selected_statuses:
+            return None
+        return updated
+
+    rechecked = await asyncio.gather(*(recheck(lot) for lot in lots))
+    return [lot for lot in rechecked if lot is not None]
+
+
+async def fetch_data_delta(
+    selected_subjects: List[str],
+    selected_statuses: List[str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    fetch_config: Optional[FetchConfig] = None,
+    report: Optional[FetchReport] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Получает данные в режиме инкрементальной синхронизации
+
+    Выдача API отсортирована по дате публикации (firstVersionPublicationDate,desc),
+    поэтому новые лоты всегда находятся в начале. Страницы листаются с начала до
+    первого уже известного лота. По карточкам перепроверяются только незавершенные
+    лоты, у которых наступила дата смены статуса (status_may_change). Если лотов
+    выпало больше, чем объясняют перепроверки (например, отмены), перепроверок больше,
+    чем страниц полной загрузки, или итоговое количество не совпадает с totalElements,
+    выполняется полная загрузка.
+
+    Args:
+        selected_subjects: Список выбранных субъектов
+        selected_statuses: Список выбранных статусов
+        date_from: Начальная дата (опционально)
+        date_to: Конечная дата (опционально)
+        progress_callback: Коллбэк-функция для обновления прогресса
+        fetch_config: Настройки загрузки
+        report: Отчет о повторах и неполученных страницах (опционально)
+
+    Returns:
+        List[Dict[str, Any]]: Список данных
+    """
+    fetch_config = fetch_config or FetchConfig()
+    report = report if report is not None else FetchReport(retry_budget=fetch_config.retry_budget)
+    storage = get_redis_service()
+
+    async def full_fetch() -> Optional[List[Dict[str, Any]]]:
+        data = await fetch_data_planned(
+            selected_subjects, selected_statuses, date_from, date_to, progress_callback, fetch_config, report
+        )
+        # Неполный результат не годится как основа для следующей синхронизации
+        if data and storage and report.complete:
+            await _save_state(storage, fingerprint, data, fetch_config.delta_ttl)
+        return data
+
+    fingerprint = query_fingerprint(selected_subjects, selected_statuses, date_from, date_to)
+    if not fetch_config.delta_sync or not storage:
+        return await fetch_data_planned(
+            selected_subjects, selected_statuses, date_from, date_to, progress_callback, fetch_config, report
+        )
+
+    state = await storage.get_cached_data(_delta_key(fingerprint))
+    if not state or not state.get("lots"):
+        logger.info("No delta state, running full fetch", fingerprint=fingerprint)
+        return await full_fetch()
+
+    try:
+        known = {lot.get("id"): lot for lot in state["lots"]}
+        newest = state.get("newest") or ""
+        page_size = get_page_size(fetch_config)
+
+        new_lots: List[Dict[str, Any]] = []
+        total_elements = None
+        page = 0
+        reached_known = False
+
+        # Листаем страницы по порядку до известной территории
+        while not reached_known:
+            if page >= fetch_config.delta_max_pages:
+                logger.info("Delta exceeds page limit, running full fetch", pages=page)
+                return await full_fetch()
+
+            result = await request_page(
+                selected_subjects, selected_statuses, page, date_from, date_to, page_size
+            )
+            if not result.ok or "content" not in result.data:
+                logger.warning("Delta page failed, running full fetch", page=page)
+                return await full_fetch()
+
+            if total_elements is None:
+                total_elements = result.data.get("totalElements", 0)
+
+            content = result.data["content"]
+            for lot in content:
+                published = lot.get(PUBLICATION_DATE_FIELD) or ""
+                if lot.get("id") in known or (published and newest and published < newest):
+                    reached_known = True
+                else:
+                    new_lots.append(lot)
+
+            page += 1
+            if progress_callback:
+                await progress_callback(page, page if reached_known else page + 1)
+
+            if len(content) < page_size or page * page_size >= total_elements:
+                break
+
+        # Перепроверяем только лоты, статус которых мог измениться к текущему моменту
+        now = datetime.now(timezone.utc)
+        due = [lot for lot in known.values() if status_may_change(lot, now)]
+        unchanged = [lot for lot in known.values() if not status_may_change(lot, now)]
+        full_pages = -(-total_elements // page_size)
+        if len(due) > full_pages:
+            logger.info("Too many lots to recheck, running full fetch", recheck=len(due), full_pages=full_pages)
+            return await full_fetch()
+
+        rechecked = await _recheck_lots(due, selected_statuses)
+        removed = len(due) - len(rechecked)
+        expected_removed = len(known) + len(new_lots) - total_elements
+        if removed < expected_removed:
+            # Выпали лоты, которые мы не перепроверяли (отмена, приостановка) - не знаем какие
+            logger.info(
+                "Unexplained dropped lots, running full fetch",
+                expected_removed=expected_removed,
+                removed=removed
+            )
+            return await full_fetch()
+
+        all_data = merge_results([new_lots, rechecked, unchanged])
+
+        if len(all_data) != total_elements:
+            logger.warning(
+                "Delta result does not match totalElements, running full fetch",
+                delta_count=len(all_data),
+                total_elements=total_elements
+            )
+            return await full_fetch()
+
+        await _save_state(storage, fingerprint, all_data, fetch_config.delta_ttl)
+        logger.info(
+            f"Fetched {len(all_data)} items (delta)",
+            pages=page,
+            new_lots=len(new_lots),
+            rechecked_lots=len(due),
+            removed_lots=removed
+        )
+        return all_data or None
+
+    except Exception as e:
+        logger.error(f"Error while fetching delta data: {e}")
+        return None
@@ -0,0 +1,187 @@
+from typing import List, Dict, Any, Callable, Optional, Awaitable, AsyncIterator, Tuple
+from contextlib import aclosing
+import asyncio
+import time
+import structlog
+
+from bot.services.data_fetcher import request_lot_card
+from bot.services.circuit_breaker import get_breaker
+from bot.services.upstream import lot_card_url
+from bot.services.lot_cache import get_lot_cache
+
+
+logger = structlog.get_logger()
+
+# Количество полей, которые извлекаются из карточки лота
+ADDITIONAL_FIELDS = 7
+
+
+def extract_additional_data(json_data: Dict[str, Any]) -> tuple:
+    """
+    Извлекает из карточки лота дополнительные данные
+
+    Returns:
+        tuple: (дата аукциона, дата начала приема заявок, ссылка на аукцион,
+                шаг аукциона, задаток, файлы, разрешенное использование)
+    """
+    auction_start_date = json_data.get('auctionStartDate')
+    bidd_start_date = json_data.get('biddStartTime')
+    auction_link = json_data.get('etpUrl')
+    price_step = json_data.get('priceStep')
+    deposit_price = json_data.get('deposit')
+
+    # Получаем разрешенное использование
+    permitted_use = ', '.join([
+        ch_v.get('name')
+        for ch in json_data.get('characteristics', [])
+        if ch.get('code') == 'PermittedUse'
+        for ch_v in ch.get('characteristicValue', [])
+        if ch_v and ch_v.get('name')
+    ])
+
+    attachments = json_data.get('lotAttachments', [])
+    files = [(x.get('fileName', 'Файл'), f"https://torgi.gov.ru/new/file-store/v1/{x.get('fileId', '')}")
+             for x in attachments if x.get('fileId')]
+
+    return auction_start_date, bidd_start_date, auction_link, price_step, deposit_price, files, permitted_use
+
+
+async def _iter_lot_cards(
+    lot_ids: List[str],
+    concurrency: int
+) -> AsyncIterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """Загружает карточки лотов окном из concurrency запросов и отдает их по мере готовности"""
+    queue = iter(lot_ids)
+    pending: Dict[asyncio.Task, str] = {}
+
+    def schedule() -> None:
+        while len(pending) < concurrency:
+            lot_id = next(queue, None)
+            if lot_id is None:
+                return
+            pending[asyncio.create_task(request_lot_card(lot_id))] = lot_id
+
+    try:
+        schedule()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                lot_id = pending.pop(task)
+                yield lot_id, task.result()
+            schedule()
+    finally:
+        # При отмене не оставляем висящих запросов
+        for task in pending:
+            task.cancel()
+
+
+async def iter_additional_data(
+    lot_ids: List[str],
+    concurrency: int = 50
+) -> AsyncIterator[Tuple[str, Optional[tuple]]]:
+    """
+    Загружает карточки лотов и отдает результаты по мере готовности
+
+    Одновременно выполняется не больше concurrency запросов; частоту запросов
+    дополнительно ограничивают общий ограничитель и предохранитель хоста.
+
+    Yields:
+        (id лота, данные) - данные None, если карточку получить не удалось
+    """
+    async with aclosing(_iter_lot_cards(lot_ids, concurrency)) as cards:
+        async for lot_id, card in cards:
+            yield lot_id, extract_additional_data(card) if card else None
+
+
+async def get_additional_data_async(
+    lot_ids: List[str],
+    concurrency: int = 50,
+    progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    unavailable: Optional[List[str]] = None,
+    statuses: Optional[Dict[str, str]] = None
+) -> Dict[str, tuple]:
+    """
+    Асинхронно получает дополнительные данные для нескольких лотов
+
+    Возвращает тот же словарь, что и get_additional_data_batch. Неудачные лоты
+    запрашиваются повторно один раз; если хост недоступен (предохранитель разомкнут),
+    оставшиеся лоты пропускаются и добавляются в unavailable. Если кэш карточек
+    инициализирован, запрашиваются только лоты, которых в нем нет.
+
+    Args:
+        lot_ids: Список ID лотов
+        concurrency: Максимальное количество одновременных запросов
+        progress_callback: Коллбэк-функция для обновления прогресса
+        unavailable: Список, в который добавляются ID лотов, пропущенных из-за недоступности сервиса
+        statuses: Текущие статусы лотов {id_лота: статус} - запись кэша с другим статусом не используется
+
+    Returns:
+        Dict[str, tuple]: Словарь {id_лота: данные_лота}
+    """
+    lot_ids = [lot_id for lot_id in lot_ids if lot_id]
+    logger.info("Fetching lot cards", lots=len(lot_ids), concurrency=concurrency)
+    started = time.monotonic()
+    breaker = get_breaker(lot_card_url(""))
+
+    results: Dict[str, tuple] = {}
+    failed: List[str] = []
+    skipped: List[str] = []
+    fetched: Dict[str, Tuple[tuple, Optional[str]]] = {}
+    total = len(lot_ids)
+
+    cache = get_lot_cache()
+    if cache is not None and lot_ids:
+        results.update(await cache.get_many(lot_ids, statuses))
+        lot_ids = [lot_id for lot_id in lot_ids if lot_id not in results]
+    processed = len(results)
+    if progress_callback and processed:
+        await progress_callback(processed, total)
+
+    for attempt, batch in enumerate((lot_ids, None)):
+        if batch is None:
+            # Повторяем неудачные запросы, если сервис не признан недоступным
+            if not failed:
+                break
+            if breaker.is_open:
+                skipped.extend(failed)
+                break
+            logger.info("Retrying failed lot cards", lots=len(failed))
+            batch, failed = failed, []
+
+        async with aclosing(_iter_lot_cards(batch, concurrency)) as cards:
+            async for lot_id, card in cards:
+                if card:
+                    results[lot_id] = extract_additional_data(card)
+                    fetched[lot_id] = (results[lot_id], card.get("lotStatus") or (statuses or {}).get(lot_id))
+                elif breaker.is_open:
+                    skipped.append(lot_id)
+                else:
+                    failed.append(lot_id)
+
+                if attempt == 0:
+                    processed += 1
+                    if progress_callback and (processed % 50 == 0 or processed == total):
+                        await progress_callback(processed, total)
+
+    if cache is not None and fetched:
+        await cache.set_many(fetched)
+
+    # Карточки, которые так и не удалось получить, возвращаются пустыми - как в синхронной версии
+    for lot_id in failed:
+        results[lot_id] = tuple([float("nan")] * ADDITIONAL_FIELDS)
+
+    if skipped:
+        logger.warning("Lot card service unavailable, lots skipped", lots=len(skipped))
+        if unavailable is not None:
+            unavailable.extend(skipped)
+
+    logger.info(
+        "Lot cards fetched",
+        succeeded=len(results) - len(failed),
+        fetched=len(fetched),
+        failed=len(failed),
+        skipped=len(skipped),
+        total=total,
+        elapsed=round(time.monotonic() - started, 2)
+    )
+    return results
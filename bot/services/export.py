@@ -0,0 +1,309 @@
+from datetime import datetime
+from typing import Dict, Optional
+import asyncio
+import os
+import structlog
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import FSInputFile, InlineKeyboardMarkup
+
+from bot.config import load_config
+from bot.keyboards.menu import get_settings_keyboard, get_cancel_keyboard
+from bot.services.data_fetcher import FetchReport
+from bot.services.enrichment import get_additional_data_async
+from bot.services.export_queue import ExportJob
+from bot.services.export_scheduler import get_export_scheduler, Ticket, SLOW_LANE
+from bot.services.processing_pool import get_processing_pool
+from bot.services.single_flight import fetch_data_shared
+
+
+logger = structlog.get_logger()
+
+# Выполняющиеся выгрузки по ID пользователя (для отмены и подавления прогресса отмененных)
+export_tasks: Dict[int, asyncio.Task] = {}
+
+
+class ExportStatus:
+    """Сообщение с прогрессом выгрузки в чате пользователя (через Bot API, без объекта Message)"""
+    def __init__(self, bot: Bot, chat_id: int, message_id: int):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+
+    async def edit(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None) -> None:
+        await self.bot.edit_message_text(
+            text=text, chat_id=self.chat_id, message_id=self.message_id, reply_markup=reply_markup
+        )
+
+    async def send_document(self, document: FSInputFile, caption: Optional[str] = None) -> None:
+        await self.bot.send_document(self.chat_id, document, caption=caption)
+
+
+async def update_progress(
+    status: ExportStatus,
+    current: int,
+    total: int,
+    user_id: int,
+    stage: str = "Обработано страниц"
+) -> None:
+    """Обновляет сообщение с прогрессом"""
+    if user_id not in export_tasks or export_tasks[user_id].cancelled():
+        return
+    
+    # Создаем словарь для хранения последнего времени обновления и счетчика
+    if not hasattr(update_progress, "last_updates"):
+        update_progress.last_updates = {}
+    
+    # Получаем текущее время
+    now = datetime.now()
+    
+    # Если для этого пользователя уже есть запись о последнем обновлении
+    if user_id in update_progress.last_updates:
+        last_time, update_count = update_progress.last_updates[user_id]
+        
+        # Вычисляем промежуток времени с последнего обновления в секундах
+        time_diff = (now - last_time).total_seconds()
+        
+        # Если прошло меньше 5 секунд, и обновление не критическое (не первое и не последнее)
+        if time_diff < 5 and update_count % 10 != 0 and current < total and current > 1:
+            # Пропускаем обновление
+            return
+        
+        # Если прошло меньше 60 секунд с последней ошибки флуда
+        if hasattr(update_progress, "flood_time") and user_id in update_progress.flood_time:
+            flood_time = update_progress.flood_time[user_id]
+            if (now - flood_time).total_seconds() < 60:
+                # Пропускаем все обновления на минуту после ошибки флуда
+                return
+    
+    # Обновляем счетчик и время последнего обновления
+    update_progress.last_updates[user_id] = (now, update_progress.last_updates.get(user_id, (None, 0))[1] + 1)
+    
+    try:
+        # Обновляем сообщение с прогрессом только для ключевых точек
+        await status.edit(
+            f"⏳ Загрузка данных...\n"
+            f"{stage}: {current}/{total} ({round(current/total*100)}%)\n"
+            f"Пожалуйста, подождите.",
+            reply_markup=get_cancel_keyboard()
+        )
+    except TelegramBadRequest as e:
+        # Игнорируем ошибку, если сообщение не изменилось
+        if "message is not modified" in str(e):
+            pass
+        else:
+            logger.error("Failed to update progress", error=str(e))
+    except TelegramRetryAfter as e:
+        # Если Telegram просит подождать из-за флуда
+        retry_after = getattr(e, "retry_after", 60)
+        logger.warning(f"Rate limited, retry after {retry_after} seconds")
+        
+        # Запоминаем время ошибки флуда
+        if not hasattr(update_progress, "flood_time"):
+            update_progress.flood_time = {}
+        update_progress.flood_time[user_id] = now
+    except Exception as e:
+        logger.error("Failed to update progress", error=str(e))
+
+
+async def show_queue_position(status: ExportStatus, user_id: int, position: int, eta: float, lane: str) -> None:
+    """Показывает позицию выгрузки в очереди планировщика и ориентировочное ожидание"""
+    if user_id not in export_tasks or export_tasks[user_id].cancelled():
+        return
+    
+    wait = "меньше минуты" if eta < 60 else f"≈ {round(eta / 60)} мин"
+    lane_info = " (большая выгрузка)" if lane == SLOW_LANE else ""
+    try:
+        await status.edit(
+            f"🕒 Запрос в очереди{lane_info}\n"
+            f"Позиция: {position}\n"
+            f"Ориентировочное ожидание: {wait}",
+            reply_markup=get_cancel_keyboard()
+        )
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            logger.error("Failed to update queue position", error=str(e))
+    except Exception as e:
+        logger.error("Failed to update queue position", error=str(e))
+
+
+async def run_export(bot: Bot, job: ExportJob, ticket: Optional[Ticket] = None) -> None:
+    """
+    Выполняет выгрузку: загрузка лотов, карточки лотов, обработка и отправка Excel файла
+
+    Используется и обработчиком (выгрузка в процессе бота), и рабочими процессами
+    очереди выгрузок: прогресс показывается в сообщении job.message_id чата
+    job.chat_id, файл отправляется в тот же чат. Выгрузка ждет очереди
+    планировщика (полоса по оценке стоимости, справедливая очередь пользователей);
+    отмена - отменой задачи. Рабочий процесс передает ticket, уже запущенный
+    в слоте, который выдала очередь (стоимость оценена ботом).
+    """
+    status = ExportStatus(bot, job.chat_id, job.message_id)
+    scheduler = get_export_scheduler()
+    if ticket is not None:
+        cost = ticket.cost
+    else:
+        cost = await scheduler.estimate(
+            job.subjects, job.statuses, job.date_from, job.date_to, job.calculate_coordinates
+        )
+    async with scheduler.admit(
+        job.user_id,
+        cost,
+        on_wait=lambda position, eta, lane: show_queue_position(status, job.user_id, position, eta, lane),
+        ticket=ticket
+    ):
+        await _run_export(job, status)
+
+
+async def _run_export(job: ExportJob, status: ExportStatus) -> None:
+    user_id = job.user_id
+    try:
+        logger.info(
+            "Starting data fetch",
+            subjects=job.subjects,
+            statuses=job.statuses,
+            date_from=job.date_from,
+            date_to=job.date_to,
+            calculate_coordinates=job.calculate_coordinates,
+            user_id=user_id,
+            job_id=job.job_id
+        )
+        
+        # Загружаем конфигурацию
+        config = load_config()
+        fetch_report = FetchReport(retry_budget=config.fetch.retry_budget)
+        
+        data = await fetch_data_shared(
+            user_id,
+            job.subjects,
+            job.statuses,
+            date_from=job.date_from,
+            date_to=job.date_to,
+            progress_callback=lambda current, total: update_progress(
+                status, current, total, user_id
+            ),
+            fetch_config=config.fetch,
+            report=fetch_report
+        )
+        
+        if not data:
+            await status.edit(
+                "❌ Не найдено данных по выбранным параметрам",
+                reply_markup=get_settings_keyboard()
+            )
+            return
+        
+        # Загружаем карточки лотов асинхронно
+        lot_ids = list(dict.fromkeys(item.get("id") for item in data if item.get("id")))
+        unavailable_ids = []
+        additional_data = await get_additional_data_async(
+            lot_ids,
+            concurrency=config.processing.enrichment_concurrency,
+            progress_callback=lambda current, total: update_progress(
+                status, current, total, user_id, stage="Загружено карточек лотов"
+            ),
+            unavailable=unavailable_ids,
+            statuses={item["id"]: item.get("lotStatus") for item in data if item.get("id")}
+        )
+            
+        await status.edit(
+            f"📊 Обработка {len(data)} записей...\n"
+            "Создание Excel файла...",
+            reply_markup=get_cancel_keyboard()
+        )
+        
+        try:
+            # Устанавливаем опцию расчета координат
+            config.processing.calculate_coordinates = job.calculate_coordinates
+            
+            # Обрабатываем данные в пуле обработки (вне цикла событий)
+            result = await get_processing_pool().run(
+                dict(
+                    data=data,
+                    selected_subjects=job.subjects,
+                    selected_statuses=job.statuses,
+                    config=config,
+                    additional_data=additional_data,
+                    unavailable_ids=unavailable_ids
+                ),
+                progress_callback=lambda stage, current, total: update_progress(
+                    status, current, total, user_id, stage=stage
+                )
+            )
+            
+            if not result:
+                await status.edit(
+                    "❌ Ошибка при обработке данных",
+                    reply_markup=get_settings_keyboard()
+                )
+                return
+            
+            # Создаем FSInputFile для корректной отправки файла
+            file = FSInputFile(result.file_path)
+            
+            # Формируем текст сообщения
+            date_info = ""
+            if job.date_from and job.date_to:
+                date_info = f"\n📅 Период: с {job.date_from} по {job.date_to}"
+            
+            coords_info = "\n🌍 Расчет координат: включен" if job.calculate_coordinates else ""
+            
+            # Предупреждаем, если часть страниц так и не удалось загрузить
+            failed_info = ""
+            if not fetch_report.complete:
+                failed_info = (
+                    f"\n⚠️ Не удалось загрузить страниц: {len(fetch_report.failed_pages)}. "
+                    "Данные могут быть неполными, повторите запрос позже."
+                )
+            
+            # Предупреждаем, если часть колонок этой выгрузки не заполнена из-за недоступности сервисов
+            if result.skipped_lots:
+                failed_info += (
+                    f"\n⚠️ Сервис карточек лотов недоступен: для {result.skipped_lots} лотов "
+                    "не заполнены данные карточки (ссылка на аукцион, вид разрешенного использования и др.)."
+                )
+            if result.skipped_cadastral_numbers:
+                failed_info += (
+                    f"\n⚠️ Геопортал недоступен: для {result.skipped_cadastral_numbers} кадастровых номеров "
+                    "не заполнены координаты и адрес."
+                )
+            
+            await status.send_document(
+                file,
+                caption=(
+                    f"✅ Данные успешно загружены!\n"
+                    f"📊 Количество записей: {len(data)}\n"
+                    f"🏢 Выбрано субъектов: {len(job.subjects)}{date_info}{coords_info}{failed_info}"
+                )
+            )
+            
+            await status.edit(
+                "⚙️ Настройки поиска:",
+                reply_markup=get_settings_keyboard()
+            )
+
+            os.remove(result.file_path)
+            logger.info("Excel файл успешно удалён.", user_id=user_id)
+
+        except Exception as e:
+            logger.error(
+                "Error during data processing",
+                error=str(e),
+                user_id=user_id
+            )
+            await status.edit(
+                f"❌ Произошла ошибка при обработке данных: {str(e)}",
+                reply_markup=get_settings_keyboard()
+            )
+        
+    except Exception as e:
+        logger.error(
+            "Error during data fetch",
+            error=str(e),
+            user_id=user_id
+        )
+        await status.edit(
+            "❌ Произошла ошибка при загрузке данных. Попробуйте позже.",
+            reply_markup=get_settings_keyboard()
+        )
@@ -0,0 +1,453 @@
+from typing import Optional, Dict, Any, List, Tuple
+from dataclasses import dataclass, field, asdict
+import json
+import time
+import uuid
+import structlog
+
+from bot.services.export_scheduler import FAST_LANE, SLOW_LANE
+
+
+logger = structlog.get_logger()
+
+# Сколько хранятся параметры задачи и отметки об отмене (сек)
+JOB_TTL = 86400
+
+# Сколько просроченных задач возвращается в очередь за один проход
+REQUEUE_BATCH = 100
+
+QUEUE_KEY_PREFIX = "export:queue:"
+RUNNING_KEY_PREFIX = "export:running:"
+LANES_KEY = "export:lanes"
+PROCESSING_KEY = "export:processing"
+LEASES_KEY = "export:leases"
+ATTEMPTS_KEY = "export:attempts"
+DEAD_KEY = "export:dead"
+# Виртуальное время справедливой очереди и время окончания выгрузок каждого пользователя
+CLOCK_KEY = "export:clock"
+FINISH_KEY = "export:finish"
+
+
+def _queue_key(lane: Optional[str]) -> str:
+    return f"{QUEUE_KEY_PREFIX}{lane or SLOW_LANE}"
+
+
+def _running_key(lane: str) -> str:
+    return f"{RUNNING_KEY_PREFIX}{lane}"
+
+
+def _job_key(job_id: str) -> str:
+    return f"export:job:{job_id}"
+
+
+def _user_key(user_id: int) -> str:
+    return f"export:user:{user_id}"
+
+
+def _cancel_key(job_id: str) -> str:
+    return f"export:cancel:{job_id}"
+
+
+def _new_job_id() -> str:
+    # ID начинается со времени постановки: задачи с одинаковым временем начала
+    # (сортированное множество упорядочивает их по ID) забираются в порядке очереди
+    return f"{time.time_ns():016x}{uuid.uuid4().hex[:16]}"
+
+
+# Ставит задачу в очередь полосы с виртуальным временем начала max(часы, окончание
+# предыдущей выгрузки пользователя) и сдвигает время пользователя на стоимость/вес
+ENQUEUE_SCRIPT = """
+local clock = tonumber(redis.call('GET', KEYS[4]) or '0')
+local start = math.max(clock, tonumber(redis.call('HGET', KEYS[5], ARGV[2]) or '0'))
+redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[5])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[6])
+redis.call('ZADD', KEYS[3], start, ARGV[1])
+redis.call('HSET', KEYS[5], ARGV[2], start + tonumber(ARGV[4]))
+redis.call('EXPIRE', KEYS[4], ARGV[5])
+redis.call('EXPIRE', KEYS[5], ARGV[5])
+return redis.call('ZRANK', KEYS[3], ARGV[1]) + 1
+"""
+
+# Забирает задачу с наименьшим временем начала, если в полосе есть свободный слот
+# (занятые слоты всех рабочих процессов - export:running:{полоса}): сначала медленная
+# полоса, затем быстрая; быстрая занимает слот медленной, если та простаивает
+CLAIM_SCRIPT = """
+local fast_free = tonumber(ARGV[3]) - redis.call('SCARD', KEYS[3])
+local slow_free = tonumber(ARGV[4]) - redis.call('SCARD', KEYS[4])
+local queue, running, slot
+if slow_free > 0 and redis.call('ZCARD', KEYS[2]) > 0 then
+    queue, running, slot = KEYS[2], KEYS[4], ARGV[6]
+elseif fast_free > 0 or slow_free > 0 then
+    queue = KEYS[1]
+    if fast_free > 0 then
+        running, slot = KEYS[3], ARGV[5]
+    else
+        running, slot = KEYS[4], ARGV[6]
+    end
+end
+if not queue then
+    return nil
+end
+local head = redis.call('ZPOPMIN', queue)
+if #head == 0 then
+    return nil
+end
+local job_id = head[1]
+local clock = tonumber(redis.call('GET', KEYS[8]) or '0')
+redis.call('SET', KEYS[8], math.max(clock, tonumber(head[2])), 'EX', ARGV[7])
+redis.call('SADD', running, job_id)
+redis.call('ZADD', KEYS[5], ARGV[1], job_id)
+redis.call('HSET', KEYS[6], job_id, ARGV[2])
+local attempts = redis.call('HINCRBY', KEYS[7], job_id, 1)
+return {job_id, attempts, slot}
+"""
+
+# Продлевает аренду, если задача все еще принадлежит этому рабочему процессу
+EXTEND_SCRIPT = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('ZADD', KEYS[1], 'XX', ARGV[3], ARGV[1])
+return 1
+"""
+
+# Подтверждает выполнение: удаляет задачу, освобождает слот полосы
+# и снимает отметку активной задачи пользователя
+ACK_SCRIPT = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('HDEL', KEYS[7], ARGV[1])
+redis.call('SREM', KEYS[8], ARGV[1])
+redis.call('SREM', KEYS[9], ARGV[1])
+redis.call('DEL', KEYS[4], KEYS[6])
+if redis.call('GET', KEYS[5]) == ARGV[1] then
+    redis.call('DEL', KEYS[5])
+end
+return 1
+"""
+
+# Возвращает задачу в начало очереди без учета попытки (остановка рабочего процесса):
+# время начала не больше, чем у первой задачи полосы и текущее виртуальное время
+RELEASE_SCRIPT = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('HINCRBY', KEYS[3], ARGV[1], -1)
+redis.call('SREM', KEYS[5], ARGV[1])
+redis.call('SREM', KEYS[6], ARGV[1])
+local start = tonumber(redis.call('GET', KEYS[7]) or '0')
+local head = redis.call('ZRANGE', KEYS[4], 0, 0, 'WITHSCORES')
+if head[2] then
+    start = math.min(start, tonumber(head[2]))
+end
+redis.call('ZADD', KEYS[4], start, ARGV[1])
+return 1
+"""
+
+# Возвращает в начало очереди своей полосы (KEYS[6] - быстрая, KEYS[7] - медленная)
+# задачи с истекшей арендой (рабочий процесс упал или завис) и освобождает их слоты;
+# после max_deliveries попыток задача переносится в список невыполненных
+REQUEUE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[3])
+local clock = tonumber(redis.call('GET', KEYS[10]) or '0')
+local requeued = {}
+local dead = {}
+for _, job_id in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], job_id)
+    redis.call('HDEL', KEYS[2], job_id)
+    redis.call('SREM', KEYS[8], job_id)
+    redis.call('SREM', KEYS[9], job_id)
+    if tonumber(redis.call('HGET', KEYS[3], job_id) or '0') >= tonumber(ARGV[2]) then
+        redis.call('HDEL', KEYS[3], job_id)
+        redis.call('HDEL', KEYS[4], job_id)
+        redis.call('LPUSH', KEYS[5], job_id)
+        table.insert(dead, job_id)
+    else
+        local queue = KEYS[7]
+        if redis.call('HGET', KEYS[4], job_id) == ARGV[4] then
+            queue = KEYS[6]
+        end
+        local start = clock
+        local head = redis.call('ZRANGE', queue, 0, 0, 'WITHSCORES')
+        if head[2] then
+            start = math.min(start, tonumber(head[2]))
+        end
+        redis.call('ZADD', queue, start, job_id)
+        table.insert(requeued, job_id)
+    end
+end
+return {requeued, dead}
+"""
+
+
+@dataclass
+class ExportJob:
+    """Задача выгрузки: параметры поиска и сообщение, в котором показывается прогресс"""
+    user_id: int
+    chat_id: int
+    message_id: int
+    subjects: List[str]
+    statuses: List[str]
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    calculate_coordinates: bool = False
+    lots: Optional[int] = None
+    lane: Optional[str] = None
+    job_id: str = field(default_factory=_new_job_id)
+    enqueued_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: str) -> "ExportJob":
+        return cls(**json.loads(data))
+
+
+@dataclass
+class Lease:
+    """Аренда задачи рабочим процессом"""
+    job: ExportJob
+    token: str
+    attempt: int
+    slot_lane: str = SLOW_LANE
+
+
+class ExportQueue:
+    """
+    Очередь задач выгрузки в Redis с доставкой "хотя бы один раз"
+
+    Бот оценивает стоимость выгрузки и кладет задачу в очередь своей полосы
+    (export:queue:fast или export:queue:slow). Внутри полосы очередь справедливая:
+    задачи упорядочены по виртуальному времени начала, а время окончания выгрузок
+    каждого пользователя хранится в Redis, поэтому порядок общий для всех процессов.
+
+    Рабочие процессы (python -m bot.worker) забирают задачу, только если в ее полосе
+    есть свободный слот; занятые слоты тоже хранятся в Redis, поэтому число
+    одновременных выгрузок в полосе ограничено для всех процессов и реплик вместе.
+    Задача выдается с арендой на visibility_timeout секунд, которая продлевается,
+    пока выгрузка выполняется. Если рабочий процесс упал, аренда истекает, слот
+    освобождается, а задача возвращается в начало очереди; после max_deliveries
+    неудачных попыток она переносится в список export:dead. Подтверждение
+    и продление проверяют токен аренды, поэтому задачу, выданную повторно,
+    не подтвердит прежний процесс.
+    """
+    def __init__(
+        self,
+        client,
+        visibility_timeout: int = 120,
+        max_deliveries: int = 3,
+        slots: Optional[Dict[str, int]] = None
+    ):
+        self.redis = client
+        self.visibility_timeout = visibility_timeout
+        self.max_deliveries = max_deliveries
+        self.slots = slots or {FAST_LANE: 4, SLOW_LANE: 1}
+        self.logger = logger.bind(service="export_queue")
+        self._enqueue = client.register_script(ENQUEUE_SCRIPT)
+        self._claim = client.register_script(CLAIM_SCRIPT)
+        self._extend = client.register_script(EXTEND_SCRIPT)
+        self._ack = client.register_script(ACK_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+        self._requeue = client.register_script(REQUEUE_SCRIPT)
+
+    async def enqueue(self, job: ExportJob, service_time: float = 0.0) -> Optional[int]:
+        """
+        Ставит задачу в очередь ее полосы (job.lane, по умолчанию медленная)
+
+        Args:
+            job: Задача выгрузки
+            service_time: Стоимость выгрузки, деленная на вес пользователя (сек)
+
+        Returns:
+            Позиция задачи в очереди полосы или None, если у пользователя уже есть активная выгрузка
+        """
+        if not await self.redis.set(_user_key(job.user_id), job.job_id, nx=True, ex=JOB_TTL):
+            return None
+        lane = job.lane or SLOW_LANE
+        position = await self._enqueue(
+            keys=[_job_key(job.job_id), LANES_KEY, _queue_key(lane), CLOCK_KEY, FINISH_KEY],
+            args=[job.job_id, job.user_id, job.to_json(), service_time, JOB_TTL, lane]
+        )
+        self.logger.info(
+            "Export job enqueued", job_id=job.job_id, user_id=job.user_id, lane=lane, lots=job.lots, position=position
+        )
+        return position
+
+    async def active_job(self, user_id: int) -> Optional[str]:
+        """ID активной (ожидающей или выполняемой) выгрузки пользователя"""
+        return await self.redis.get(_user_key(user_id))
+
+    async def cancel(self, user_id: int) -> bool:
+        """
+        Отменяет выгрузку пользователя
+
+        Ожидающая задача удаляется из очереди; выполняемую останавливает рабочий
+        процесс, увидев отметку об отмене.
+        """
+        job_id = await self.active_job(user_id)
+        if not job_id:
+            return False
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.set(_cancel_key(job_id), 1, ex=JOB_TTL)
+        for lane in (FAST_LANE, SLOW_LANE):
+            pipe.zrem(_queue_key(lane), job_id)
+        removed = sum((await pipe.execute())[1:])
+        if removed:
+            await self.redis.delete(_job_key(job_id), _cancel_key(job_id), _user_key(user_id))
+            await self.redis.hdel(LANES_KEY, job_id)
+        self.logger.info("Export job cancelled", job_id=job_id, user_id=user_id, pending=bool(removed))
+        return True
+
+    async def is_cancelled(self, job_id: str) -> bool:
+        return bool(await self.redis.exists(_cancel_key(job_id)))
+
+    async def claim(self) -> Optional[Lease]:
+        """
+        Забирает следующую задачу в свободный слот полосы
+
+        Returns:
+            Аренда задачи или None, если свободных слотов нет или очереди пусты
+        """
+        token = uuid.uuid4().hex
+        claimed = await self._claim(
+            keys=[
+                _queue_key(FAST_LANE), _queue_key(SLOW_LANE), _running_key(FAST_LANE), _running_key(SLOW_LANE),
+                PROCESSING_KEY, LEASES_KEY, ATTEMPTS_KEY, CLOCK_KEY
+            ],
+            args=[
+                time.time() + self.visibility_timeout, token, self.slots[FAST_LANE], self.slots[SLOW_LANE],
+                FAST_LANE, SLOW_LANE, JOB_TTL
+            ]
+        )
+        if not claimed:
+            return None
+        job_id, attempt, slot_lane = claimed
+        data = await self.redis.get(_job_key(job_id))
+        if data is None:
+            # Параметры задачи истекли или задача отменена - снимаем ее без выполнения
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.zrem(PROCESSING_KEY, job_id)
+            pipe.hdel(LEASES_KEY, job_id)
+            pipe.hdel(ATTEMPTS_KEY, job_id)
+            pipe.hdel(LANES_KEY, job_id)
+            pipe.srem(_running_key(slot_lane), job_id)
+            pipe.delete(_cancel_key(job_id))
+            await pipe.execute()
+            self.logger.warning("Export job payload missing, dropped", job_id=job_id)
+            return None
+        return Lease(job=ExportJob.from_json(data), token=token, attempt=int(attempt), slot_lane=slot_lane)
+
+    async def extend(self, lease: Lease) -> bool:
+        """Продлевает аренду; False - аренда потеряна (задача выдана другому процессу)"""
+        return bool(await self._extend(
+            keys=[PROCESSING_KEY, LEASES_KEY],
+            args=[lease.job.job_id, lease.token, time.time() + self.visibility_timeout]
+        ))
+
+    async def ack(self, lease: Lease) -> bool:
+        """Подтверждает выполнение (или отмену) задачи"""
+        job = lease.job
+        return bool(await self._ack(
+            keys=[
+                PROCESSING_KEY, LEASES_KEY, ATTEMPTS_KEY,
+                _job_key(job.job_id), _user_key(job.user_id), _cancel_key(job.job_id), LANES_KEY,
+                _running_key(FAST_LANE), _running_key(SLOW_LANE)
+            ],
+            args=[job.job_id, lease.token]
+        ))
+
+    async def release(self, lease: Lease) -> bool:
+        """Возвращает задачу в начало очереди ее полосы (рабочий процесс останавливается)"""
+        return bool(await self._release(
+            keys=[
+                PROCESSING_KEY, LEASES_KEY, ATTEMPTS_KEY, _queue_key(lease.job.lane),
+                _running_key(FAST_LANE), _running_key(SLOW_LANE), CLOCK_KEY
+            ],
+            args=[lease.job.job_id, lease.token]
+        ))
+
+    async def requeue_expired(self) -> Tuple[List[str], List[ExportJob]]:
+        """
+        Возвращает в очередь задачи с истекшей арендой
+
+        Returns:
+            (ID возвращенных задач, задачи, исчерпавшие попытки)
+        """
+        requeued, dead = await self._requeue(
+            keys=[
+                PROCESSING_KEY, LEASES_KEY, ATTEMPTS_KEY, LANES_KEY, DEAD_KEY,
+                _queue_key(FAST_LANE), _queue_key(SLOW_LANE), _running_key(FAST_LANE), _running_key(SLOW_LANE),
+                CLOCK_KEY
+            ],
+            args=[time.time(), self.max_deliveries, REQUEUE_BATCH, FAST_LANE]
+        )
+        if requeued:
+            self.logger.warning("Expired export jobs requeued", jobs=requeued)
+
+        dead_jobs = []
+        for job_id in dead:
+            data = await self.redis.get(_job_key(job_id))
+            if data is not None:
+                job = ExportJob.from_json(data)
+                dead_jobs.append(job)
+                if await self.redis.get(_user_key(job.user_id)) == job_id:
+                    await self.redis.delete(_user_key(job.user_id))
+            await self.redis.delete(_job_key(job_id), _cancel_key(job_id))
+        if dead:
+            self.logger.error("Export jobs exhausted deliveries", jobs=dead, max_deliveries=self.max_deliveries)
+        return requeued, dead_jobs
+
+    async def get_stats(self) -> Dict[str, Any]:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zcard(_queue_key(FAST_LANE))
+        pipe.zcard(_queue_key(SLOW_LANE))
+        pipe.scard(_running_key(FAST_LANE))
+        pipe.scard(_running_key(SLOW_LANE))
+        pipe.zcard(PROCESSING_KEY)
+        pipe.llen(DEAD_KEY)
+        fast, slow, fast_running, slow_running, processing, dead = await pipe.execute()
+        return {
+            "pending": {FAST_LANE: fast, SLOW_LANE: slow},
+            "running": {FAST_LANE: fast_running, SLOW_LANE: slow_running},
+            "processing": processing,
+            "dead": dead
+        }
+
+
+# Глобальный экземпляр
+export_queue: Optional[ExportQueue] = None
+
+
+def init_export_queue(config, redis_service) -> Optional[ExportQueue]:
+    """Инициализация очереди выгрузок (только при USE_REDIS=true и EXPORT_QUEUE=true)"""
+    global export_queue
+    if not config.export_queue.enabled:
+        return None
+    if not config.redis.enabled:
+        logger.warning("Export queue requires Redis, exports will run in the bot process")
+        return None
+    export_queue = ExportQueue(
+        redis_service.redis,
+        visibility_timeout=config.export_queue.visibility_timeout,
+        max_deliveries=config.export_queue.max_deliveries,
+        slots={FAST_LANE: max(1, config.scheduler.fast_slots), SLOW_LANE: max(1, config.scheduler.slow_slots)}
+    )
+    logger.info(
+        "Export queue initialized",
+        visibility_timeout=config.export_queue.visibility_timeout,
+        max_deliveries=config.export_queue.max_deliveries,
+        slots=export_queue.slots
+    )
+    return export_queue
+
+
+def get_export_queue() -> Optional[ExportQueue]:
+    """Возвращает очередь выгрузок, если она включена"""
+    return export_queue
@@ -0,0 +1,308 @@
+from typing import Optional, Dict, Any, List, Callable, Awaitable, Tuple
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+import asyncio
+import heapq
+import itertools
+import time
+import structlog
+
+from bot.config import SchedulerConfig, RateLimitConfig
+from bot.services.data_fetcher import get_page_size
+from bot.services.query_planner import Shard, count_elements
+from bot.services.rate_limiter import RateShare, current_share
+
+
+logger = structlog.get_logger()
+
+FAST_LANE = "fast"
+SLOW_LANE = "slow"
+
+# Как часто обновлять позицию в очереди, если она не менялась (сек)
+WAIT_UPDATE_INTERVAL = 15.0
+
+
+@dataclass
+class ExportCost:
+    """Оценка стоимости выгрузки по числу лотов (totalElements первой страницы поиска)"""
+    lots: Optional[int]
+    seconds: float
+    lane: str
+
+
+@dataclass(eq=False)
+class Ticket:
+    """Выгрузка в планировщике"""
+    user_id: int
+    cost: ExportCost
+    share: RateShare
+    start_tag: float
+    seq: int
+    granted: bool = False
+    slot_lane: Optional[str] = None
+    started_at: Optional[float] = None
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class ExportScheduler:
+    """
+    Планировщик выгрузок между обработчиками и загрузкой данных
+
+    Перед запуском выгрузка оценивается по totalElements первой страницы поиска:
+    сколько секунд займут страницы, карточки лотов и (если включено) геокодирование
+    при настроенных лимитах частоты. Недолгие выгрузки идут в быструю полосу,
+    долгие - в медленную, у каждой полосы свои слоты, поэтому большая выгрузка
+    не задерживает маленькие (быстрая полоса может занять свободный слот медленной).
+
+    Внутри полосы очередь справедливая: выгрузка получает виртуальное время начала
+    max(часы, окончание предыдущей выгрузки пользователя), а каждая выгрузка сдвигает
+    время пользователя на стоимость/вес. Запущенные выгрузки делят лимит частоты
+    запросов пропорционально весам (см. FairGate в rate_limiter).
+
+    С очередью выгрузок слоты полос и справедливый порядок общие для всех рабочих
+    процессов и хранятся в Redis (см. ExportQueue), а планировщик процесса только
+    делит лимит частоты между его выгрузками.
+    """
+    def __init__(self, config: Optional[SchedulerConfig] = None, rate_config: Optional[RateLimitConfig] = None):
+        self.config = config or SchedulerConfig()
+        self.rate_config = rate_config or RateLimitConfig()
+        self.slots = {FAST_LANE: max(1, self.config.fast_slots), SLOW_LANE: max(1, self.config.slow_slots)}
+        self.waiting: Dict[str, List[Ticket]] = {FAST_LANE: [], SLOW_LANE: []}
+        self.running: Dict[str, List[Ticket]] = {FAST_LANE: [], SLOW_LANE: []}
+        self.clock = 0.0
+        self.user_finish: Dict[int, float] = {}
+        self.stats = {"admitted": 0, "waited": 0, "wait_seconds": 0.0, FAST_LANE: 0, SLOW_LANE: 0}
+        self.logger = logger.bind(service="export_scheduler")
+        self._seq = itertools.count()
+
+    def weight(self, user_id: int) -> float:
+        return max(0.01, self.config.user_weights.get(user_id, 1.0))
+
+    def cost_for(self, lots: Optional[int], calculate_coordinates: bool) -> ExportCost:
+        """Оценка без учета кэшей (сверху): страницы поиска, карточки лотов и геокодирование"""
+        if lots is None:
+            # Оценить не удалось - считаем выгрузку большой
+            return ExportCost(None, self.config.fast_lane_seconds, SLOW_LANE)
+        pages = -(-lots // get_page_size())
+        seconds = (pages + lots) / self.rate_config.torgi_rate
+        if calculate_coordinates:
+            seconds += lots / self.rate_config.nspd_rate
+        lane = FAST_LANE if seconds <= self.config.fast_lane_seconds else SLOW_LANE
+        return ExportCost(lots, seconds, lane)
+
+    async def estimate(
+        self,
+        subjects: List[str],
+        statuses: List[str],
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        calculate_coordinates: bool = False
+    ) -> ExportCost:
+        """Оценивает стоимость выгрузки по количеству лотов (его же затем использует план загрузки)"""
+        try:
+            lots = await count_elements(Shard(tuple(subjects), tuple(statuses), date_from, date_to))
+        except Exception as e:
+            self.logger.warning("Failed to estimate export cost", error=str(e))
+            lots = None
+        return self.cost_for(lots, calculate_coordinates)
+
+    def _submit(self, user_id: int, cost: ExportCost) -> Ticket:
+        weight = self.weight(user_id)
+        start = max(self.clock, self.user_finish.get(user_id, 0.0))
+        self.user_finish[user_id] = start + cost.seconds / weight
+        ticket = Ticket(
+            user_id=user_id,
+            cost=cost,
+            share=RateShare(name=str(user_id), weight=weight),
+            start_tag=start,
+            seq=next(self._seq)
+        )
+        self.waiting[cost.lane].append(ticket)
+        self._dispatch()
+        return ticket
+
+    def _free_slots(self, lane: str) -> int:
+        return self.slots[lane] - len(self.running[lane])
+
+    def _grant(self, ticket: Ticket, slot_lane: str) -> None:
+        self.waiting[ticket.cost.lane].remove(ticket)
+        self.running[slot_lane].append(ticket)
+        ticket.granted = True
+        ticket.slot_lane = slot_lane
+        ticket.started_at = time.monotonic()
+        self.clock = max(self.clock, ticket.start_tag)
+        ticket.changed.set()
+
+    def _dispatch(self) -> None:
+        """Запускает выгрузки на свободные слоты и сообщает ожидающим об изменении очереди"""
+        for lane in (SLOW_LANE, FAST_LANE):
+            while self.waiting[lane] and self._free_slots(lane) > 0:
+                self._grant(min(self.waiting[lane], key=_order), lane)
+        # Быстрые выгрузки занимают свободные слоты медленной полосы, если она простаивает
+        while self.waiting[FAST_LANE] and not self.waiting[SLOW_LANE] and self._free_slots(SLOW_LANE) > 0:
+            self._grant(min(self.waiting[FAST_LANE], key=_order), SLOW_LANE)
+
+        # Пользователи, чья очередь уже прошла, больше не влияют на порядок
+        self.user_finish = {user_id: finish for user_id, finish in self.user_finish.items() if finish > self.clock}
+
+        for lane in (FAST_LANE, SLOW_LANE):
+            for ticket in self.waiting[lane]:
+                ticket.changed.set()
+
+    def _remove(self, ticket: Ticket) -> None:
+        tickets = self.running[ticket.slot_lane] if ticket.granted else self.waiting[ticket.cost.lane]
+        if ticket not in tickets:
+            return
+        tickets.remove(ticket)
+        ticket.share.active = False
+        self._dispatch()
+
+    def occupy(self, user_id: int, cost: ExportCost, slot_lane: str) -> Ticket:
+        """
+        Запускает выгрузку, которой очередь выгрузок уже выдала слот полосы slot_lane
+
+        Слоты полос и справедливый порядок для всех рабочих процессов соблюдает
+        ExportQueue в Redis, поэтому выгрузка не ждет очереди планировщика процесса;
+        затем admit(..., ticket=...).
+        """
+        ticket = Ticket(
+            user_id=user_id,
+            cost=cost,
+            share=RateShare(name=str(user_id), weight=self.weight(user_id)),
+            start_tag=self.clock,
+            seq=next(self._seq)
+        )
+        self.waiting[cost.lane].append(ticket)
+        self._grant(ticket, slot_lane)
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        """Снимает выгрузку, если она так и не была выполнена (admit)"""
+        self._remove(ticket)
+
+    def position(self, ticket: Ticket) -> Tuple[int, float]:
+        """
+        Позиция выгрузки в своей полосе и ориентировочное ожидание (сек)
+
+        Ожидание рассчитывается по оценкам стоимости: оставшееся время запущенных
+        выгрузок и выгрузок впереди распределяется по слотам полосы.
+        """
+        lane = ticket.cost.lane
+        queue = sorted(self.waiting[lane], key=_order)
+        ahead = queue[:queue.index(ticket)]
+
+        now = time.monotonic()
+        free_at = [max(0.0, running.cost.seconds - (now - running.started_at)) for running in self.running[lane]]
+        free_at += [0.0] * max(0, self.slots[lane] - len(free_at))
+        heapq.heapify(free_at)
+        for waiting in ahead:
+            heapq.heappush(free_at, heapq.heappop(free_at) + waiting.cost.seconds)
+        return len(ahead) + 1, free_at[0]
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        user_id: int,
+        cost: ExportCost,
+        on_wait: Optional[Callable[[int, float, str], Awaitable[None]]] = None,
+        ticket: Optional[Ticket] = None
+    ):
+        """
+        Ожидает очереди выгрузки и выполняет ее с долей лимита частоты пользователя
+
+        Args:
+            user_id: ID пользователя
+            cost: Оценка стоимости выгрузки (estimate)
+            on_wait: Коллбэк-функция (позиция, ожидание в секундах, полоса), пока выгрузка ждет очереди
+            ticket: Выгрузка, запущенная occupy (иначе ставится в очередь сейчас)
+        """
+        ticket = ticket or self._submit(user_id, cost)
+        queued_at = time.monotonic()
+        try:
+            if not ticket.granted:
+                self.logger.info(
+                    "Export queued",
+                    user_id=user_id,
+                    lane=cost.lane,
+                    lots=cost.lots,
+                    estimated_seconds=round(cost.seconds, 1),
+                    position=self.position(ticket)[0]
+                )
+            while not ticket.granted:
+                ticket.changed.clear()
+                if on_wait:
+                    position, eta = self.position(ticket)
+                    try:
+                        await on_wait(position, eta, cost.lane)
+                    except Exception as e:
+                        self.logger.warning("Queue position callback failed", user_id=user_id, error=str(e))
+                if ticket.granted:
+                    break
+                try:
+                    await asyncio.wait_for(ticket.changed.wait(), WAIT_UPDATE_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._remove(ticket)
+            raise
+
+        waited = time.monotonic() - queued_at
+        self.stats["admitted"] += 1
+        self.stats[cost.lane] += 1
+        if waited > 0.01:
+            self.stats["waited"] += 1
+            self.stats["wait_seconds"] += waited
+        self.logger.info(
+            "Export admitted",
+            user_id=user_id,
+            lane=cost.lane,
+            slot_lane=ticket.slot_lane,
+            lots=cost.lots,
+            estimated_seconds=round(cost.seconds, 1),
+            waited=round(waited, 1)
+        )
+
+        token = current_share.set(ticket.share)
+        try:
+            yield ticket
+        finally:
+            current_share.reset(token)
+            self._remove(ticket)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "wait_seconds": round(self.stats["wait_seconds"], 1),
+            "running": {lane: len(tickets) for lane, tickets in self.running.items()},
+            "waiting": {lane: len(tickets) for lane, tickets in self.waiting.items()},
+        }
+
+
+def _order(ticket: Ticket) -> Tuple[float, int]:
+    return ticket.start_tag, ticket.seq
+
+
+# Глобальный экземпляр
+export_scheduler: Optional[ExportScheduler] = None
+
+
+def init_export_scheduler(config) -> ExportScheduler:
+    """Инициализация планировщика выгрузок"""
+    global export_scheduler
+    export_scheduler = ExportScheduler(config.scheduler, config.rate_limit)
+    logger.info(
+        "Export scheduler initialized",
+        fast_slots=export_scheduler.slots[FAST_LANE],
+        slow_slots=export_scheduler.slots[SLOW_LANE],
+        fast_lane_seconds=config.scheduler.fast_lane_seconds,
+        weighted_users=len(config.scheduler.user_weights)
+    )
+    return export_scheduler
+
+
+def get_export_scheduler() -> ExportScheduler:
+    """Возвращает планировщик выгрузок (с настройками по умолчанию, если он не инициализирован)"""
+    global export_scheduler
+    if export_scheduler is None:
+        export_scheduler = ExportScheduler()
+    return export_scheduler
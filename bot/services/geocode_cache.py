@@ -0,0 +1,119 @@
+from typing import Optional, Dict, Any, List, Tuple, Set
+import threading
+import structlog
+
+from bot.config import GeocodeCacheConfig
+from bot.services.persistent_cache import open_cache_backend
+
+
+logger = structlog.get_logger()
+
+
+class GeocodeCache:
+    """
+    Кэш геокодирования кадастровых номеров (потокобезопасный)
+
+    Хранит центроид участка (EPSG:4326), адрес и исходную систему координат.
+    Границы участков меняются редко, поэтому найденные номера хранятся ttl
+    секунд (по умолчанию - практически бессрочно). Ответы без данных об участке
+    кэшируются на negative_ttl, чтобы не запрашивать их при каждой выгрузке,
+    но со временем перепроверять.
+    """
+    def __init__(self, backend, config: Optional[GeocodeCacheConfig] = None):
+        self.backend = backend
+        self.config = config or GeocodeCacheConfig()
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "stored": 0, "stored_negative": 0}
+        self._lock = threading.Lock()
+
+    def hit_ratio(self) -> float:
+        lookups = self.stats["hits"] + self.stats["negative_hits"] + self.stats["misses"]
+        return round((self.stats["hits"] + self.stats["negative_hits"]) / lookups, 3) if lookups else 0.0
+
+    def get_many(self, cadastral_numbers: List[str]) -> Tuple[Dict[str, tuple], Set[str]]:
+        """
+        Возвращает сохраненные результаты
+
+        Returns:
+            ({кадастровый_номер: ([x, y], адрес)}, номера, по которым геопортал не вернул данных)
+        """
+        entries = self.backend.get_many(cadastral_numbers)
+
+        found: Dict[str, tuple] = {}
+        not_found: Set[str] = set()
+        for cad_num, entry in entries.items():
+            if entry.get("missing"):
+                not_found.add(cad_num)
+            else:
+                found[cad_num] = (entry["centroid"], entry["address"])
+
+        with self._lock:
+            self.stats["hits"] += len(found)
+            self.stats["negative_hits"] += len(not_found)
+            self.stats["misses"] += len(cadastral_numbers) - len(entries)
+        logger.info(
+            "Geocode cache lookup",
+            numbers=len(cadastral_numbers),
+            hits=len(found),
+            negative_hits=len(not_found),
+            hit_ratio=round(len(entries) / len(cadastral_numbers), 3) if cadastral_numbers else 0.0,
+            total_hit_ratio=self.hit_ratio()
+        )
+        return found, not_found
+
+    def set_many(self, results: Dict[str, Tuple[List[float], str, str]], not_found: List[str] = ()) -> None:
+        """
+        Сохраняет результаты геокодирования
+
+        Args:
+            results: {кадастровый_номер: ([x, y], адрес, исходная система координат)}
+            not_found: Номера, по которым геопортал ответил, что данных нет
+        """
+        items: Dict[str, Tuple[Dict[str, Any], int]] = {
+            cad_num: ({"centroid": list(centroid), "address": address, "crs": crs}, self.config.ttl)
+            for cad_num, (centroid, address, crs) in results.items()
+        }
+        items.update((cad_num, ({"missing": True}, self.config.negative_ttl)) for cad_num in not_found)
+        self.backend.set_many(items)
+        with self._lock:
+            self.stats["stored"] += len(results)
+            self.stats["stored_negative"] += len(not_found)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "hit_ratio": self.hit_ratio()}
+
+
+# Глобальный экземпляр
+geocode_cache: Optional[GeocodeCache] = None
+
+
+def init_geocode_cache(config) -> Optional[GeocodeCache]:
+    """Инициализация кэша геокодирования (Redis, если он включен, иначе SQLite)"""
+    global geocode_cache
+    if not config.geocode_cache.enabled:
+        logger.info("Geocode cache disabled")
+        return None
+    backend = open_cache_backend(config, "geocode", config.geocode_cache.sqlite_path)
+    geocode_cache = GeocodeCache(backend, config.geocode_cache)
+    logger.info(
+        "Geocode cache initialized",
+        backend="redis" if config.redis.enabled else "sqlite",
+        ttl=config.geocode_cache.ttl,
+        negative_ttl=config.geocode_cache.negative_ttl
+    )
+    return geocode_cache
+
+
+def close_geocode_cache() -> None:
+    """Закрывает кэш геокодирования"""
+    global geocode_cache
+    if geocode_cache is None:
+        return
+    logger.info("Geocode cache stats", **geocode_cache.get_stats())
+    geocode_cache.backend.close()
+    geocode_cache = None
+
+
+def get_geocode_cache() -> Optional[GeocodeCache]:
+    """Возвращает кэш геокодирования, если он инициализирован"""
+    return geocode_cache
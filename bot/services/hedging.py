@@ -0,0 +1,153 @@
+from typing import Optional, Dict, Any, Callable, Awaitable, TypeVar
+from collections import deque
+import asyncio
+import time
+import structlog
+
+from bot.config import HedgingConfig
+
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Скользящее окно задержек успешных ответов одного эндпоинта"""
+    def __init__(self, window: int = 500):
+        self.samples: deque = deque(maxlen=window)
+
+    def record(self, latency: float) -> None:
+        self.samples.append(latency)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+class Hedger:
+    """
+    Дублирование медленных запросов (hedged requests)
+
+    Если запрос отвечает дольше заданного перцентиля задержки своего эндпоинта,
+    отправляется дубликат; используется ответ, пришедший первым, второй запрос отменяется.
+    Доля дубликатов ограничена max_ratio от всех запросов эндпоинта.
+    """
+    def __init__(self, config: Optional[HedgingConfig] = None):
+        self.config = config or HedgingConfig()
+        self.trackers: Dict[str, LatencyTracker] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _endpoint_stats(self, endpoint: str) -> Dict[str, int]:
+        return self.stats.setdefault(endpoint, {"requests": 0, "hedged": 0, "hedge_wins": 0, "budget_exceeded": 0})
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """Через сколько секунд отправлять дубликат (None - пока недостаточно статистики)"""
+        tracker = self.trackers.get(endpoint)
+        if tracker is None or len(tracker.samples) < self.config.min_samples:
+            return None
+        return max(self.config.min_delay, tracker.percentile(self.config.percentile))
+
+    def _within_budget(self, stats: Dict[str, int]) -> bool:
+        return stats["hedged"] < stats["requests"] * self.config.max_ratio
+
+    async def run(
+        self,
+        endpoint: str,
+        make_request: Callable[[], Awaitable[T]],
+        is_ok: Callable[[T], bool],
+        acquire: Optional[Callable[[], Awaitable[None]]] = None
+    ) -> T:
+        """
+        Выполняет запрос, при необходимости дублируя его
+
+        Args:
+            endpoint: Имя эндпоинта (отдельная статистика задержек)
+            make_request: Фабрика запроса (вызывается для основного запроса и дубликата)
+            is_ok: Проверка успешности ответа (неуспешный ответ не выигрывает у второго запроса)
+            acquire: Ожидание ограничителя частоты перед каждым запросом; не входит
+                в задержку ответа и таймер дублирования
+
+        Returns:
+            Ответ, пришедший первым (успешный, если такой есть)
+        """
+        stats = self._endpoint_stats(endpoint)
+        stats["requests"] += 1
+        tracker = self.trackers.setdefault(endpoint, LatencyTracker(self.config.window))
+        delay = self.hedge_delay(endpoint) if self.config.enabled else None
+
+        if acquire is not None:
+            await acquire()
+        started = time.monotonic()
+        primary = asyncio.ensure_future(make_request())
+        tasks = {primary}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    if self._within_budget(stats):
+                        stats["hedged"] += 1
+                        tasks.add(asyncio.ensure_future(self._duplicate(make_request, acquire)))
+                    else:
+                        stats["budget_exceeded"] += 1
+
+            result = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if is_ok(result):
+                        if task is not primary:
+                            stats["hedge_wins"] += 1
+                        tracker.record(time.monotonic() - started)
+                        return result
+            # Оба запроса завершились неудачно - возвращаем последний ответ
+            return result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    async def _duplicate(make_request: Callable[[], Awaitable[T]], acquire: Optional[Callable[[], Awaitable[None]]]) -> T:
+        if acquire is not None:
+            await acquire()
+        return await make_request()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику дублирования и текущие пороги по эндпоинтам"""
+        result = {}
+        for endpoint, stats in self.stats.items():
+            delay = self.hedge_delay(endpoint)
+            result[endpoint] = {
+                **stats,
+                "hedge_ratio": round(stats["hedged"] / stats["requests"], 3) if stats["requests"] else 0.0,
+                "hedge_delay": round(delay, 3) if delay is not None else None,
+            }
+        return result
+
+
+# Глобальный экземпляр
+hedger: Optional[Hedger] = None
+
+
+def init_hedging(config) -> Hedger:
+    """Инициализация дублирования медленных запросов"""
+    global hedger
+    hedger = Hedger(config.hedging)
+    logger.info(
+        "Request hedging initialized",
+        enabled=hedger.config.enabled,
+        percentile=hedger.config.percentile,
+        max_ratio=hedger.config.max_ratio
+    )
+    return hedger
+
+
+def get_hedger() -> Hedger:
+    """Возвращает общий экземпляр (с настройками по умолчанию, если он не инициализирован)"""
+    global hedger
+    if hedger is None:
+        hedger = Hedger()
+    return hedger
@@ -0,0 +1,123 @@
+from typing import Optional, Any, Dict
+import aiohttp
+import structlog
+
+from bot.config import HttpConfig
+from bot.services.json_codec import ACCEPT_ENCODING
+
+logger = structlog.get_logger()
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
+    "Accept": "application/json, text/javascript, */*; q=0.01",
+    "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
+    "Accept-Encoding": ACCEPT_ENCODING,
+}
+
+
+class HttpClient:
+    """Общий HTTP-клиент с пулом соединений на всё время работы бота"""
+    def __init__(self, config: Optional[HttpConfig] = None):
+        self.config = config or HttpConfig()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.stats = {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+        }
+        self.logger = logger.bind(service="http_client")
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        """Создает трассировку для подсчета переиспользования соединений"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.stats["requests"] += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.stats["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.stats["connections_reused"] += 1
+
+        async def on_dns_cache_hit(session, context, params):
+            self.stats["dns_cache_hits"] += 1
+
+        async def on_dns_cache_miss(session, context, params):
+            self.stats["dns_cache_misses"] += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Создает сессию с настроенным коннектором"""
+        connector = aiohttp.TCPConnector(
+            limit=self.config.limit,
+            limit_per_host=self.config.limit_per_host,
+            keepalive_timeout=self.config.keepalive_timeout,
+            ttl_dns_cache=self.config.dns_cache_ttl,
+            use_dns_cache=True
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers=DEFAULT_HEADERS,
+            trace_configs=[self._build_trace_config()]
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Возвращает сессию, создавая её при первом обращении"""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+
+    async def init(self):
+        """Инициализация пула соединений"""
+        _ = self.session
+        self.logger.info(
+            "HTTP client initialized",
+            limit=self.config.limit,
+            limit_per_host=self.config.limit_per_host,
+            keepalive_timeout=self.config.keepalive_timeout,
+            dns_cache_ttl=self.config.dns_cache_ttl
+        )
+
+    async def close(self):
+        """Закрытие пула соединений"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self.logger.info("HTTP client closed", **self.get_stats())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику переиспользования соединений"""
+        stats = dict(self.stats)
+        connections = stats["connections_created"] + stats["connections_reused"]
+        stats["reuse_ratio"] = round(stats["connections_reused"] / connections, 3) if connections else 0.0
+        return stats
+
+
+# Глобальный экземпляр клиента
+http_client: Optional[HttpClient] = None
+
+
+async def init_http_client(config) -> HttpClient:
+    """Инициализация общего HTTP-клиента"""
+    global http_client
+    http_client = HttpClient(config.http)
+    await http_client.init()
+    return http_client
+
+
+def get_http_client() -> HttpClient:
+    """Возвращает общий HTTP-клиент (создает клиент по умолчанию, если он не инициализирован)"""
+    global http_client
+    if http_client is None:
+        http_client = HttpClient()
+    return http_client
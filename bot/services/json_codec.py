@@ -0,0 +1,105 @@
+from typing import Any, Callable, Dict, Optional
+import json
+import os
+import time
+import structlog
+
+
+logger = structlog.get_logger()
+
+
+def _load_backends() -> Dict[str, Callable[[bytes], Any]]:
+    """Возвращает доступные бэкенды декодирования в порядке предпочтения"""
+    backends: Dict[str, Callable[[bytes], Any]] = {}
+    try:
+        import orjson
+        backends["orjson"] = orjson.loads
+    except ImportError:
+        pass
+    try:
+        import simdjson
+        backends["simdjson"] = simdjson.loads
+    except ImportError:
+        pass
+    backends["json"] = json.loads
+    return backends
+
+
+BACKENDS = _load_backends()
+
+
+def _select_backend(name: Optional[str] = None) -> str:
+    """Выбирает бэкенд: явно заданный (если установлен) или первый доступный"""
+    if name and name in BACKENDS:
+        return name
+    if name:
+        logger.warning("JSON backend is not available, using fallback", requested=name)
+    return next(iter(BACKENDS))
+
+
+backend_name = _select_backend(os.getenv("JSON_BACKEND"))
+_loads = BACKENDS[backend_name]
+
+
+def _brotli_available() -> bool:
+    try:
+        import brotli  # noqa: F401
+        return True
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+
+# aiohttp и urllib3 умеют распаковывать br только при установленном Brotli
+ACCEPT_ENCODING = "gzip, deflate, br" if _brotli_available() else "gzip, deflate"
+
+# Статистика по эндпоинтам: количество ответов, байты по сети и после распаковки, время декодирования
+decode_stats: Dict[str, Dict[str, float]] = {}
+
+
+def loads(data: bytes) -> Any:
+    """Декодирует JSON выбранным бэкендом"""
+    return _loads(data)
+
+
+def record(endpoint: str, body: bytes, wire_bytes: Optional[int], decode_seconds: float) -> None:
+    """Учитывает ответ в статистике эндпоинта"""
+    stats = decode_stats.setdefault(endpoint, {
+        "responses": 0, "wire_bytes": 0, "decoded_bytes": 0, "decode_seconds": 0.0
+    })
+    stats["responses"] += 1
+    stats["wire_bytes"] += wire_bytes if wire_bytes is not None else len(body)
+    stats["decoded_bytes"] += len(body)
+    stats["decode_seconds"] += decode_seconds
+
+
+def decode(endpoint: str, body: bytes, wire_bytes: Optional[int] = None) -> Any:
+    """Декодирует тело ответа и учитывает его в статистике"""
+    started = time.perf_counter()
+    data = _loads(body)
+    record(endpoint, body, wire_bytes, time.perf_counter() - started)
+    return data
+
+
+async def read_json(response, endpoint: str) -> Any:
+    """Читает и декодирует JSON-ответ aiohttp (Content-Length - размер сжатого тела)"""
+    body = await response.read()
+    return decode(endpoint, body, response.content_length)
+
+
+def get_stats() -> Dict[str, Any]:
+    """Возвращает статистику декодирования по эндпоинтам"""
+    result = {"backend": backend_name, "accept_encoding": ACCEPT_ENCODING}
+    for endpoint, stats in decode_stats.items():
+        ratio = stats["wire_bytes"] / stats["decoded_bytes"] if stats["decoded_bytes"] else 0
+        result[endpoint] = {
+            "responses": stats["responses"],
+            "wire_bytes": stats["wire_bytes"],
+            "decoded_bytes": stats["decoded_bytes"],
+            "compression_ratio": round(ratio, 3),
+            "decode_ms": round(stats["decode_seconds"] * 1000, 1),
+        }
+    return result
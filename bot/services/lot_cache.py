@@ -0,0 +1,124 @@
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
+import structlog
+
+from bot.config import LotCacheConfig
+from bot.services.data_fetcher import FINAL_LOT_STATUSES
+from bot.services.persistent_cache import open_cache_backend
+
+
+logger = structlog.get_logger()
+
+
+class LotCache:
+    """
+    Кэш дополнительных данных карточек лотов
+
+    Время хранения зависит от статуса лота: карточки в завершенных статусах
+    (SUCCEED, FAILED, CANCELED) не меняются и хранятся практически бессрочно,
+    остальные - ttl секунд. Если текущий статус лота из результатов поиска
+    отличается от сохраненного, запись считается устаревшей.
+    """
+    def __init__(self, backend, config: Optional[LotCacheConfig] = None):
+        self.backend = backend
+        self.config = config or LotCacheConfig()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "stored": 0}
+
+    def ttl_for(self, status: Optional[str]) -> int:
+        if status in FINAL_LOT_STATUSES:
+            return self.config.ttl_final
+        return self.config.ttl
+
+    def hit_ratio(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return round(self.stats["hits"] / lookups, 3) if lookups else 0.0
+
+    async def get_many(
+        self,
+        lot_ids: List[str],
+        statuses: Optional[Dict[str, str]] = None
+    ) -> Dict[str, tuple]:
+        """
+        Возвращает сохраненные данные лотов {id_лота: данные_лота}
+
+        Args:
+            lot_ids: Список ID лотов
+            statuses: Текущие статусы лотов из результатов поиска (опционально)
+        """
+        entries = await asyncio.to_thread(self.backend.get_many, lot_ids)
+
+        result: Dict[str, tuple] = {}
+        stale = 0
+        for lot_id, entry in entries.items():
+            if statuses and statuses.get(lot_id) and statuses[lot_id] != entry.get("status"):
+                stale += 1
+                continue
+            result[lot_id] = _decode(entry["data"])
+
+        self.stats["hits"] += len(result)
+        self.stats["misses"] += len(lot_ids) - len(result)
+        self.stats["stale"] += stale
+        logger.info(
+            "Lot cache lookup",
+            lots=len(lot_ids),
+            hits=len(result),
+            stale=stale,
+            hit_ratio=round(len(result) / len(lot_ids), 3) if lot_ids else 0.0,
+            total_hit_ratio=self.hit_ratio()
+        )
+        return result
+
+    async def set_many(self, cards: Dict[str, Tuple[tuple, Optional[str]]]) -> None:
+        """Сохраняет данные лотов {id_лота: (данные_лота, статус)}"""
+        items = {
+            lot_id: ({"data": list(data), "status": status}, self.ttl_for(status))
+            for lot_id, (data, status) in cards.items()
+        }
+        await asyncio.to_thread(self.backend.set_many, items)
+        self.stats["stored"] += len(items)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "hit_ratio": self.hit_ratio()}
+
+
+def _decode(data: List[Any]) -> tuple:
+    # JSON превращает пары (имя файла, ссылка) в списки - возвращаем кортежи, как после запроса
+    data = list(data)
+    data[5] = [tuple(item) for item in data[5] or []]
+    return tuple(data)
+
+
+# Глобальный экземпляр
+lot_cache: Optional[LotCache] = None
+
+
+def init_lot_cache(config) -> Optional[LotCache]:
+    """Инициализация кэша карточек лотов (Redis, если он включен, иначе SQLite)"""
+    global lot_cache
+    if not config.lot_cache.enabled:
+        logger.info("Lot cache disabled")
+        return None
+    backend = open_cache_backend(config, "lot_card", config.lot_cache.sqlite_path)
+    lot_cache = LotCache(backend, config.lot_cache)
+    logger.info(
+        "Lot cache initialized",
+        backend="redis" if config.redis.enabled else "sqlite",
+        ttl=config.lot_cache.ttl,
+        ttl_final=config.lot_cache.ttl_final
+    )
+    return lot_cache
+
+
+def close_lot_cache() -> None:
+    """Закрывает кэш карточек лотов"""
+    global lot_cache
+    if lot_cache is None:
+        return
+    logger.info("Lot cache stats", **lot_cache.get_stats())
+    lot_cache.backend.close()
+    lot_cache = None
+
+
+def get_lot_cache() -> Optional[LotCache]:
+    """Возвращает кэш карточек лотов, если он инициализирован"""
+    return lot_cache
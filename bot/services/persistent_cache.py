@@ -0,0 +1,129 @@
+from typing import Dict, Any, List, Tuple
+from pathlib import Path
+import json
+import sqlite3
+import threading
+import time
+import redis
+import structlog
+
+
+logger = structlog.get_logger()
+
+# Сколько ключей запрашивается из SQLite за один запрос (ограничение на число параметров)
+SQLITE_CHUNK_SIZE = 500
+
+
+class RedisCacheBackend:
+    """
+    Долговременный кэш в Redis (синхронный клиент - кэш используется и из потоков)
+
+    Ключи хранятся как {namespace}:{key}, значения - JSON, срок жизни задается на каждую запись.
+    """
+    def __init__(self, client: redis.Redis, namespace: str):
+        self.client = client
+        self.namespace = namespace
+        self.logger = logger.bind(service="persistent_cache", backend="redis", namespace=namespace)
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        try:
+            values = self.client.mget([self._key(key) for key in keys])
+        except Exception as e:
+            self.logger.error("Failed to read cache", keys=len(keys), error=str(e))
+            return {}
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, items: Dict[str, Tuple[Any, int]]) -> None:
+        """Сохраняет записи {ключ: (значение, ttl в секундах)}"""
+        if not items:
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key, (value, ttl) in items.items():
+                pipe.set(self._key(key), json.dumps(value, ensure_ascii=False), ex=max(1, int(ttl)))
+            pipe.execute()
+        except Exception as e:
+            self.logger.error("Failed to write cache", keys=len(items), error=str(e))
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class SqliteCacheBackend:
+    """
+    Долговременный кэш в локальном файле SQLite (когда Redis не используется)
+
+    Все пространства имен хранятся в одной таблице; просроченные записи
+    не возвращаются и удаляются при открытии файла.
+    """
+    def __init__(self, path: str, namespace: str):
+        self.path = path
+        self.namespace = namespace
+        self.logger = logger.bind(service="persistent_cache", backend="sqlite", namespace=namespace)
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            purged = self.connection.execute(
+                "DELETE FROM cache WHERE namespace = ? AND expires_at <= ?", (namespace, time.time())
+            ).rowcount
+        self.logger.info("SQLite cache opened", path=path, purged=purged)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        now = time.time()
+        try:
+            with self._lock:
+                for start in range(0, len(keys), SQLITE_CHUNK_SIZE):
+                    chunk = keys[start:start + SQLITE_CHUNK_SIZE]
+                    rows = self.connection.execute(
+                        f"SELECT key, value FROM cache WHERE namespace = ? AND expires_at > ? "
+                        f"AND key IN ({','.join('?' * len(chunk))})",
+                        (self.namespace, now, *chunk)
+                    ).fetchall()
+                    result.update((key, json.loads(value)) for key, value in rows)
+        except sqlite3.Error as e:
+            self.logger.error("Failed to read cache", keys=len(keys), error=str(e))
+            return {}
+        return result
+
+    def set_many(self, items: Dict[str, Tuple[Any, int]]) -> None:
+        """Сохраняет записи {ключ: (значение, ttl в секундах)}"""
+        if not items:
+            return
+        now = time.time()
+        try:
+            with self._lock, self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    [
+                        (self.namespace, key, json.dumps(value, ensure_ascii=False), now + ttl)
+                        for key, (value, ttl) in items.items()
+                    ]
+                )
+        except sqlite3.Error as e:
+            self.logger.error("Failed to write cache", keys=len(items), error=str(e))
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
+
+
+def open_cache_backend(config, namespace: str, sqlite_path: str):
+    """Открывает кэш в Redis, если он включен, иначе - в файле SQLite"""
+    if config.redis.enabled:
+        client = redis.Redis(host=config.redis.host, port=config.redis.port, decode_responses=True)
+        return RedisCacheBackend(client, namespace)
+    return SqliteCacheBackend(sqlite_path, namespace)
@@ -0,0 +1,194 @@
+from typing import Optional, Dict, Any, List, Callable, Awaitable, Tuple, TYPE_CHECKING
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import multiprocessing
+import queue
+import threading
+import structlog
+
+if TYPE_CHECKING:
+    from bot.utils.data_processing import ProcessingResult
+
+
+logger = structlog.get_logger()
+
+# Как часто забирать сообщения о прогрессе обработки (сек)
+PROGRESS_POLL_INTERVAL = 0.5
+
+# Сколько выгрузок обрабатывает рабочий процесс, прежде чем его заменит новый (возврат памяти pandas/openpyxl)
+MAX_TASKS_PER_CHILD = 20
+
+# Количество потоков, если рабочие процессы отключены (PROCESSING_WORKERS=0)
+THREAD_WORKERS = 4
+
+
+def _init_worker(config, processes: int) -> None:
+    """Инициализация рабочего процесса: логирование, адреса API, ограничитель, предохранители и кэш геокодирования"""
+    from bot.logging_config import setup_logging
+    from bot.services.upstream import configure_upstreams
+    from bot.services.rate_limiter import init_worker_rate_limiter
+    from bot.services.circuit_breaker import init_circuit_breakers
+    from bot.services.geocode_cache import init_geocode_cache
+
+    setup_logging(log_file=False)
+    configure_upstreams(config.upstream)
+    init_worker_rate_limiter(config, processes)
+    init_circuit_breakers(config)
+    init_geocode_cache(config)
+
+
+def _run_job(job: Dict[str, Any], progress_queue, cancel_event) -> Optional["ProcessingResult"]:
+    """Выполняет data_processing (в рабочем процессе или потоке), передавая прогресс через очередь"""
+    from bot.utils.data_processing import data_processing
+
+    def progress(stage: str, current: int, total: int) -> None:
+        try:
+            progress_queue.put_nowait((stage, current, total))
+        except Exception:
+            pass
+
+    return data_processing(**job, progress_callback=progress, cancel_event=cancel_event)
+
+
+def _drain(progress_queue) -> List[Tuple[str, int, int]]:
+    updates = []
+    while True:
+        try:
+            updates.append(progress_queue.get_nowait())
+        except queue.Empty:
+            return updates
+
+
+class ProcessingPool:
+    """
+    Обработка выгрузок (pandas, геокодирование, Excel) вне цикла событий бота
+
+    При workers > 0 каждая выгрузка обрабатывается в одном из рабочих процессов:
+    тяжелая обработка не блокирует бота и не мешает другим пользователям, а упавший
+    процесс не роняет бота (пул пересоздается). При workers = 0 обработка выполняется
+    в потоках основного процесса. Прогресс и отмена передаются через очередь и событие
+    (в режиме процессов - через multiprocessing.Manager).
+    """
+    def __init__(self, config=None, workers: int = 0):
+        self.config = config
+        self.workers = workers
+        self.manager = None
+        self.executor = None
+        self.stats = {"jobs": 0, "completed": 0, "cancelled": 0, "failed": 0, "restarts": 0}
+        self.logger = logger.bind(service="processing_pool")
+        self._start()
+
+    def _start(self) -> None:
+        if self.workers > 0:
+            context = multiprocessing.get_context("spawn")
+            if self.manager is None:
+                self.manager = context.Manager()
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.config, self.workers),
+                max_tasks_per_child=MAX_TASKS_PER_CHILD
+            )
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=THREAD_WORKERS, thread_name_prefix="processing")
+
+    def _restart(self) -> None:
+        """Пересоздает пул после аварийного завершения рабочего процесса"""
+        self.stats["restarts"] += 1
+        self.logger.warning("Processing pool broken, restarting", workers=self.workers)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self._start()
+
+    def _channels(self):
+        if self.manager is not None:
+            return self.manager.Queue(), self.manager.Event()
+        return queue.Queue(), threading.Event()
+
+    async def run(
+        self,
+        job: Dict[str, Any],
+        progress_callback: Optional[Callable[[str, int, int], Awaitable[None]]] = None
+    ) -> Optional["ProcessingResult"]:
+        """
+        Обрабатывает выгрузку и возвращает итог обработки (путь к Excel файлу и пропуски)
+
+        Args:
+            job: Аргументы data_processing (data, selected_subjects, selected_statuses, config, ...)
+            progress_callback: Коллбэк-функция (этап, обработано, всего) для обновления прогресса
+
+        При отмене задачи обработка прерывается и в рабочем процессе.
+        """
+        progress_queue, cancel_event = await asyncio.to_thread(self._channels)
+        self.stats["jobs"] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self.executor, _run_job, job, progress_queue, cancel_event)
+        except BrokenProcessPool:
+            self._restart()
+            future = loop.run_in_executor(self.executor, _run_job, job, progress_queue, cancel_event)
+
+        try:
+            while True:
+                done, _ = await asyncio.wait({future}, timeout=PROGRESS_POLL_INTERVAL)
+                updates = await asyncio.to_thread(_drain, progress_queue)
+                if progress_callback and updates and not done:
+                    await progress_callback(*updates[-1])
+                if done:
+                    result = future.result()
+                    self.stats["completed"] += 1
+                    return result
+        except asyncio.CancelledError:
+            # Задача, которая еще не началась, снимается с очереди; начатую останавливает событие отмены
+            self.stats["cancelled"] += 1
+            future.cancel()
+            cancel_event.set()
+            self.logger.info("Processing job cancelled")
+            raise
+        except BrokenProcessPool:
+            self.stats["failed"] += 1
+            self._restart()
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+
+    def shutdown(self) -> None:
+        self.logger.info("Processing pool stats", workers=self.workers, **self.stats)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.manager is not None:
+            self.manager.shutdown()
+
+
+# Глобальный экземпляр
+processing_pool: Optional[ProcessingPool] = None
+
+
+def init_processing_pool(config) -> ProcessingPool:
+    """Инициализация пула обработки выгрузок"""
+    global processing_pool
+    processing_pool = ProcessingPool(config, config.processing.workers)
+    logger.info(
+        "Processing pool initialized",
+        mode="processes" if processing_pool.workers > 0 else "threads",
+        workers=processing_pool.workers or THREAD_WORKERS
+    )
+    return processing_pool
+
+
+def close_processing_pool() -> None:
+    """Останавливает пул обработки выгрузок"""
+    global processing_pool
+    if processing_pool is None:
+        return
+    processing_pool.shutdown()
+    processing_pool = None
+
+
+def get_processing_pool() -> ProcessingPool:
+    """Возвращает пул обработки (в потоках, если он не инициализирован)"""
+    global processing_pool
+    if processing_pool is None:
+        processing_pool = ProcessingPool()
+    return processing_pool
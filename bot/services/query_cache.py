@@ -0,0 +1,137 @@
+from typing import List, Dict, Any, Callable, Optional, Awaitable
+import asyncio
+import time
+import structlog
+
+from bot.config import FetchConfig
+from bot.services.data_fetcher import query_fingerprint, FetchReport, FINAL_LOT_STATUSES
+from bot.services.delta_sync import fetch_data_delta, load_delta_lots
+from bot.services.redis_service import get_redis_service
+
+
+logger = structlog.get_logger()
+
+# Счетчики обращений к кэшу результатов поиска
+cache_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "revalidations": 0}
+
+# Фоновые обновления устаревших записей (по отпечатку запроса)
+_revalidations: Dict[str, asyncio.Task] = {}
+
+
+def _cache_key(fingerprint: str) -> str:
+    return f"query_cache:{fingerprint}"
+
+
+def get_fresh_ttl(selected_statuses: List[str], fetch_config: FetchConfig) -> int:
+    """Время свежести записи: лоты в завершенных статусах меняются редко"""
+    if all(status in FINAL_LOT_STATUSES for status in selected_statuses):
+        return fetch_config.cache_ttl_final
+    return fetch_config.cache_ttl
+
+
+async def _store(
+    storage,
+    fingerprint: str,
+    data: List[Dict[str, Any]],
+    fresh_ttl: int,
+    stale_ttl: int,
+    delta: bool = False
+) -> None:
+    """
+    Сохраняет запись кэша
+
+    При инкрементальной синхронизации лоты уже сохранены в ее состоянии
+    (delta:{отпечаток}) - запись хранит только время и ссылается на него.
+    """
+    entry = {"cached_at": time.time(), "fresh_ttl": fresh_ttl}
+    if delta:
+        entry["delta"] = True
+    else:
+        entry["data"] = data
+    await storage.cache_data(_cache_key(fingerprint), entry, ttl=fresh_ttl + stale_ttl)
+
+
+async def _load(storage, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Возвращает запись кэша вместе с лотами (None, если записи или лотов нет)"""
+    entry = await storage.get_cached_data(_cache_key(fingerprint))
+    if entry and entry.get("delta"):
+        entry["data"] = await load_delta_lots(storage, fingerprint)
+    return entry if entry and entry.get("data") else None
+
+
+async def fetch_data_cached(
+    selected_subjects: List[str],
+    selected_statuses: List[str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    fetch_config: Optional[FetchConfig] = None,
+    report: Optional[FetchReport] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Получает данные через кэш результатов поиска
+
+    Свежая запись возвращается сразу. Устаревшая (в пределах окна stale) тоже
+    возвращается сразу, а в фоне запускается её обновление. При промахе данные
+    загружаются и сохраняются в кэш.
+
+    Args:
+        selected_subjects: Список выбранных субъектов
+        selected_statuses: Список выбранных статусов
+        date_from: Начальная дата (опционально)
+        date_to: Конечная дата (опционально)
+        progress_callback: Коллбэк-функция для обновления прогресса
+        fetch_config: Настройки загрузки
+        report: Отчет о повторах и неполученных страницах (опционально)
+
+    Returns:
+        List[Dict[str, Any]]: Список данных
+    """
+    fetch_config = fetch_config or FetchConfig()
+    storage = get_redis_service()
+
+    if not fetch_config.cache_enabled or not storage:
+        return await fetch_data_delta(
+            selected_subjects, selected_statuses, date_from, date_to, progress_callback, fetch_config, report
+        )
+
+    fingerprint = query_fingerprint(selected_subjects, selected_statuses, date_from, date_to)
+    fresh_ttl = get_fresh_ttl(selected_statuses, fetch_config)
+    stale_ttl = fetch_config.cache_stale_ttl
+
+    async def load(callback, load_report: FetchReport) -> Optional[List[Dict[str, Any]]]:
+        data = await fetch_data_delta(
+            selected_subjects, selected_statuses, date_from, date_to, callback, fetch_config, load_report
+        )
+        # Неполные результаты не кэшируем
+        if data and load_report.complete:
+            await _store(storage, fingerprint, data, fresh_ttl, stale_ttl, delta=fetch_config.delta_sync)
+        return data
+
+    entry = await _load(storage, fingerprint)
+    if entry:
+        age = time.time() - entry.get("cached_at", 0)
+
+        if age < entry.get("fresh_ttl", fresh_ttl):
+            cache_stats["hits"] += 1
+            logger.info("Query cache hit", fingerprint=fingerprint, age=round(age), **cache_stats)
+        else:
+            cache_stats["stale_hits"] += 1
+            logger.info("Query cache stale hit", fingerprint=fingerprint, age=round(age), **cache_stats)
+
+            # Обновляем запись в фоне, не более одного обновления на запрос
+            if fingerprint not in _revalidations:
+                cache_stats["revalidations"] += 1
+                task = asyncio.create_task(load(None, FetchReport(retry_budget=fetch_config.retry_budget)))
+                _revalidations[fingerprint] = task
+                task.add_done_callback(lambda _: _revalidations.pop(fingerprint, None))
+
+        if progress_callback:
+            await progress_callback(1, 1)
+        return entry["data"]
+
+    cache_stats["misses"] += 1
+    logger.info("Query cache miss", fingerprint=fingerprint, **cache_stats)
+    if report is None:
+        report = FetchReport(retry_budget=fetch_config.retry_budget)
+    return await load(progress_callback, report)
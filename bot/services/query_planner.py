@@ -0,0 +1,250 @@
+from typing import List, Dict, Any, Callable, Optional, Awaitable
+from dataclasses import dataclass, replace
+from contextlib import aclosing
+from datetime import date
+import asyncio
+import structlog
+
+from bot.config import FetchConfig
+from bot.services.data_fetcher import request_page, get_page_size, query_fingerprint, FetchReport, _iter_pages
+from bot.services.redis_service import get_redis_service
+
+
+logger = structlog.get_logger()
+
+# Поле лота, по которому API сортирует выдачу (firstVersionPublicationDate,desc)
+PUBLICATION_DATE_FIELD = "noticeFirstVersionPublicationDate"
+
+# Сколько хранится количество лотов запроса (сек)
+COUNT_TTL = 600
+
+
+@dataclass(frozen=True)
+class Shard:
+    """Независимая часть поискового запроса"""
+    subjects: tuple
+    statuses: tuple
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    total_elements: int = 0
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "subjects": ",".join(self.subjects),
+            "statuses": ",".join(self.statuses),
+            "date_from": self.date_from,
+            "date_to": self.date_to,
+            "total_elements": self.total_elements,
+        }
+
+
+def _count_key(shard: Shard) -> str:
+    fingerprint = query_fingerprint(list(shard.subjects), list(shard.statuses), shard.date_from, shard.date_to)
+    return f"query_count:{fingerprint}"
+
+
+async def count_elements(shard: Shard) -> Optional[int]:
+    """
+    Возвращает количество лотов в шарде (запрос страницы размером 1)
+
+    Количество хранится COUNT_TTL секунд: оценка стоимости выгрузки (в боте) и план
+    загрузки (в рабочем процессе очереди) используют один запрос к API.
+    """
+    storage = get_redis_service()
+    if storage:
+        cached = await storage.get_cached_data(_count_key(shard))
+        if cached is not None:
+            return cached
+    result = await request_page(
+        list(shard.subjects), list(shard.statuses), 0, shard.date_from, shard.date_to, page_size=1
+    )
+    if not result.ok:
+        return None
+    total = result.data.get("totalElements", 0)
+    if storage:
+        await storage.cache_data(_count_key(shard), total, ttl=COUNT_TTL)
+    return total
+
+
+def split_date_range(date_from: str, date_to: str) -> Optional[tuple]:
+    """Делит диапазон дат пополам; возвращает None, если диапазон состоит из одного дня"""
+    start = date.fromisoformat(date_from)
+    end = date.fromisoformat(date_to)
+    if end <= start:
+        return None
+    middle = start + (end - start) // 2
+    return (
+        (start.isoformat(), middle.isoformat()),
+        (date.fromordinal(middle.toordinal() + 1).isoformat(), end.isoformat()),
+    )
+
+
+async def _split_shard(shard: Shard, max_elements: int) -> List[Shard]:
+    """Рекурсивно делит шард: по субъектам, затем по статусам, затем по диапазону дат"""
+    if len(shard.subjects) > 1:
+        children = [replace(shard, subjects=(subject,)) for subject in shard.subjects]
+    elif len(shard.statuses) > 1:
+        children = [replace(shard, statuses=(status,)) for status in shard.statuses]
+    elif shard.date_from and shard.date_to and split_date_range(shard.date_from, shard.date_to):
+        first, second = split_date_range(shard.date_from, shard.date_to)
+        children = [
+            replace(shard, date_from=first[0], date_to=first[1]),
+            replace(shard, date_from=second[0], date_to=second[1]),
+        ]
+    else:
+        # Делить дальше нечего - шард придется пролистать целиком
+        return [shard]
+
+    totals = await asyncio.gather(*(count_elements(child) for child in children))
+
+    planned = []
+    for child, total in zip(children, totals):
+        if total is None:
+            # Размер неизвестен - оставляем шард как есть, загрузка сама определит количество страниц
+            planned.append(child)
+        elif total == 0:
+            continue
+        elif total > max_elements:
+            planned.extend(await _split_shard(replace(child, total_elements=total), max_elements))
+        else:
+            planned.append(replace(child, total_elements=total))
+    return planned
+
+
+async def plan_shards(
+    selected_subjects: List[str],
+    selected_statuses: List[str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    max_elements: int = 5000
+) -> List[Shard]:
+    """
+    Составляет план загрузки: делит запрос на независимые шарды не больше max_elements лотов
+
+    Запрос делится только там, где это необходимо: сначала по субъектам, затем
+    по статусам, а если шард всё ещё слишком большой - по диапазону aucStartFrom/aucStartTo.
+
+    Args:
+        selected_subjects: Список выбранных субъектов
+        selected_statuses: Список выбранных статусов
+        date_from: Начальная дата (опционально)
+        date_to: Конечная дата (опционально)
+        max_elements: Максимальное количество лотов в одном шарде
+
+    Returns:
+        List[Shard]: Список шардов
+    """
+    root = Shard(tuple(selected_subjects), tuple(selected_statuses), date_from, date_to)
+    total = await count_elements(root)
+
+    if total is None:
+        shards = [root]
+    elif total == 0:
+        shards = []
+    elif total <= max_elements:
+        shards = [replace(root, total_elements=total)]
+    else:
+        shards = await _split_shard(replace(root, total_elements=total), max_elements)
+
+    logger.info(
+        "Shard plan",
+        total_elements=total,
+        shards_count=len(shards),
+        max_elements=max_elements,
+        shards=[shard.describe() for shard in shards]
+    )
+    return shards
+
+
+def merge_results(chunks: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Объединяет результаты шардов, удаляя дубликаты по id и сохраняя сортировку по дате публикации"""
+    merged: Dict[Any, Dict[str, Any]] = {}
+    for chunk in chunks:
+        for item in chunk:
+            merged.setdefault(item.get("id"), item)
+    return sorted(merged.values(), key=lambda item: item.get(PUBLICATION_DATE_FIELD) or "", reverse=True)
+
+
+async def fetch_data_planned(
+    selected_subjects: List[str],
+    selected_statuses: List[str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    fetch_config: Optional[FetchConfig] = None,
+    report: Optional[FetchReport] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Получает данные, разбивая запрос на шарды и загружая их параллельно
+
+    Args:
+        selected_subjects: Список выбранных субъектов
+        selected_statuses: Список выбранных статусов
+        date_from: Начальная дата (опционально)
+        date_to: Конечная дата (опционально)
+        progress_callback: Коллбэк-функция для обновления прогресса (страницы всех шардов суммируются)
+        fetch_config: Настройки загрузки
+        report: Отчет о повторах и неполученных страницах (бюджет повторов общий для всех шардов)
+
+    Returns:
+        List[Dict[str, Any]]: Список данных без дубликатов
+    """
+    if not selected_subjects or not selected_statuses:
+        logger.error("No subjects or statuses provided")
+        return None
+
+    fetch_config = fetch_config or FetchConfig()
+    report = report if report is not None else FetchReport(retry_budget=fetch_config.retry_budget)
+
+    try:
+        shards = await plan_shards(
+            selected_subjects, selected_statuses, date_from, date_to, fetch_config.shard_max_elements
+        )
+        if not shards:
+            logger.warning("No elements found for selected parameters")
+            return None
+
+        # Суммарный прогресс по всем шардам (заранее учитываем страницы ещё не начатых шардов)
+        page_size = get_page_size(fetch_config)
+        shard_progress: Dict[int, tuple] = {
+            i: (0, -(-shard.total_elements // page_size)) for i, shard in enumerate(shards)
+        }
+        progress_lock = asyncio.Lock()
+
+        async def report_progress(index: int, current: int, total: int) -> None:
+            if not progress_callback:
+                return
+            async with progress_lock:
+                shard_progress[index] = (current, total)
+                await progress_callback(
+                    sum(c for c, _ in shard_progress.values()),
+                    sum(t for _, t in shard_progress.values())
+                )
+
+        semaphore = asyncio.Semaphore(max(1, fetch_config.shard_concurrency))
+
+        async def fetch_shard(index: int, shard: Shard) -> List[Dict[str, Any]]:
+            async with semaphore:
+                items = []
+                async with aclosing(_iter_pages(
+                    list(shard.subjects), list(shard.statuses), shard.date_from, shard.date_to,
+                    lambda current, total: report_progress(index, current, total), fetch_config, report
+                )) as pages:
+                    async for _, content in pages:
+                        items.extend(content)
+                return items
+
+        chunks = await asyncio.gather(*(fetch_shard(i, shard) for i, shard in enumerate(shards)))
+        all_data = merge_results(chunks)
+
+        logger.info(
+            f"Fetched {len(all_data)} items",
+            shards_count=len(shards),
+            duplicates=sum(len(chunk) for chunk in chunks) - len(all_data),
+            failed_pages=len(report.failed_pages)
+        )
+        return all_data or None
+
+    except Exception as e:
+        logger.error(f"Error while fetching planned data: {e}")
+        return None
@@ -0,0 +1,396 @@
+from typing import Optional, Dict, Any, Tuple, List
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+import weakref
+import redis
+import redis.asyncio as aioredis
+import structlog
+
+from bot.config import RateLimitConfig
+from bot.services import upstream
+
+
+logger = structlog.get_logger()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Разбирает заголовок Retry-After (секунды или HTTP-дата)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Токен-бакет в Redis: общий для всех процессов и реплик бота.
+# Токен резервируется сразу (баланс может уйти в минус), в ответ возвращается время ожидания.
+# ARGV[3] > 0 - штраф после 429: баланс опускается так, чтобы запросы остановились на это время.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local penalty = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if penalty > 0 then
+    tokens = math.min(tokens, -penalty * rate)
+else
+    tokens = tokens - 1
+    if tokens < 0 then
+        wait = -tokens / rate
+    end
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 1)
+return tostring(wait)
+"""
+
+
+# Через сколько секунд после ошибки снова пробовать общий бакет в Redis
+REDIS_RETRY_INTERVAL = 30.0
+
+
+class TokenBucket:
+    """Локальный токен-бакет (потокобезопасный) - используется без Redis или при его недоступности"""
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Резервирует токен и возвращает, сколько секунд нужно подождать перед запросом"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def penalize(self, seconds: float) -> None:
+        """Останавливает выдачу токенов на указанное время"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+@dataclass(eq=False)
+class RateShare:
+    """Доля выгрузки в лимите частоты запросов (вес - доля относительно других выгрузок)"""
+    name: str
+    weight: float = 1.0
+    active: bool = True
+
+
+# Доля текущей выгрузки: задается планировщиком выгрузок и наследуется задачами загрузки
+current_share: ContextVar[Optional[RateShare]] = ContextVar("rate_share", default=None)
+
+
+class FairGate:
+    """
+    Взвешенная справедливая очередь к бакету одного хоста (start-time fair queueing)
+
+    Запросы выгрузок получают токены по очереди в порядке виртуального времени:
+    каждый запрос сдвигает время своей выгрузки на 1/вес, поэтому выгрузка
+    с сотнями ожидающих запросов не вытесняет небольшую, а при отсутствии
+    конкурентов получает весь лимит.
+    """
+    def __init__(self):
+        self.clock = 0.0
+        self.finish: "weakref.WeakKeyDictionary[RateShare, float]" = weakref.WeakKeyDictionary()
+        self.waiters: List[Tuple[float, int, asyncio.Future]] = []
+        self.busy = False
+        self._seq = itertools.count()
+
+    def _release(self) -> None:
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.busy = False
+
+    @asynccontextmanager
+    async def turn(self, share: RateShare):
+        start = max(self.clock, self.finish.get(share, 0.0))
+        self.finish[share] = start + 1 / share.weight
+        if not self.busy:
+            self.busy = True
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.waiters, (start, next(self._seq), future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Очередь уже дошла до отмененного запроса - передаем ее следующему
+                if future.done() and not future.cancelled():
+                    self._release()
+                raise
+        self.clock = max(self.clock, start)
+        try:
+            yield
+        finally:
+            self._release()
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты запросов к внешним хостам
+
+    Каждый исходящий запрос к torgi.gov.ru и nspd.gov.ru должен получить токен.
+    При включенном Redis бакеты общие для всех процессов, иначе (или при ошибке Redis)
+    используются локальные бакеты. Запросы к остальным хостам не ограничиваются.
+    """
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[float, int]],
+        redis_client: Optional[aioredis.Redis] = None,
+        sync_redis_client: Optional[redis.Redis] = None
+    ):
+        self.limits = limits
+        self.local = {host: TokenBucket(rate, burst) for host, (rate, burst) in limits.items()}
+        self.fair = {host: FairGate() for host in limits}
+        self.redis = redis_client
+        self.sync_redis = sync_redis_client
+        # После ошибки Redis некоторое время работаем на локальных бакетах
+        self._redis_retry_at = 0.0
+        self.stats: Dict[str, Dict[str, float]] = {
+            host: {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "penalties": 0, "redis_errors": 0}
+            for host in limits
+        }
+        self.logger = logger.bind(service="rate_limiter")
+
+    def _host(self, url_or_host: str) -> Optional[str]:
+        """Определяет ограничиваемый хост по URL (поддомены относятся к своему домену)"""
+        if "//" in url_or_host:
+            parsed = urlparse(url_or_host)
+            # Точное совпадение с хостом и портом (например, локальный mock-сервер)
+            if parsed.netloc in self.limits:
+                return parsed.netloc
+            host = parsed.hostname
+        else:
+            host = url_or_host
+        if not host:
+            return None
+        for limited in self.limits:
+            if host == limited or host.endswith("." + limited):
+                return limited
+        return None
+
+    def _key(self, host: str) -> str:
+        return f"rate_limit:{host}"
+
+    def _redis_available(self) -> bool:
+        return time.monotonic() >= self._redis_retry_at
+
+    def _on_redis_error(self, host: str, error: Exception) -> None:
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+        self.stats[host]["redis_errors"] += 1
+        # Не засоряем лог при длительной недоступности Redis
+        if self.stats[host]["redis_errors"] in (1, 10, 100) or self.stats[host]["redis_errors"] % 1000 == 0:
+            self.logger.warning("Redis rate limit failed, using local bucket", host=host, error=str(error))
+
+    def _record(self, host: str, wait: float) -> None:
+        stats = self.stats[host]
+        stats["acquired"] += 1
+        if wait > 0:
+            stats["waited"] += 1
+            stats["wait_seconds"] += wait
+
+    async def _reserve(self, host: str, penalty: float = 0.0) -> float:
+        rate, burst = self.limits[host]
+        if self.redis is not None and self._redis_available():
+            try:
+                wait = await self.redis.eval(TOKEN_BUCKET_SCRIPT, 1, self._key(host), rate, burst, penalty)
+                return float(wait)
+            except Exception as e:
+                self._on_redis_error(host, e)
+        if penalty > 0:
+            self.local[host].penalize(penalty)
+            return 0.0
+        return self.local[host].reserve()
+
+    def _reserve_sync(self, host: str, penalty: float = 0.0) -> float:
+        rate, burst = self.limits[host]
+        if self.sync_redis is not None and self._redis_available():
+            try:
+                wait = self.sync_redis.eval(TOKEN_BUCKET_SCRIPT, 1, self._key(host), rate, burst, penalty)
+                return float(wait)
+            except Exception as e:
+                self._on_redis_error(host, e)
+        if penalty > 0:
+            self.local[host].penalize(penalty)
+            return 0.0
+        return self.local[host].reserve()
+
+    async def acquire(self, url: str) -> None:
+        """
+        Ожидает разрешения на запрос (для асинхронного кода)
+
+        Запросы выгрузок, запущенных планировщиком, получают токены через
+        справедливую очередь хоста пропорционально весу пользователя.
+        """
+        host = self._host(url)
+        if host is None:
+            return
+        share = current_share.get()
+        if share is not None and share.active:
+            async with self.fair[host].turn(share):
+                await self._acquire(host)
+            return
+        await self._acquire(host)
+
+    async def _acquire(self, host: str) -> None:
+        wait = await self._reserve(host)
+        self._record(host, wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, url: str) -> None:
+        """Ожидает разрешения на запрос (для синхронного кода и рабочих потоков)"""
+        host = self._host(url)
+        if host is None:
+            return
+        wait = self._reserve_sync(host)
+        self._record(host, wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def penalize(self, url: str, seconds: float) -> None:
+        """Приостанавливает запросы к хосту после ответа 429"""
+        host = self._host(url)
+        if host is None or seconds <= 0:
+            return
+        self.stats[host]["penalties"] += 1
+        await self._reserve(host, penalty=seconds)
+
+    def penalize_sync(self, url: str, seconds: float) -> None:
+        """Приостанавливает запросы к хосту после ответа 429 (для синхронного кода)"""
+        host = self._host(url)
+        if host is None or seconds <= 0:
+            return
+        self.stats[host]["penalties"] += 1
+        self._reserve_sync(host, penalty=seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику ожиданий по хостам"""
+        return {
+            host: {**stats, "wait_seconds": round(stats["wait_seconds"], 2)}
+            for host, stats in self.stats.items()
+        }
+
+
+def build_limits(config: RateLimitConfig) -> Dict[str, Tuple[float, int]]:
+    """Лимиты по хостам текущих базовых адресов torgi и НСПД"""
+    return {
+        urlparse(upstream.TORGI_BASE_URL).netloc: (config.torgi_rate, config.torgi_burst),
+        urlparse(upstream.NSPD_BASE_URL).netloc: (config.nspd_rate, config.nspd_burst),
+    }
+
+
+def split_limits(limits: Dict[str, Tuple[float, int]], shares: int) -> Dict[str, Tuple[float, int]]:
+    """Доля лимитов одного из shares процессов с локальными бакетами"""
+    if shares <= 1:
+        return limits
+    return {host: (rate / shares, max(1, burst // shares)) for host, (rate, burst) in limits.items()}
+
+
+def local_shares(config) -> int:
+    """
+    Сколько процессов делят лимит без Redis: процесс бота и рабочие процессы обработки
+
+    С Redis бакет общий и делить лимит не нужно.
+    """
+    if config.redis.enabled:
+        return 1
+    return config.processing.workers + 1
+
+
+# Глобальный экземпляр ограничителя
+rate_limiter: Optional[RateLimiter] = None
+
+
+async def init_rate_limiter(config) -> RateLimiter:
+    """
+    Инициализация ограничителя частоты запросов (общего через Redis, если он включен)
+
+    Без Redis процесс бота получает такую же долю лимита, как каждый рабочий
+    процесс обработки (local_shares), чтобы вместе они его не превышали.
+    """
+    global rate_limiter
+    redis_client = None
+    sync_redis_client = None
+    if config.redis.enabled:
+        redis_client = aioredis.Redis(host=config.redis.host, port=config.redis.port, decode_responses=True)
+        sync_redis_client = redis.Redis(host=config.redis.host, port=config.redis.port, decode_responses=True)
+
+    shares = local_shares(config)
+    rate_limiter = RateLimiter(split_limits(build_limits(config.rate_limit), shares), redis_client, sync_redis_client)
+    logger.info(
+        "Rate limiter initialized",
+        backend="redis" if redis_client is not None else "local",
+        limits=rate_limiter.limits,
+        shares=shares
+    )
+    if shares > 1:
+        logger.warning("Rate limits are split between local processes, set USE_REDIS=true to share them", shares=shares)
+    return rate_limiter
+
+
+def init_worker_rate_limiter(config, processes: int) -> RateLimiter:
+    """
+    Инициализация ограничителя в рабочем процессе обработки (только синхронные запросы)
+
+    С Redis процессы делят общий бакет; без него лимит каждого хоста делится
+    поровну между рабочими процессами и процессом бота (processes + 1 доля),
+    чтобы вместе они его не превышали.
+    """
+    global rate_limiter
+    sync_redis_client = None
+    shares = 1
+    if config.redis.enabled:
+        sync_redis_client = redis.Redis(host=config.redis.host, port=config.redis.port, decode_responses=True)
+    else:
+        shares = processes + 1
+
+    rate_limiter = RateLimiter(split_limits(build_limits(config.rate_limit), shares), None, sync_redis_client)
+    return rate_limiter
+
+
+async def close_rate_limiter() -> None:
+    """Закрывает соединения ограничителя с Redis"""
+    if rate_limiter is None:
+        return
+    logger.info("Rate limiter stats", **rate_limiter.get_stats())
+    if rate_limiter.redis is not None:
+        await rate_limiter.redis.close()
+    if rate_limiter.sync_redis is not None:
+        rate_limiter.sync_redis.close()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Возвращает ограничитель (создает локальный с настройками по умолчанию, если он не инициализирован)"""
+    global rate_limiter
+    if rate_limiter is None:
+        rate_limiter = RateLimiter(build_limits(RateLimitConfig()))
+    return rate_limiter
@@ -1,5 +1,5 @@
 import json
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, List
 import redis.asyncio as redis
 import structlog
 from datetime import datetime, timedelta
@@ -77,6 +77,27 @@ class FakeRedis:
     async def get_cached_data(self, key: str) -> Optional[Any]:
         """Получает кэшированные данные"""
         return self.storage.get(key)
+    
+    async def save_checkpoint_meta(self, fingerprint: str, meta: Dict[str, Any], ttl: int = 21600):
+        """Сохраняет параметры задачи загрузки"""
+        checkpoint = self.storage.setdefault(f"checkpoint:{fingerprint}", {"meta": None, "pages": {}})
+        checkpoint["meta"] = meta
+    
+    async def save_checkpoint_page(self, fingerprint: str, page: int, content: List[Dict[str, Any]], ttl: int = 21600):
+        """Сохраняет загруженную страницу"""
+        checkpoint = self.storage.setdefault(f"checkpoint:{fingerprint}", {"meta": None, "pages": {}})
+        checkpoint["pages"][page] = content
+    
+    async def get_checkpoint(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Получает контрольную точку загрузки"""
+        checkpoint = self.storage.get(f"checkpoint:{fingerprint}")
+        if not checkpoint or checkpoint["meta"] is None:
+            return None
+        return {"meta": checkpoint["meta"], "pages": dict(checkpoint["pages"])}
+    
+    async def clear_checkpoint(self, fingerprint: str):
+        """Удаляет контрольную точку загрузки"""
+        self.storage.pop(f"checkpoint:{fingerprint}", None)
 
 
 class RedisService:
@@ -187,6 +208,48 @@ class RedisService:
         except Exception as e:
             self.logger.error("Failed to get cached data", key=key, error=str(e))
             return None
+    
+    async def save_checkpoint_meta(self, fingerprint: str, meta: Dict[str, Any], ttl: int = 21600):
+        """Сохраняет параметры задачи загрузки"""
+        key = f"checkpoint:{fingerprint}"
+        try:
+            await self.redis.hset(key, "meta", json.dumps(meta))
+            await self.redis.expire(key, ttl)
+        except Exception as e:
+            self.logger.error("Failed to save checkpoint meta", key=key, error=str(e))
+    
+    async def save_checkpoint_page(self, fingerprint: str, page: int, content: List[Dict[str, Any]], ttl: int = 21600):
+        """Сохраняет загруженную страницу"""
+        key = f"checkpoint:{fingerprint}"
+        try:
+            await self.redis.hset(key, f"page:{page}", json.dumps(content))
+            await self.redis.expire(key, ttl)
+        except Exception as e:
+            self.logger.error("Failed to save checkpoint page", key=key, page=page, error=str(e))
+    
+    async def get_checkpoint(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Получает контрольную точку загрузки: параметры и загруженные страницы"""
+        key = f"checkpoint:{fingerprint}"
+        try:
+            data = await self.redis.hgetall(key)
+            if not data or "meta" not in data:
+                return None
+            pages = {
+                int(field.split(":", 1)[1]): json.loads(value)
+                for field, value in data.items()
+                if field.startswith("page:")
+            }
+            return {"meta": json.loads(data["meta"]), "pages": pages}
+        except Exception as e:
+            self.logger.error("Failed to get checkpoint", key=key, error=str(e))
+            return None
+    
+    async def clear_checkpoint(self, fingerprint: str):
+        """Удаляет контрольную точку загрузки"""
+        try:
+            await self.redis.delete(f"checkpoint:{fingerprint}")
+        except Exception as e:
+            self.logger.error("Failed to clear checkpoint", fingerprint=fingerprint, error=str(e))
 
 
 # Глобальный экземпляр сервиса
@@ -194,6 +257,7 @@ redis_service: Optional[RedisService] = None
 
 async def init_redis(config) -> Any:
     """Инициализация Redis или его заглушки"""
+    global redis_service
     if config.redis.enabled:
         service = RedisService(
             host=config.redis.host,
@@ -203,4 +267,10 @@ async def init_redis(config) -> Any:
         service = FakeRedis()
     
     await service.init()
-    return service 
\ No newline at end of file
+    redis_service = service
+    return service
+
+
+def get_redis_service() -> Optional[Any]:
+    """Возвращает инициализированный Redis (или его заглушку), если он есть"""
+    return redis_service 
\ No newline at end of file
@@ -0,0 +1,105 @@
+from typing import List, Dict, Any, Callable, Optional, Awaitable, Hashable
+import asyncio
+import structlog
+
+from bot.config import FetchConfig
+from bot.services.data_fetcher import query_fingerprint, FetchReport
+from bot.services.query_cache import fetch_data_cached
+
+
+logger = structlog.get_logger()
+
+
+class Flight:
+    """Выполняющийся запрос и все ожидающие его подписчики"""
+    def __init__(self, key: str):
+        self.key = key
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers: Dict[Hashable, Optional[Callable[[int, int], Awaitable[None]]]] = {}
+        self.last_progress: Optional[tuple] = None
+        self.report: Optional[FetchReport] = None
+
+    async def broadcast(self, current: int, total: int) -> None:
+        """Передает прогресс каждому подписчику через его собственный коллбэк"""
+        self.last_progress = (current, total)
+        for subscriber_id, callback in list(self.subscribers.items()):
+            if callback is None:
+                continue
+            try:
+                await callback(current, total)
+            except Exception as e:
+                logger.error("Progress callback failed", key=self.key, subscriber=subscriber_id, error=str(e))
+
+
+# Выполняющиеся запросы по отпечатку параметров поиска
+flights: Dict[str, Flight] = {}
+
+
+async def fetch_data_shared(
+    subscriber_id: Hashable,
+    selected_subjects: List[str],
+    selected_statuses: List[str],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    fetch_config: Optional[FetchConfig] = None,
+    report: Optional[FetchReport] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Получает данные, объединяя одинаковые одновременные запросы разных пользователей
+
+    Если запрос с теми же параметрами уже выполняется, вызывающий присоединяется
+    к нему и получает общий результат. Отмена ожидания отписывает только этого
+    вызывающего; сам запрос останавливается, когда подписчиков не осталось.
+
+    Args:
+        subscriber_id: Идентификатор подписчика (например, ID пользователя)
+        selected_subjects: Список выбранных субъектов
+        selected_statuses: Список выбранных статусов
+        date_from: Начальная дата (опционально)
+        date_to: Конечная дата (опционально)
+        progress_callback: Коллбэк-функция для обновления прогресса этого подписчика
+        fetch_config: Настройки загрузки
+        report: Отчет о повторах и неполученных страницах (заполняется по итогам общего запроса)
+
+    Returns:
+        List[Dict[str, Any]]: Список данных
+    """
+    fetch_config = fetch_config or FetchConfig()
+    key = query_fingerprint(selected_subjects, selected_statuses, date_from, date_to)
+
+    flight = flights.get(key)
+    if flight is None or flight.task.done():
+        flight = Flight(key)
+        flight.report = FetchReport(retry_budget=fetch_config.retry_budget)
+        flight.task = asyncio.create_task(fetch_data_cached(
+            selected_subjects, selected_statuses, date_from, date_to,
+            flight.broadcast, fetch_config, flight.report
+        ))
+        flights[key] = flight
+        flight.task.add_done_callback(lambda _: flights.pop(key, None) if flights.get(key) is flight else None)
+        logger.info("Started shared fetch", key=key, subscriber=subscriber_id)
+    else:
+        logger.info("Joined running fetch", key=key, subscriber=subscriber_id, subscribers=len(flight.subscribers) + 1)
+
+    try:
+        flight.subscribers[subscriber_id] = progress_callback
+        if progress_callback and flight.last_progress:
+            try:
+                await progress_callback(*flight.last_progress)
+            except Exception as e:
+                logger.error("Progress callback failed", key=key, subscriber=subscriber_id, error=str(e))
+
+        # shield: отмена одного подписчика не должна отменять общий запрос
+        data = await asyncio.shield(flight.task)
+    finally:
+        # Подписчик уходит при любом исходе (результат, отмена, ошибка общего запроса)
+        flight.subscribers.pop(subscriber_id, None)
+        if not flight.subscribers and not flight.task.done():
+            logger.info("No subscribers left, cancelling shared fetch", key=key)
+            flight.task.cancel()
+
+    if report is not None:
+        report.retries += flight.report.retries
+        report.failed_pages.extend(flight.report.failed_pages)
+    return data
@@ -0,0 +1,39 @@
+from typing import Optional
+from urllib.parse import quote
+import os
+
+from bot.config import UpstreamConfig
+
+
+# Базовые адреса внешних API (можно переопределить, например, на локальный mock-сервер)
+TORGI_BASE_URL = os.getenv("TORGI_BASE_URL", "https://torgi.gov.ru").rstrip("/")
+NSPD_BASE_URL = os.getenv("NSPD_BASE_URL", "https://nspd.gov.ru").rstrip("/")
+
+
+def configure_upstreams(config: Optional[UpstreamConfig]) -> None:
+    """Задает базовые адреса внешних API из конфигурации"""
+    global TORGI_BASE_URL, NSPD_BASE_URL
+    if config is None:
+        return
+    TORGI_BASE_URL = config.torgi_base_url.rstrip("/")
+    NSPD_BASE_URL = config.nspd_base_url.rstrip("/")
+
+
+def search_url() -> str:
+    """URL поиска лотов"""
+    return f"{TORGI_BASE_URL}/new/api/public/lotcards/search"
+
+
+def lot_card_url(lot_id: str) -> str:
+    """URL карточки лота"""
+    return f"{TORGI_BASE_URL}/new/api/public/lotcards/{lot_id}"
+
+
+def geoportal_url(query: str) -> str:
+    """URL поиска объекта на геопортале НСПД по кадастровому номеру"""
+    return f"{NSPD_BASE_URL}/api/geoportal/v2/search/geoportal?query={quote(str(query), safe=':')}"
+
+
+def nspd_home_url() -> str:
+    """Главная страница НСПД (используется для инициализации сессии)"""
+    return f"{NSPD_BASE_URL}/"
@@ -2,7 +2,8 @@ import os
 import datetime
 import logging
 import warnings
-from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple, Callable
 
 import numpy as np
 import pandas as pd
@@ -19,7 +20,9 @@ from bot.utils.functions import (
     fill_rent_period,
     get_additional_data,
     get_coords_batch,
-    get_additional_data_batch
+    get_additional_data_batch,
+    SERVICE_UNAVAILABLE,
+    ProcessingCancelled
 )
 
 
@@ -29,6 +32,14 @@ warnings.filterwarnings('ignore')
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class ProcessingResult:
+    """Итог обработки: Excel файл и сколько записей осталось незаполненными из-за недоступности сервисов"""
+    file_path: str
+    skipped_lots: int = 0
+    skipped_cadastral_numbers: int = 0
+
+
 def prepare_data_for_excel(df: pd.DataFrame) -> pd.DataFrame:
     """Подготавливает данные для Excel файла"""
     # Выбираем и переименовываем нужные колонки
@@ -53,6 +64,7 @@ def prepare_data_for_excel(df: pd.DataFrame) -> pd.DataFrame:
         'bidd_start_date': 'Дата начала приема заявок',
         'lotStatus': 'Статус',
         'coordinates_xy': 'Координаты лота',
+        'coordinates_precision': 'Точность координат',
         'link': 'Ссылка на лот',
         'auction_link': 'Ссылка на аукцион',
         'lotImages': 'Изображения',
@@ -154,8 +166,38 @@ def format_excel(wb: Workbook, sheet_name: str) -> None:
     ws.freeze_panes = "A2"
 
 
-def data_processing(data: List[Dict[Any, Any]], selected_subjects: List[str], selected_statuses: List[str], config=None) -> str:
-    """Обрабатывает данные и создает Excel файл"""
+def data_processing(
+    data: List[Dict[Any, Any]],
+    selected_subjects: List[str],
+    selected_statuses: List[str],
+    config=None,
+    additional_data: Optional[Dict[str, Any]] = None,
+    unavailable_ids: Optional[List[str]] = None,
+    progress_callback: Optional[Callable[[str, int, int], None]] = None,
+    cancel_event=None
+) -> Optional[ProcessingResult]:
+    """
+    Обрабатывает данные и создает Excel файл
+
+    Возвращает путь к файлу и число лотов и кадастровых номеров, данные которых
+    не запрашивались из-за недоступности сервисов (колонки остались пустыми).
+
+    Если карточки лотов уже загружены (additional_data, например асинхронным
+    клиентом), они используются вместо синхронной загрузки в потоках.
+
+    progress_callback(этап, обработано, всего) сообщает о ходе обработки.
+    Если установлен cancel_event, обработка прерывается на ближайшей проверке
+    с исключением ProcessingCancelled.
+    """
+    def check_cancelled():
+        if cancel_event is not None and cancel_event.is_set():
+            logger.info("Обработка данных отменена")
+            raise ProcessingCancelled()
+
+    def report(stage, current, total):
+        if progress_callback:
+            progress_callback(stage, current, total)
+
     logger.info("Начинаю обработку данных...")
     
     # Загружаем константы
@@ -204,24 +246,30 @@ def data_processing(data: List[Dict[Any, Any]], selected_subjects: List[str], se
     
     df['link'] = df['id'].apply(lambda x: f'https://torgi.gov.ru/new/public/lots/lot/{x}') 
 
+    skipped_lots = 0
+    skipped_cadastral_numbers = 0
+
     # Рассчитываем координаты, если это требуется
     if config and config.processing.calculate_coordinates and 'cadastral_number' in df.columns:
+        check_cancelled()
         logger.info("Рассчитываю координаты по кадастровым номерам...")
         
         # Получаем уникальные непустые кадастровые номера
         unique_cadastral_numbers = df['cadastral_number'].dropna().unique().tolist()
         
         if unique_cadastral_numbers:
-            # Ограничиваем количество запросов в зависимости от размера данных
-            workers = min(5, max(2, len(unique_cadastral_numbers) // 20))
+            # Количество одновременных запросов; частоту задает общий ограничитель (RATE_LIMIT_NSPD)
+            workers = min(config.processing.geocode_concurrency, len(unique_cadastral_numbers))
             logger.info(f"Будет использовано {workers} параллельных потоков для запросов")
             
             # Получаем координаты параллельно с контролем скорости запросов
+            unavailable_numbers = []
             coords_dict = get_coords_batch(
                 unique_cadastral_numbers, 
                 max_workers=workers,
-                retry_interval=3,
-                rate_limit_delay=1.0  # Увеличиваем задержку между запросами
+                unavailable=unavailable_numbers,
+                progress_callback=lambda current, total: report("Рассчитано координат", current, total),
+                cancel_event=cancel_event
             )
             
             # Применяем результаты к DataFrame через map
@@ -239,9 +287,17 @@ def data_processing(data: List[Dict[Any, Any]], selected_subjects: List[str], se
         df['address'] = df['coordinates'].apply(
             lambda x: x[1] if isinstance(x, tuple) and len(x) > 1 else np.nan
         )
+        df['coordinates_precision'] = df['coordinates'].apply(
+            lambda x: x[2] if isinstance(x, tuple) and len(x) > 2 else np.nan
+        )
         df['yandex_map_link'] = df['coordinates_xy'].apply(
             lambda x: f"https://yandex.ru/maps/?text={x[0]},{x[1]}" if isinstance(x, list | tuple) and len(x) > 0 and x is not np.nan else np.nan
         )
+        
+        # Отмечаем лоты, координаты которых не запрашивались из-за недоступности геопортала
+        if unique_cadastral_numbers and unavailable_numbers:
+            df.loc[df['cadastral_number'].isin(set(unavailable_numbers)), 'address'] = SERVICE_UNAVAILABLE
+            skipped_cadastral_numbers = len(set(unavailable_numbers))
 
     # Преобразуем типы данных
     if 'biddType' in df.columns:
@@ -253,6 +309,7 @@ def data_processing(data: List[Dict[Any, Any]], selected_subjects: List[str], se
     if 'category' in df.columns:
         df['category'] = df['category'].apply(lambda x: x['name'] if isinstance(x, dict) and 'name' in x else x)
         
+    check_cancelled()
     try:
         logger.info('Начинаю собирать дополнительные данные об объекте...')
         
@@ -260,8 +317,13 @@ def data_processing(data: List[Dict[Any, Any]], selected_subjects: List[str], se
         unique_lot_ids = df['id'].dropna().unique().tolist()
         
         if unique_lot_ids:
-            # Получаем дополнительные данные параллельно
-            additional_data_dict = get_additional_data_batch(unique_lot_ids, max_workers=10)
+            if additional_data is not None:
+                additional_data_dict = {lot_id: additional_data[lot_id] for lot_id in unique_lot_ids if lot_id in additional_data}
+                unavailable_ids = unavailable_ids or []
+            else:
+                # Получаем дополнительные данные параллельно
+                unavailable_ids = []
+                additional_data_dict = get_additional_data_batch(unique_lot_ids, max_workers=10, unavailable=unavailable_ids)
             
             # Создаем временные колонки для данных
             data_columns = ['auction_start_date', 'bidd_start_date', 'auction_link', 
@@ -277,6 +339,13 @@ def data_processing(data: List[Dict[Any, Any]], selected_subjects: List[str], se
             df = df.drop(columns=[col for col in data_columns if col in df.columns]).merge(
                 additional_df, on='id', how='left'
             )
+            
+            # Отмечаем лоты, карточки которых не запрашивались из-за недоступности сервиса
+            if unavailable_ids:
+                skipped = df['id'].isin(set(unavailable_ids))
+                df.loc[skipped, 'auction_link'] = SERVICE_UNAVAILABLE
+                df.loc[skipped, 'permitted_use'] = SERVICE_UNAVAILABLE
+                skipped_lots = int(skipped.sum())
         else:
             for col in ['auction_start_date', 'bidd_start_date', 'auction_link', 
                        'price_step', 'deposit_price', 'files', 'permitted_use']:
@@ -325,7 +394,7 @@ def data_processing(data: List[Dict[Any, Any]], selected_subjects: List[str], se
         'bidd_type', 'bidd_form', 'bidd_start_date', 'bidd_end_date', 'auction_start_date', 'auction_link',
         'deposit_price','price_min', 'price_step', 'price_fin', 'rent_period', 'area', 'cadastral_number', 'images', 'files'
     ]
-    df_coords_columns = ['coordinates_xy', 'address', 'yandex_map_link']
+    df_coords_columns = ['coordinates_xy', 'coordinates_precision', 'address', 'yandex_map_link']
 
     # Проверяем наличие колонок в DataFrame и оставляем только существующие
     existing_base_columns = [col for col in df_base_columns if col in df.columns]
@@ -368,6 +437,7 @@ def data_processing(data: List[Dict[Any, Any]], selected_subjects: List[str], se
     file_path = os.path.join(results_path, filename)
     
     # Создаем Excel файл
+    check_cancelled()
     logger.info(f"Создаю Excel файл: {file_path}")
     
     # Сохраняем данные в Excel
@@ -378,7 +448,7 @@ def data_processing(data: List[Dict[Any, Any]], selected_subjects: List[str], se
     
     logger.info(f"Excel файл успешно создан: {file_path}")
     
-    return file_path
+    return ProcessingResult(file_path, skipped_lots, skipped_cadastral_numbers)
 
 
 def process_images(images_data):
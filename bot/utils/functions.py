@@ -2,18 +2,27 @@ import os
 import json
 import logging
 import re
+import threading
 import warnings
 from datetime import datetime
 
 import pandas as pd
 import numpy as np
 import requests
+import shapely
 from pyproj import Transformer
-from shapely.geometry import Polygon, MultiPolygon, Point
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
 import time
 
+from bot.services import json_codec
+from bot.services.rate_limiter import get_rate_limiter, parse_retry_after
+from bot.services.upstream import lot_card_url, geoportal_url, nspd_home_url
+from bot.services.circuit_breaker import get_breaker
+from bot.services.enrichment import extract_additional_data
+from bot.services.geocode_cache import get_geocode_cache
+
 
 warnings.filterwarnings('ignore')
 load_dotenv()
@@ -23,6 +32,29 @@ logger = logging.getLogger(__name__)
 # Глобальная сессия для запросов
 _global_session = None
 
+# Значение для ячеек, которые не удалось заполнить из-за недоступности сервиса
+SERVICE_UNAVAILABLE = "Нет данных: сервис недоступен"
+
+# Маркер запроса, пропущенного из-за разомкнутого предохранителя
+_SKIPPED = object()
+
+class ProcessingCancelled(Exception):
+    """Обработка выгрузки отменена пользователем"""
+
+
+# Маркер ответа геопортала без данных об участке (не повторяется и кэшируется как отрицательный)
+_NOT_FOUND = object()
+
+# Точность координат в выгрузке
+PRECISION_PARCEL = "Участок"
+PRECISION_QUARTER = "Кадастровый квартал"
+
+# Номер участка: кадастровый квартал (NN:NN:NNNNNNN) и номер участка в квартале
+CADASTRAL_QUARTER_RE = re.compile(r'^(\d{2}:\d{2}:\d{6,7}):\d+$')
+
+# Преобразователи координат по исходной системе координат (свои в каждом потоке - Transformer не потокобезопасен)
+_transformers = threading.local()
+
 
 def get_optimized_session():
     """Возвращает оптимизированную сессию для HTTP-запросов"""
@@ -33,7 +65,8 @@ def get_optimized_session():
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
             "Accept": "application/json, text/javascript, */*; q=0.01",
             "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
-            "Referer": "https://nspd.gov.ru/",
+            "Accept-Encoding": json_codec.ACCEPT_ENCODING,
+            "Referer": nspd_home_url(),
             "Connection": "keep-alive"
         })
         
@@ -48,13 +81,47 @@ def get_optimized_session():
         
         # Инициализация сессии - запрос к главной странице
         try:
-            _global_session.get("https://nspd.gov.ru/", verify=False, timeout=10)
+            get_rate_limiter().acquire_sync(nspd_home_url())
+            _global_session.get(nspd_home_url(), verify=False, timeout=10)
         except Exception as e:
             logger.warning(f"Ошибка при инициализации сессии: {e}")
     
     return _global_session
 
 
+def guarded_get(session, url: str, timeout: float):
+    """
+    Выполняет GET-запрос через предохранитель и ограничитель частоты хоста
+
+    Returns:
+        Ответ requests или None, если предохранитель разомкнут (хост недоступен)
+    """
+    breaker = get_breaker(url)
+    if not breaker.allow_request():
+        return None
+    try:
+        get_rate_limiter().acquire_sync(url)
+        response = session.get(url, verify=False, timeout=timeout)
+    except requests.exceptions.RequestException:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        # Запрос прерван без результата - освобождаем пробный слот предохранителя
+        breaker.release()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+
+def decode_response(response, endpoint: str):
+    """Декодирует JSON-ответ requests через общий слой декодирования"""
+    wire_bytes = response.headers.get("Content-Length")
+    return json_codec.decode(endpoint, response.content, int(wire_bytes) if wire_bytes else None)
+
+
 def load_constants(path_to_const_data: str = 'const_filters') -> tuple:
     """Загружает константы из JSON-файлов"""
     try:
@@ -105,48 +172,87 @@ def fill_area(character):
             return char.get('characteristicValue')
 
 
+def get_transformer(epsg: str) -> Transformer:
+    """Возвращает преобразователь из epsg в EPSG:4326 (создается один раз на систему координат в потоке)"""
+    cache = getattr(_transformers, "cache", None)
+    if cache is None:
+        cache = _transformers.cache = {}
+    transformer = cache.get(epsg)
+    if transformer is None:
+        transformer = cache[epsg] = Transformer.from_crs(epsg, "EPSG:4326", always_xy=True)
+    return transformer
+
+
+def geometry_centroid(geometry: dict) -> list:
+    """
+    Вычисляет центроид геометрии геопортала в EPSG:4326
+
+    Все вершины всех колец преобразуются одним векторным вызовом, геометрия
+    (с дырами и частями мультиполигона) собирается и обрабатывается функциями shapely 2.
+
+    Returns:
+        list: [x, y] центроида или None для неизвестного типа геометрии
+    """
+    geometry_type = geometry.get('type')
+    coords = geometry.get('coordinates')
+    transformer = get_transformer(geometry.get('crs').get('properties').get('name'))
+
+    if geometry_type == 'Point':
+        x, y = transformer.transform(coords[0], coords[1])
+        return [x, y]
+    if geometry_type == 'Polygon':
+        polygons = [coords]
+    elif geometry_type == 'MultiPolygon':
+        polygons = coords
+    else:
+        return None
+
+    rings = [np.asarray(ring, dtype=float)[:, :2] for polygon in polygons for ring in polygon]
+    vertices = np.concatenate(rings)
+    x, y = transformer.transform(vertices[:, 0], vertices[:, 1])
+
+    # Индексы кольца для каждой вершины и полигона для каждого кольца (первое кольцо полигона - внешнее)
+    ring_index = np.repeat(np.arange(len(rings)), [len(ring) for ring in rings])
+    polygon_index = np.repeat(np.arange(len(polygons)), [len(polygon) for polygon in polygons])
+    linear_rings = shapely.linearrings(np.column_stack((x, y)), indices=ring_index)
+    parts = shapely.polygons(linear_rings, indices=polygon_index)
+
+    centroid = shapely.centroid(shapely.multipolygons(parts) if len(parts) > 1 else parts[0])
+    return [float(shapely.get_x(centroid)), float(shapely.get_y(centroid))]
+
+
 def get_coords_from_cadastral_number(cad_num: str) -> tuple:
     """Получает координаты по кадастровому номеру"""
     if not cad_num or pd.isna(cad_num):
         return np.nan
         
-    url = f"https://nspd.gov.ru/api/geoportal/v2/search/geoportal?query={cad_num}"
+    url = geoportal_url(cad_num)
     
     try:
         # Используем оптимизированную сессию
         session = get_optimized_session()
         
-        # Запрос к API с таймаутом
-        response = session.get(url, verify=False, timeout=5)
+        # Запрос к API с таймаутом (с учетом предохранителя и общего ограничения частоты)
+        response = guarded_get(session, url, timeout=5)
+        if response is None:
+            return np.nan
         if response.status_code != 200:
             logger.error(f"Ошибка запроса для {cad_num}: статус {response.status_code}")
             return np.nan
         
-        data_coordinates = response.json()
+        data_coordinates = decode_response(response, "geoportal")
         
         if 'data' not in data_coordinates.keys():
             return np.nan
         
         data_features = next(df for df in data_coordinates['data'].get('features') if 'readable_address' in df.get('properties').get('options'))
 
-        polygon_type = data_features.get('geometry').get('type')
-        coords = data_features.get('geometry').get('coordinates')
         address = data_features.get('properties').get('options').get('readable_address')
-        epsg = data_features.get('geometry').get('crs').get('properties').get('name')
-
-        transformer = Transformer.from_crs(epsg, "EPSG:4326", always_xy=True)
-
-        if polygon_type == 'Polygon':
-            converted_coords = [transformer.transform(x, y) for x, y in coords[0]]
-            polygon = Polygon(converted_coords)
-        elif polygon_type == 'MultiPolygon':
-            polygon = MultiPolygon([Polygon([transformer.transform(x, y) for coord_part in coords for ring in coord_part for x, y in ring])])
-        elif polygon_type == 'Point':
-            polygon = Point(transformer.transform(*coords))
-        else:
-            logger.error(f'Ошибка! Неизвестный тип полигона "{polygon_type}" с кадастровым номером {cad_num}.')
+        centroid = geometry_centroid(data_features.get('geometry'))
+        if centroid is None:
+            logger.error(f'Ошибка! Неизвестный тип полигона "{data_features.get("geometry").get("type")}" с кадастровым номером {cad_num}.')
             return np.nan
-        return ([polygon.centroid.x, polygon.centroid.y], address)
+        return (centroid, address)
     except Exception as e:
         logger.error(f"Ошибка при получении координат ({cad_num}): {e}")
         return np.nan
@@ -183,34 +289,16 @@ def get_additional_data(id):
     try:
         # Используем оптимизированную сессию
         session = get_optimized_session()
-        url = f"https://torgi.gov.ru/new/api/public/lotcards/{id}"
+        url = lot_card_url(id)
         
-        # Запрос с таймаутом
-        response = session.get(url, verify=False, timeout=5)
+        # Запрос с таймаутом (с учетом предохранителя и общего ограничения частоты)
+        response = guarded_get(session, url, timeout=5)
+        if response is None:
+            return [np.nan] * 7
         response.raise_for_status()  # Проверка статуса ответа
         
-        json_data = response.json()
-
-        auction_start_date = json_data.get('auctionStartDate')
-        bidd_start_date = json_data.get('biddStartTime')
-        auction_link = json_data.get('etpUrl')
-        price_step = json_data.get('priceStep')
-        deposit_price = json_data.get('deposit')
-
-        # Получаем разрешенное использование
-        permitted_use = ', '.join([
-            ch_v.get('name')
-            for ch in json_data.get('characteristics', [])
-            if ch.get('code') == 'PermittedUse'
-            for ch_v in ch.get('characteristicValue', [])
-            if ch_v and ch_v.get('name')
-        ])
-
-        attachments = json_data.get('lotAttachments', [])
-        files = [(x.get('fileName', 'Файл'), f"https://torgi.gov.ru/new/file-store/v1/{x.get('fileId', '')}") 
-                for x in attachments if x.get('fileId')]
-                
-        return auction_start_date, bidd_start_date, auction_link, price_step, deposit_price, files, permitted_use
+        json_data = decode_response(response, "lotcard")
+        return extract_additional_data(json_data)
     except requests.exceptions.RequestException as e:
         logger.error(f'Ошибка сетевого запроса для лота {id}: {e}')
         return [np.nan] * 7 
@@ -222,7 +310,7 @@ def get_additional_data(id):
         return [np.nan] * 7
 
 
-def get_additional_data_batch(lot_ids, max_workers=10, retry_interval=1):
+def get_additional_data_batch(lot_ids, max_workers=10, retry_interval=1, unavailable=None):
     """
     Получает дополнительные данные для нескольких лотов параллельно
     
@@ -230,6 +318,7 @@ def get_additional_data_batch(lot_ids, max_workers=10, retry_interval=1):
         lot_ids: Список ID лотов
         max_workers: Максимальное количество параллельных потоков
         retry_interval: Интервал в секундах между повторными попытками при ошибках
+        unavailable: Список, в который добавляются ID лотов, пропущенных из-за недоступности сервиса
         
     Returns:
         dict: Словарь {id_лота: данные_лота}
@@ -239,6 +328,8 @@ def get_additional_data_batch(lot_ids, max_workers=10, retry_interval=1):
     
     results = {}
     failed_ids = []
+    skipped_ids = []
+    breaker = get_breaker(lot_card_url(""))
     
     # Инициализируем сессию заранее
     get_optimized_session()
@@ -248,6 +339,10 @@ def get_additional_data_batch(lot_ids, max_workers=10, retry_interval=1):
         try:
             if not lot_id:
                 return lot_id, [np.nan] * 7
+            
+            # Сервис недоступен - не тратим время на запрос
+            if breaker.is_open:
+                return lot_id, _SKIPPED
                 
             result = get_additional_data(lot_id)
             return lot_id, result
@@ -258,19 +353,31 @@ def get_additional_data_batch(lot_ids, max_workers=10, retry_interval=1):
     # Запускаем параллельную обработку
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         for lot_id, data in executor.map(process_lot, lot_ids):
-            if all(pd.isna(x) if not isinstance(x, list) else False for x in data):
+            if data is _SKIPPED:
+                skipped_ids.append(lot_id)
+            elif all(pd.isna(x) if not isinstance(x, list) else False for x in data):
                 failed_ids.append(lot_id)
             else:
                 results[lot_id] = data
     
-    # Повторяем для неудачных запросов с интервалом
-    if failed_ids and retry_interval > 0:
+    # Повторяем для неудачных запросов с интервалом (если сервис не признан недоступным)
+    if failed_ids and breaker.is_open:
+        skipped_ids.extend(failed_ids)
+    elif failed_ids and retry_interval > 0:
         logger.info(f"Повторная попытка для {len(failed_ids)} неудачных запросов")
         time.sleep(retry_interval)
         
         with ThreadPoolExecutor(max_workers=max(3, max_workers//2)) as executor:
             for lot_id, data in executor.map(process_lot, failed_ids):
-                results[lot_id] = data
+                if data is _SKIPPED:
+                    skipped_ids.append(lot_id)
+                else:
+                    results[lot_id] = data
+    
+    if skipped_ids:
+        logger.warning(f"Сервис карточек лотов недоступен, пропущено лотов: {len(skipped_ids)}")
+        if unavailable is not None:
+            unavailable.extend(skipped_ids)
     
     elapsed = time.time() - start_time
     success_rate = len(results) / len(lot_ids) * 100 if lot_ids else 0
@@ -280,158 +387,231 @@ def get_additional_data_batch(lot_ids, max_workers=10, retry_interval=1):
     return results
 
 
-def get_coords_batch(cadastral_numbers, max_workers=5, retry_interval=2, rate_limit_delay=0.5):
+def cadastral_quarter(cad_num):
+    """Возвращает кадастровый квартал (NN:NN:NNNNNNN) номера участка или None"""
+    match = CADASTRAL_QUARTER_RE.match(str(cad_num).strip())
+    return match.group(1) if match else None
+
+
+def get_coords_batch(
+    cadastral_numbers,
+    max_workers=8,
+    max_attempts=3,
+    unavailable=None,
+    quarter_fallback=True,
+    progress_callback=None,
+    cancel_event=None
+):
     """
     Получает координаты для нескольких кадастровых номеров параллельно
     
+    Номера, которые уже есть в кэше геокодирования (включая отрицательные ответы),
+    не запрашиваются; новые результаты сохраняются в кэш. Пауз между запросами нет:
+    частоту задает общий ограничитель, который после 429 притормаживает все запросы
+    к геопорталу на время Retry-After.
+    
+    Если участок не найден, не удалось получить его координаты или геопортал недоступен,
+    используется центроид кадастрового квартала: он запрашивается (или берется из кэша)
+    один раз на квартал и подставляется всем таким номерам этого квартала.
+    
     Args:
         cadastral_numbers: Список кадастровых номеров
-        max_workers: Максимальное количество параллельных потоков
-        retry_interval: Интервал в секундах между повторными попытками при ошибках
-        rate_limit_delay: Задержка между запросами для предотвращения ошибки 429
+        max_workers: Максимальное количество одновременных запросов
+        max_attempts: Максимальное количество попыток для одного номера
+        unavailable: Список, в который добавляются номера, пропущенные из-за недоступности сервиса
+        quarter_fallback: Подставлять координаты кадастрового квартала для ненайденных участков
+        progress_callback: Функция (обработано, всего), вызывается по мере обработки номеров
+        cancel_event: Событие отмены (threading.Event или его прокси) - при установке
+            оставшиеся номера не запрашиваются и выбрасывается ProcessingCancelled
         
     Returns:
-        dict: Словарь {кадастровый_номер: координаты}
+        dict: Словарь {кадастровый_номер: (координаты, адрес, точность)}
     """
     logger.info(f"Получение координат для {len(cadastral_numbers)} кадастровых номеров")
     start_time = time.time()
+    total = len(cadastral_numbers)
     
-    results = {}
-    failed_numbers = []
+    breaker = get_breaker(geoportal_url(""))
+    cache = get_geocode_cache()
+    requested = 0  # Фактически отправленных запросов (с повторами)
     
     # Инициализируем сессию заранее
     get_optimized_session()
     
-    # Семафор для контроля одновременных запросов
-    from threading import Semaphore
-    request_semaphore = Semaphore(min(max_workers, 3))  # Ограничиваем до 3 одновременных запросов
-    
     # Функция для обработки в потоке
-    def process_cadastral(cad_num):
+    def process_cadastral(cad_num, require_address=True):
         try:
             if pd.isna(cad_num) or not cad_num:
                 return cad_num, np.nan
             
-            # Ограничиваем количество одновременных запросов
-            with request_semaphore:
-                # Добавляем задержку между запросами
-                time.sleep(rate_limit_delay)
-                
-                url = f"https://nspd.gov.ru/api/geoportal/v2/search/geoportal?query={cad_num}"
-                logger.debug(f"Запрашиваю координаты для: {cad_num}")
-                
-                # Используем оптимизированную сессию
-                session = get_optimized_session()
-                
-                # Запрос к API с таймаутом
-                response = session.get(url, verify=False, timeout=10)
-                
-                # Проверяем статус ответа
-                if response.status_code == 429:
-                    logger.warning(f"Ограничение запросов (429) для {cad_num}. Повторю позже.")
-                    # Увеличиваем задержку при ограничении запросов
-                    time.sleep(3)  # Более длительная пауза при ошибке 429
-                    return cad_num, None  # Специальный маркер для повторной попытки
-                
-                if response.status_code != 200:
-                    logger.error(f"Ошибка запроса для {cad_num}: статус {response.status_code}")
-                    return cad_num, np.nan
-                
-                data_coordinates = response.json()
-                
-                if 'data' not in data_coordinates.keys():
-                    return cad_num, np.nan
-                
-                if not data_coordinates['data'].get('features'):
-                    logger.warning(f"Нет данных о координатах для {cad_num}")
-                    return cad_num, np.nan
-                
-                data_features = next((df for df in data_coordinates['data'].get('features') 
-                                    if 'readable_address' in df.get('properties', {}).get('options', {})), None)
-                
-                if not data_features:
-                    logger.warning(f"Невозможно найти данные с адресом для {cad_num}")
-                    return cad_num, np.nan
-
-                polygon_type = data_features.get('geometry').get('type')
-                coords = data_features.get('geometry').get('coordinates')
-                address = data_features.get('properties').get('options').get('readable_address')
-                epsg = data_features.get('geometry').get('crs').get('properties').get('name')
-
-                transformer = Transformer.from_crs(epsg, "EPSG:4326", always_xy=True)
-
-                if polygon_type == 'Polygon':
-                    converted_coords = [transformer.transform(x, y) for x, y in coords[0]]
-                    polygon = Polygon(converted_coords)
-                elif polygon_type == 'MultiPolygon':
-                    polygon = MultiPolygon([Polygon([transformer.transform(x, y) for coord_part in coords for ring in coord_part for x, y in ring])])
-                elif polygon_type == 'Point':
-                    polygon = Point(transformer.transform(*coords))
-                else:
-                    logger.error(f'Ошибка! Неизвестный тип полигона "{polygon_type}" с кадастровым номером {cad_num}.')
-                    return cad_num, np.nan
-                return cad_num, ([polygon.centroid.x, polygon.centroid.y], address)
-                
+            url = geoportal_url(cad_num)
+            logger.debug(f"Запрашиваю координаты для: {cad_num}")
+            
+            # Используем оптимизированную сессию
+            session = get_optimized_session()
+            
+            # Запрос к API с таймаутом (частоту задает общий ограничитель)
+            response = guarded_get(session, url, timeout=10)
+            if response is None:
+                return cad_num, _SKIPPED
+            
+            # Проверяем статус ответа
+            if response.status_code == 429:
+                logger.warning(f"Ограничение запросов (429) для {cad_num}. Повторю позже.")
+                # Притормаживаем все запросы к nspd.gov.ru (во всех потоках и процессах)
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                get_rate_limiter().penalize_sync(url, retry_after or 1.0)
+                return cad_num, None  # Специальный маркер для повторной попытки
+            
+            if response.status_code != 200:
+                logger.error(f"Ошибка запроса для {cad_num}: статус {response.status_code}")
+                return cad_num, np.nan
+            
+            data_coordinates = decode_response(response, "geoportal")
+            
+            if 'data' not in data_coordinates.keys():
+                return cad_num, _NOT_FOUND
+            
+            features = data_coordinates['data'].get('features')
+            if not features:
+                logger.warning(f"Нет данных о координатах для {cad_num}")
+                return cad_num, _NOT_FOUND
+            
+            data_features = next((df for df in features 
+                                if 'readable_address' in df.get('properties', {}).get('options', {})), None)
+            
+            # Для квартала адрес необязателен - достаточно геометрии
+            if not data_features and not require_address:
+                data_features = next((df for df in features if df.get('geometry')), None)
+            
+            if not data_features:
+                logger.warning(f"Невозможно найти данные с адресом для {cad_num}")
+                return cad_num, _NOT_FOUND
+
+            address = data_features.get('properties', {}).get('options', {}).get('readable_address') or f"Кадастровый квартал {cad_num}"
+            epsg = data_features.get('geometry').get('crs').get('properties').get('name')
+            centroid = geometry_centroid(data_features.get('geometry'))
+            if centroid is None:
+                logger.error(f'Ошибка! Неизвестный тип полигона "{data_features.get("geometry").get("type")}" с кадастровым номером {cad_num}.')
+                return cad_num, np.nan
+            return cad_num, (centroid, address, epsg)
+            
         except Exception as e:
             logger.error(f"Ошибка в потоке обработки ({cad_num}): {e}")
             return cad_num, np.nan
     
-    # Разбиваем запросы на группы для равномерной нагрузки
-    batch_size = 20
-    for i in range(0, len(cadastral_numbers), batch_size):
-        batch = cadastral_numbers[i:i+batch_size]
-        logger.info(f"Обработка группы {i//batch_size + 1} из {(len(cadastral_numbers) + batch_size - 1)//batch_size}")
+    def geocode(queries, require_address=True):
+        """
+        Геокодирует номера участков или кварталов (сначала из кэша)
+        
+        Returns:
+            tuple: ({номер: (координаты, адрес)}, ненайденные, неудачные, пропущенные номера)
+        """
+        nonlocal requested
+        found = {}
+        not_found = []
+        failed = []
+        skipped = []
+        geocoded = {}
+        
+        # Берем из кэша уже известные номера
+        if cache is not None and queries:
+            cached, cached_not_found = cache.get_many(queries)
+            found.update(cached)
+            not_found.extend(cached_not_found)
+            queries = [query for query in queries if query not in cached and query not in cached_not_found]
+        
+        # Очередь номеров: частоту запросов задает общий ограничитель (с учетом 429/Retry-After),
+        # неудачные номера сразу возвращаются в конец очереди
+        queue = deque((query, 1) for query in queries)
+        running = {}
+        completed = 0
         
-        # Запускаем параллельную обработку для текущей группы
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            for cad_num, coords in executor.map(process_cadastral, batch):
-                if coords is None:  # Маркер для повторной попытки (429)
-                    failed_numbers.append(cad_num)
-                elif pd.isna(coords):
-                    # Добавляем в список для повторной попытки только если не было явной 404 ошибки
-                    failed_numbers.append(cad_num)
-                else:
-                    results[cad_num] = coords
+            while queue or running:
+                if cancel_event is not None and cancel_event.is_set():
+                    for future in running:
+                        future.cancel()
+                    logger.info(f"Расчет координат отменен, осталось номеров: {len(queue) + len(running)}")
+                    raise ProcessingCancelled()
+                
+                while queue and len(running) < max_workers:
+                    # Сервис недоступен - оставшиеся номера не запрашиваем
+                    if breaker.is_open:
+                        skipped.extend(query for query, _ in queue)
+                        queue.clear()
+                        break
+                    query, attempt = queue.popleft()
+                    running[executor.submit(process_cadastral, query, require_address)] = (query, attempt)
+                    requested += 1
+                
+                if not running:
+                    break
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    query, attempt = running.pop(future)
+                    _, coords = future.result()
+                    if coords is _SKIPPED:
+                        skipped.append(query)
+                    elif coords is _NOT_FOUND:
+                        not_found.append(query)
+                    elif coords is None or pd.isna(coords):
+                        # 429 или временная ошибка - повторяем, пока не исчерпаны попытки
+                        if attempt < max_attempts:
+                            queue.append((query, attempt + 1))
+                            continue
+                        failed.append(query)
+                    else:
+                        geocoded[query] = coords
+                        found[query] = coords[:2]
+                    
+                    completed += 1
+                    if completed % 100 == 0:
+                        logger.info(f"Обработано кадастровых номеров: {completed}/{len(queries)}")
+                    if progress_callback and (completed % 20 == 0 or completed == len(queries)):
+                        progress_callback(completed, len(queries))
+        
+        if failed:
+            logger.warning(f"Не удалось получить координаты для {len(failed)} номеров за {max_attempts} попыток")
         
-        # Небольшая пауза между группами
-        if i + batch_size < len(cadastral_numbers):
-            time.sleep(2)
+        if cache is not None and (geocoded or not_found):
+            queried = set(queries)
+            cache.set_many(geocoded, [query for query in not_found if query in queried])
+        
+        return found, not_found, failed, skipped
+    
+    found, not_found_numbers, failed_numbers, skipped_numbers = geocode(cadastral_numbers)
+    results = {cad_num: (centroid, address, PRECISION_PARCEL) for cad_num, (centroid, address) in found.items()}
     
-    # Повторяем для неудачных запросов с интервалом (с увеличенной задержкой)
-    if failed_numbers:
-        logger.info(f"Повторная попытка для {len(failed_numbers)} неудачных запросов")
-        time.sleep(retry_interval * 2)  # Увеличиваем интервал для повторных попыток
+    # Для ненайденных участков берем центроид кадастрового квартала
+    unresolved = not_found_numbers + failed_numbers + skipped_numbers
+    if quarter_fallback and unresolved:
+        numbers_by_quarter = {}
+        for cad_num in unresolved:
+            quarter = cadastral_quarter(cad_num)
+            if quarter:
+                numbers_by_quarter.setdefault(quarter, []).append(cad_num)
         
-        # Разбиваем неудачные запросы на еще меньшие группы
-        retry_batch_size = 10
-        for i in range(0, len(failed_numbers), retry_batch_size):
-            retry_batch = failed_numbers[i:i+retry_batch_size]
-            logger.info(f"Повторная обработка группы {i//retry_batch_size + 1} из {(len(failed_numbers) + retry_batch_size - 1)//retry_batch_size}")
+        if numbers_by_quarter:
+            quarters, _, _, _ = geocode(list(numbers_by_quarter), require_address=False)
+            for quarter, (centroid, address) in quarters.items():
+                for cad_num in numbers_by_quarter[quarter]:
+                    results[cad_num] = (centroid, address, PRECISION_QUARTER)
             
-            # Увеличиваем задержку для повторных попыток
-            with ThreadPoolExecutor(max_workers=max(2, max_workers//2)) as executor:
-                retry_processes = {}
-                for cad_num in retry_batch:
-                    # Добавляем дополнительную задержку между отправкой заданий
-                    time.sleep(1)
-                    retry_processes[executor.submit(process_cadastral, cad_num)] = cad_num
-                
-                for future in retry_processes:
-                    cad_num = retry_processes[future]
-                    try:
-                        _, coords = future.result()
-                        if coords is not None and not pd.isna(coords):
-                            results[cad_num] = coords
-                    except Exception as e:
-                        logger.error(f"Ошибка при повторной попытке для {cad_num}: {e}")
-            
-            # Пауза между группами повторных попыток
-            if i + retry_batch_size < len(failed_numbers):
-                time.sleep(3)
+            resolved = sum(len(numbers_by_quarter[quarter]) for quarter in quarters)
+            logger.info(f"Координаты по кадастровому кварталу: {resolved} из {len(unresolved)} номеров ({len(quarters)} кварталов)")
+    
+    # Недоступными считаются только номера, для которых не нашлось и координат квартала
+    skipped_numbers = [cad_num for cad_num in skipped_numbers if cad_num not in results]
+    if skipped_numbers:
+        logger.warning(f"Геопортал недоступен, пропущено кадастровых номеров: {len(skipped_numbers)}")
+        if unavailable is not None:
+            unavailable.extend(skipped_numbers)
     
     elapsed = time.time() - start_time
-    success_rate = len(results) / len(cadastral_numbers) * 100 if cadastral_numbers else 0
+    success_rate = len(results) / total * 100 if total else 0
     
-    logger.info(f"Координаты получены. Успешно: {len(results)}/{len(cadastral_numbers)} ({success_rate:.1f}%). Время: {elapsed:.2f} сек.")
+    logger.info(f"Координаты получены. Успешно: {len(results)}/{total} ({success_rate:.1f}%). Запрошено: {requested}. Время: {elapsed:.2f} сек.")
     
     return results
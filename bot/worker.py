@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import signal
+import time
+from dataclasses import replace
+from typing import Dict, Optional
+import structlog
+
+from aiogram import Bot
+from aiogram.enums import ParseMode
+from aiogram.client.default import DefaultBotProperties
+
+from bot.config import Config, load_config
+from bot.logging_config import setup_logging
+from bot.keyboards.menu import get_settings_keyboard, get_cancel_keyboard
+from bot.services import init_redis, init_http_client, init_rate_limiter, close_rate_limiter, init_hedging, get_hedger, init_circuit_breakers, init_lot_cache, close_lot_cache, init_geocode_cache, close_geocode_cache, init_processing_pool, close_processing_pool, init_export_scheduler, configure_upstreams, probe_page_size
+from bot.services.export import ExportStatus, run_export, export_tasks
+from bot.services.export_queue import ExportQueue, Lease, init_export_queue
+from bot.services.export_scheduler import ExportScheduler, Ticket, get_export_scheduler
+from bot.utils.data import load_subjects, load_statuses
+
+
+logger = structlog.get_logger()
+
+# Пауза между опросами пустой очереди (сек)
+POLL_INTERVAL = 1.0
+
+# Как часто проверяется отметка об отмене выгрузки (сек)
+CANCEL_CHECK_INTERVAL = 2.0
+
+# Как часто задачи с истекшей арендой возвращаются в очередь (сек)
+REQUEUE_INTERVAL = 5.0
+
+
+class ExportWorker:
+    """
+    Рабочий процесс очереди выгрузок
+
+    Забирает задачи из очереди (не больше concurrency одновременно); очередь выдает
+    задачу только в свободный слот ее полосы, общий для всех рабочих процессов,
+    и планировщик процесса сразу запускает ее в этом слоте. Выполняет задачи
+    так же, как бот: прогресс и готовый файл отправляются пользователю через
+    Bot API. Пока выгрузка идет, аренда задачи продлевается; отмена пользователем
+    останавливает выгрузку, а при остановке процесса незавершенные задачи сразу
+    возвращаются в очередь.
+    """
+    def __init__(self, queue: ExportQueue, bot: Bot, concurrency: int = 2, scheduler: Optional[ExportScheduler] = None):
+        self.queue = queue
+        self.bot = bot
+        self.concurrency = max(1, concurrency)
+        self.scheduler = scheduler or get_export_scheduler()
+        self.running: Dict[str, asyncio.Task] = {}
+        self.exports: Dict[str, asyncio.Task] = {}
+        self.reasons: Dict[str, str] = {}
+        self.stopping = asyncio.Event()
+        self.stats = {"completed": 0, "cancelled": 0, "lost": 0, "released": 0, "dead": 0}
+        self.logger = logger.bind(service="export_worker")
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+    async def run(self) -> None:
+        self.logger.info("Export worker started", concurrency=self.concurrency)
+        last_requeue = 0.0
+        while not self.stopping.is_set():
+            try:
+                if time.monotonic() - last_requeue >= REQUEUE_INTERVAL:
+                    last_requeue = time.monotonic()
+                    await self.requeue_expired()
+
+                if len(self.running) < self.concurrency:
+                    lease = await self.queue.claim()
+                    if lease is not None:
+                        ticket = self.occupy(lease)
+                        self.running[lease.job.job_id] = asyncio.create_task(self.process(lease, ticket))
+                        continue
+            except Exception as e:
+                self.logger.error("Export queue error", error=str(e))
+
+            try:
+                await asyncio.wait_for(self.stopping.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+        # Незавершенные выгрузки возвращаются в очередь, их продолжит другой рабочий процесс
+        for job_id, task in list(self.exports.items()):
+            self.reasons[job_id] = "released"
+            task.cancel()
+        await asyncio.gather(*self.running.values(), return_exceptions=True)
+        self.logger.info("Export worker stopped", **self.stats)
+
+    def occupy(self, lease: Lease) -> Ticket:
+        """Запускает выгрузку в планировщике по оценке, сделанной ботом при постановке в очередь"""
+        job = lease.job
+        cost = self.scheduler.cost_for(job.lots, job.calculate_coordinates)
+        if job.lane:
+            cost = replace(cost, lane=job.lane)
+        return self.scheduler.occupy(job.user_id, cost, lease.slot_lane)
+
+    async def requeue_expired(self) -> None:
+        """Возвращает в очередь задачи упавших процессов и сообщает об исчерпавших попытки"""
+        _, dead_jobs = await self.queue.requeue_expired()
+        for job in dead_jobs:
+            self.stats["dead"] += 1
+            try:
+                await ExportStatus(self.bot, job.chat_id, job.message_id).edit(
+                    "❌ Не удалось выполнить выгрузку. Попробуйте позже.",
+                    reply_markup=get_settings_keyboard()
+                )
+            except Exception as e:
+                self.logger.error("Failed to notify user", job_id=job.job_id, user_id=job.user_id, error=str(e))
+
+    async def heartbeat(self, lease: Lease, task: asyncio.Task) -> None:
+        """Продлевает аренду и останавливает выгрузку при отмене или потере аренды"""
+        job_id = lease.job.job_id
+        extend_interval = max(CANCEL_CHECK_INTERVAL, self.queue.visibility_timeout / 3)
+        last_extend = time.monotonic()
+        while not task.done():
+            await asyncio.sleep(CANCEL_CHECK_INTERVAL)
+            try:
+                if await self.queue.is_cancelled(job_id):
+                    self.reasons[job_id] = "cancelled"
+                    task.cancel()
+                    return
+                if time.monotonic() - last_extend >= extend_interval:
+                    if not await self.queue.extend(lease):
+                        # Аренда истекла и задача выдана другому процессу - эту копию останавливаем
+                        self.reasons[job_id] = "lost"
+                        task.cancel()
+                        return
+                    last_extend = time.monotonic()
+            except Exception as e:
+                self.logger.error("Export lease heartbeat failed", job_id=job_id, error=str(e))
+
+    async def process(self, lease: Lease, ticket: Ticket) -> None:
+        job = lease.job
+        log = self.logger.bind(job_id=job.job_id, user_id=job.user_id, attempt=lease.attempt)
+        try:
+            if await self.queue.is_cancelled(job.job_id):
+                await self.queue.ack(lease)
+                self.stats["cancelled"] += 1
+                log.info("Export job cancelled before start")
+                return
+            if lease.attempt > 1:
+                log.warning("Export job redelivered")
+
+            try:
+                await ExportStatus(self.bot, job.chat_id, job.message_id).edit(
+                    "⏳ Выгрузка началась, ожидайте...\n"
+                    "Это может занять некоторое время в зависимости от количества выбранных параметров.",
+                    reply_markup=get_cancel_keyboard()
+                )
+            except Exception as e:
+                log.warning("Failed to update status message", error=str(e))
+
+            started = time.monotonic()
+            task = asyncio.create_task(run_export(self.bot, job, ticket))
+            self.exports[job.job_id] = task
+            export_tasks[job.user_id] = task
+            heartbeat = asyncio.create_task(self.heartbeat(lease, task))
+            outcome = "completed"
+            try:
+                await task
+            except asyncio.CancelledError:
+                outcome = self.reasons.pop(job.job_id, "released")
+            finally:
+                heartbeat.cancel()
+                self.exports.pop(job.job_id, None)
+                export_tasks.pop(job.user_id, None)
+
+            # Потерянную аренду не подтверждаем: задачу выполняет другой процесс
+            if outcome == "released":
+                await self.queue.release(lease)
+            elif outcome != "lost":
+                await self.queue.ack(lease)
+            self.stats[outcome] += 1
+            log.info("Export job finished", outcome=outcome, elapsed=round(time.monotonic() - started, 1))
+        except Exception as e:
+            # Задача не подтверждена - по истечении аренды она вернется в очередь
+            log.error("Export job failed", error=str(e))
+        finally:
+            # Выгрузка, не дошедшая до запуска, освобождает слот в планировщике
+            self.scheduler.release(ticket)
+            self.running.pop(job.job_id, None)
+
+
+async def main():
+    # Рабочие процессы пишут логи в консоль (несколько процессов не ротируют один файл)
+    setup_logging(log_file=False)
+
+    # Загрузка конфигурации
+    config: Config = load_config()
+
+    # Базовые адреса внешних API
+    configure_upstreams(config.upstream)
+
+    # Инициализация Redis и очереди выгрузок
+    redis = await init_redis(config)
+    queue = init_export_queue(config, redis)
+    if queue is None:
+        logger.error("Export queue is disabled, set USE_REDIS=true and EXPORT_QUEUE=true")
+        await redis.close()
+        return
+
+    # Кэши карточек лотов и геокодирования
+    init_lot_cache(config)
+    init_geocode_cache(config)
+
+    # Общий пул HTTP-соединений, ограничитель частоты запросов, дублирование и предохранители
+    http_client = await init_http_client(config)
+    await init_rate_limiter(config)
+    init_hedging(config)
+    init_circuit_breakers(config)
+
+    # Рабочие процессы обработки и планировщик выгрузок
+    init_processing_pool(config)
+    init_export_scheduler(config)
+
+    # Определяем максимальный размер страницы, который поддерживает API
+    if config.fetch.page_size_probe:
+        await probe_page_size(
+            [subject["code"] for subject in load_subjects()],
+            [status["code"] for status in load_statuses()],
+            max_page_size=config.fetch.max_page_size
+        )
+
+    # Бот без диспетчера - только для отправки прогресса и файлов
+    bot = Bot(token=config.tg_bot.token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    worker = ExportWorker(queue, bot, config.export_queue.worker_concurrency, get_export_scheduler())
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        close_processing_pool()
+        await http_client.close()
+        await close_rate_limiter()
+        logger.info("Request hedging stats", **get_hedger().get_stats())
+        close_lot_cache()
+        close_geocode_cache()
+        await bot.session.close()
+        await redis.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except (KeyboardInterrupt, SystemExit):
+        logging.info("Worker stopped!")